@@ -3,13 +3,17 @@
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import csv
-from typing import Dict, Iterable, List, Tuple
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from ms_satshield.config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
 from ms_satshield.epoch import MultiEpochResult, MultiKeyEpochManager
-from ms_satshield.metrics import precision_recall_f1
+from ms_satshield.metrics import first_detection_ms, precision_recall_f1, reaction_time
+from sim.cache import TrafficCache
 from sim.runner import ExperimentConfig, ExperimentRunner
+from sim.series import EpochSeriesWriter
 from sim.synthetic import SyntheticAttack, SyntheticAttackConfig, SyntheticBenign, SyntheticBenignConfig
 
 
@@ -18,7 +22,7 @@ def _parse_list(values: str, caster) -> List:
 
 
 def _epoch_metrics(
-    results: List[MultiEpochResult],
+    results: Iterable[MultiEpochResult],
     truth_src: Iterable[int],
     truth_dst: Iterable[int],
     num_queues: int,
@@ -37,14 +41,14 @@ def _epoch_metrics(
         src = epoch.results.get("src")
         dst = epoch.results.get("dst")
         if src:
-            src_keys = [rec.key for rec in src.heavy_keys]
+            src_keys = src.key_array.tolist()
             rate_only_src.append(precision_recall_f1(src_keys, src_truth))
-            multi_keys = [k for k, q in src.queue_map.items() if q == num_queues - 1]
+            multi_keys = src.key_array[src.queue_array == num_queues - 1].tolist()
             multi_src.append(precision_recall_f1(multi_keys, src_truth))
         if dst:
-            dst_keys = [rec.key for rec in dst.heavy_keys]
+            dst_keys = dst.key_array.tolist()
             rate_only_dst.append(precision_recall_f1(dst_keys, dst_truth))
-            multi_keys = [k for k, q in dst.queue_map.items() if q == num_queues - 1]
+            multi_keys = dst.key_array[dst.queue_array == num_queues - 1].tolist()
             multi_dst.append(precision_recall_f1(multi_keys, dst_truth))
 
     def _avg(values: List[Tuple[float, float, float]]) -> Tuple[float, float, float]:
@@ -63,16 +67,64 @@ def _epoch_metrics(
     }
 
 
-def run_sweep(args: argparse.Namespace) -> List[Dict[str, object]]:
+Cell = Tuple[int, float, int]
+
+# Column order of the rows `run_cell` returns (and of the output CSV).
+RESULT_FIELDS = (
+    "bots",
+    "rate_mbps",
+    "decoys",
+    "rate_only_src_f1",
+    "multi_src_f1",
+    "rate_only_dst_f1",
+    "multi_dst_f1",
+    "multi_src_reaction_ms",
+)
+
+# Per-process caches, so pool workers reuse benign traffic across cells.
+_TRAFFIC_CACHES: Dict[Optional[str], TrafficCache] = {}
+
+
+def _traffic_cache(directory: Optional[str]) -> TrafficCache:
+    cache = _TRAFFIC_CACHES.get(directory)
+    if cache is None:
+        cache = TrafficCache(directory=directory)
+        _TRAFFIC_CACHES[directory] = cache
+    return cache
+
+
+def sweep_cells(args: argparse.Namespace) -> List[Cell]:
+    """B x r x M grid in canonical (output) order."""
     bots = _parse_list(args.bots, int)
     rates = _parse_list(args.rates, float)
     decoys = _parse_list(args.decoys, int)
+    return [(b, r, m) for b in bots for r in rates for m in decoys]
+
 
+def run_cell(args: argparse.Namespace, cell: Cell) -> Dict[str, object]:
+    """Run one grid cell from scratch; depends only on `args` and `cell`."""
+    b, r, m = cell
     topk_cfg = TopKConfig(epoch_ms=args.epoch_ms, key_mode="src+dst")
-    fanout_cfg = FanoutConfig(mode="bitmap", bitmap_bits=args.bitmap_bits)
-    score_cfg = ScoreConfig(alpha=args.alpha, beta=args.beta, gamma=args.gamma, persist_k=args.persist_k)
+    fanout_cfg = FanoutConfig(
+        mode="bitmap",
+        bitmap_bits=args.bitmap_bits,
+        candidate_mode=args.candidate_mode,
+        promote_bytes=args.promote_bytes,
+    )
+    score_cfg = ScoreConfig(
+        alpha=args.alpha,
+        beta=args.beta,
+        gamma=args.gamma,
+        persist_k=args.persist_k,
+        norm_mode=args.norm_mode,
+        norm_ewma=args.norm_ewma,
+    )
     queue_cfg = QueueConfig(num_queues=args.queues)
-    epoch_cfg = EpochConfig(epoch_ms=args.epoch_ms, persist_k=args.persist_k)
+    epoch_cfg = EpochConfig(
+        epoch_ms=args.epoch_ms,
+        persist_k=args.persist_k,
+        persist_backend=args.persist_backend,
+    )
 
     benign_cfg = SyntheticBenignConfig(
         flows=args.benign_flows,
@@ -82,53 +134,143 @@ def run_sweep(args: argparse.Namespace) -> List[Dict[str, object]]:
         epoch_ms=args.epoch_ms,
     )
 
-    rows: List[Dict[str, object]] = []
-    for b in bots:
-        for r in rates:
-            for m in decoys:
-                detector = MultiKeyEpochManager(
-                    topk_cfg,
-                    fanout_cfg,
-                    score_cfg,
-                    queue_cfg,
-                    epoch_cfg,
-                    key_mode="src+dst",
-                )
-                runner = ExperimentRunner(detector, ExperimentConfig(epoch_ms=args.epoch_ms))
-                attack_cfg = SyntheticAttackConfig(
-                    bots=b,
-                    rate_mbps=r,
-                    decoys=m,
-                    attack_start_ms=0,
-                    attack_end_ms=args.duration_ms,
-                    epoch_ms=args.epoch_ms,
-                    decoy_sample=args.decoy_sample,
-                )
-                attack = SyntheticAttack(attack_cfg)
-                benign = SyntheticBenign(benign_cfg)
-                results = runner.run([benign, attack])
-                metrics = _epoch_metrics(
-                    results,
-                    attack.attack_srcs,
-                    attack.attack_dsts,
-                    queue_cfg.num_queues,
-                    args.warmup_epochs,
-                )
-                rows.append(
-                    {
-                        "bots": b,
-                        "rate_mbps": r,
-                        "decoys": m,
-                        "rate_only_src_f1": metrics["rate_only_src"][2],
-                        "multi_src_f1": metrics["multi_src"][2],
-                        "rate_only_dst_f1": metrics["rate_only_dst"][2],
-                        "multi_dst_f1": metrics["multi_dst"][2],
-                    }
-                )
-    return rows
-
-
-def parse_args() -> argparse.Namespace:
+    detector = MultiKeyEpochManager(
+        topk_cfg,
+        fanout_cfg,
+        score_cfg,
+        queue_cfg,
+        epoch_cfg,
+        key_mode="src+dst",
+        shards=args.shards,
+        shard_mode=args.shard_mode,
+    )
+    runner = ExperimentRunner(
+        detector, ExperimentConfig(epoch_ms=args.epoch_ms, mode=args.runner_mode)
+    )
+    attack_cfg = SyntheticAttackConfig(
+        bots=b,
+        rate_mbps=r,
+        decoys=m,
+        attack_start_ms=0,
+        attack_end_ms=args.duration_ms,
+        epoch_ms=args.epoch_ms,
+        decoy_sample=args.decoy_sample,
+    )
+    attack = SyntheticAttack(attack_cfg)
+    benign = _traffic_cache(args.cache_dir).get(benign_cfg, lambda: SyntheticBenign(benign_cfg))
+    top_queue = queue_cfg.num_queues - 1
+    flagged_src: List[List[int]] = []
+    series: Optional[EpochSeriesWriter] = None
+    if args.series_dir:
+        series = EpochSeriesWriter(os.path.join(args.series_dir, f"b{b}_r{r:g}_m{m}"))
+
+    def _observe(results: Iterable[MultiEpochResult]) -> Iterator[MultiEpochResult]:
+        # Consumes the runner lazily: one epoch's results are live at a time.
+        for idx, epoch in enumerate(results):
+            src = epoch.results["src"]
+            flagged_src.append(src.key_array[src.queue_array == top_queue].tolist())
+            if series is not None:
+                series.write(idx, epoch)
+            yield epoch
+
+    try:
+        metrics = _epoch_metrics(
+            _observe(runner.iter_epochs([benign, attack])),
+            attack.attack_srcs,
+            attack.attack_dsts,
+            queue_cfg.num_queues,
+            args.warmup_epochs,
+        )
+    finally:
+        detector.close()
+        if series is not None:
+            series.close()
+    detected_ms = first_detection_ms(flagged_src, attack.attack_srcs, args.epoch_ms)
+    return {
+        "bots": b,
+        "rate_mbps": r,
+        "decoys": m,
+        "rate_only_src_f1": metrics["rate_only_src"][2],
+        "multi_src_f1": metrics["multi_src"][2],
+        "rate_only_dst_f1": metrics["rate_only_dst"][2],
+        "multi_dst_f1": metrics["multi_dst"][2],
+        "multi_src_reaction_ms": reaction_time(attack_cfg.attack_start_ms, detected_ms),
+    }
+
+
+def run_sweep(args: argparse.Namespace) -> List[Dict[str, object]]:
+    return [run_cell(args, cell) for cell in sweep_cells(args)]
+
+
+def _row_cell(row: Dict[str, str]) -> Cell:
+    return int(row["bots"]), float(row["rate_mbps"]), int(row["decoys"])
+
+
+def _read_rows(path: str) -> List[Dict[str, str]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as handle:
+        return list(csv.DictReader(handle))
+
+
+def _check_header(path: str) -> None:
+    with open(path, newline="") as handle:
+        header = next(csv.reader(handle), [])
+    if header and tuple(header) != RESULT_FIELDS:
+        raise ValueError(
+            f"cannot resume {path}: its columns {header} differ from {list(RESULT_FIELDS)}; "
+            "rerun without --resume or move the old file aside"
+        )
+
+
+def run_sweep_streaming(args: argparse.Namespace) -> None:
+    """Run the grid, appending each finished row to `args.output`.
+
+    With `--resume`, cells already present in the output are skipped; an
+    output written with different columns is rejected rather than mixed.
+    With `--workers N > 1`, cells run in a process pool and rows are
+    written as they complete; the file is rewritten in canonical grid
+    order at the end, so the result does not depend on completion order.
+    """
+    cells = sweep_cells(args)
+    if args.resume and os.path.exists(args.output):
+        _check_header(args.output)
+    existing = _read_rows(args.output) if args.resume else []
+    done = {_row_cell(row) for row in existing}
+    pending = [cell for cell in cells if cell not in done]
+    mode = "a" if existing else "w"
+    with open(args.output, mode, newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(RESULT_FIELDS))
+        if not existing:
+            writer.writeheader()
+
+        def _emit(row: Dict[str, object]) -> None:
+            writer.writerow(row)
+            handle.flush()
+
+        if args.workers <= 1:
+            for cell in pending:
+                _emit(run_cell(args, cell))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                futures = [pool.submit(run_cell, args, cell) for cell in pending]
+                for future in as_completed(futures):
+                    _emit(future.result())
+    _sort_output(args.output, cells)
+
+
+def _sort_output(path: str, cells: List[Cell]) -> None:
+    rows = _read_rows(path)
+    if not rows:
+        return
+    order = {cell: idx for idx, cell in enumerate(cells)}
+    rows.sort(key=lambda row: order.get(_row_cell(row), len(order)))
+    tmp_path = f"{path}.tmp"
+    write_csv(tmp_path, rows)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument("--bots", default="100,500,2000,10000")
     parser.add_argument("--rates", default="100,20,5,1")
@@ -139,15 +281,27 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--benign-mu", type=float, default=4.5)
     parser.add_argument("--benign-sigma", type=float, default=1.0)
     parser.add_argument("--bitmap-bits", type=int, default=256)
+    parser.add_argument("--candidate-mode", choices=["epoch", "online"], default="epoch")
+    parser.add_argument("--promote-bytes", type=int, default=125_000)
     parser.add_argument("--alpha", type=float, default=0.6)
     parser.add_argument("--beta", type=float, default=0.3)
     parser.add_argument("--gamma", type=float, default=0.1)
     parser.add_argument("--persist-k", type=int, default=3)
+    parser.add_argument("--persist-backend", choices=["dict", "array"], default="dict")
+    parser.add_argument("--norm-mode", choices=["p99", "max", "zscore"], default="p99")
+    parser.add_argument("--norm-ewma", type=float, default=0.0)
     parser.add_argument("--queues", type=int, default=4)
     parser.add_argument("--decoy-sample", type=int, default=None)
     parser.add_argument("--warmup-epochs", type=int, default=1)
     parser.add_argument("--output", default="p4ddos_v0109/progress/sweep_results.csv")
-    return parser.parse_args()
+    parser.add_argument("--runner-mode", choices=["packet", "window"], default="window")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--shard-mode", choices=["process", "inline"], default="process")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--series-dir", default=None, help="write per-cell epoch series here")
+    parser.add_argument("--cache-dir", default=None, help="memory-map cached benign traffic here")
+    return parser.parse_args(argv)
 
 
 def write_csv(path: str, rows: List[Dict[str, object]]) -> None:
@@ -161,8 +315,7 @@ def write_csv(path: str, rows: List[Dict[str, object]]) -> None:
 
 def main() -> int:
     args = parse_args()
-    rows = run_sweep(args)
-    write_csv(args.output, rows)
+    run_sweep_streaming(args)
     return 0
 
 
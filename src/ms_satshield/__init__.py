@@ -7,11 +7,21 @@ from .config import (
     ScoreConfig,
     TopKConfig,
 )
-from .detector import FlowDetector, TopKFilter
-from .epoch import EpochManager, MultiEpochResult, MultiKeyEpochManager
-from .fanout import BitmapEstimator, FanoutEstimator, HLLLiteEstimator
+from .detector import ArrayTopKFilter, FlowDetector, TopKFilter
+from .epoch import EpochManager, MultiEpochResult, MultiKeyEpochManager, StateAggregator
+from .fanout import (
+    BitmapEstimator,
+    FanoutEstimator,
+    HLLLiteEstimator,
+    HLLRegisterEstimator,
+    PackedBitmapEstimator,
+)
+from .hashing import HashFamily
+from .persistence import ArrayPersistence, DictPersistence, PersistenceTracker
 from .scheduler import QueueMapper
 from .scoring import ScoreModel
+from .sharding import ShardedEpochManager, ShardPool
+from .state import DetectorState, merge_states
 
 __all__ = [
     "EpochConfig",
@@ -19,14 +29,26 @@ __all__ = [
     "QueueConfig",
     "ScoreConfig",
     "TopKConfig",
+    "ArrayTopKFilter",
     "FlowDetector",
     "TopKFilter",
     "EpochManager",
     "MultiEpochResult",
     "MultiKeyEpochManager",
+    "StateAggregator",
     "BitmapEstimator",
     "FanoutEstimator",
     "HLLLiteEstimator",
+    "HLLRegisterEstimator",
+    "PackedBitmapEstimator",
+    "HashFamily",
+    "ArrayPersistence",
+    "DictPersistence",
+    "PersistenceTracker",
     "QueueMapper",
     "ScoreModel",
+    "ShardedEpochManager",
+    "ShardPool",
+    "DetectorState",
+    "merge_states",
 ]
@@ -0,0 +1,58 @@
+"""Candidate set for online fan-out tracking (design notes B.0, 方案 0-2)."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional
+
+
+class CandidateTable:
+    """Fixed-capacity candidate set with least-recently-seen eviction.
+
+    Models the small on-switch candidate table of the online mode: keys
+    are promoted when their Top-k count crosses a byte threshold, every
+    packet of a member refreshes it, and promoting into a full table
+    evicts the member that has gone longest without traffic.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f"CandidateTable capacity must be positive: {capacity}")
+        self.capacity = capacity
+        self._keys: "OrderedDict[int, None]" = OrderedDict()
+        self.promotions = 0
+        self.evictions = 0
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._keys)
+
+    def touch(self, key: int) -> bool:
+        """Refresh `key` if it is a member; return membership."""
+        if key not in self._keys:
+            return False
+        self._keys.move_to_end(key)
+        return True
+
+    def add(self, key: int) -> Optional[int]:
+        """Promote `key`; return the evicted key, if any."""
+        evicted = None
+        if len(self._keys) >= self.capacity:
+            evicted, _ = self._keys.popitem(last=False)
+            self.evictions += 1
+        self._keys[key] = None
+        self.promotions += 1
+        return evicted
+
+    def reset(self, keys: Iterable[int] = ()) -> None:
+        """Start a new epoch seeded with `keys` (most important first)."""
+        seeded = list(dict.fromkeys(keys))[: self.capacity]
+        # Least important seeds go first so they are evicted first.
+        self._keys = OrderedDict((key, None) for key in reversed(seeded))
+        self.promotions = 0
+        self.evictions = 0
@@ -13,15 +13,23 @@ class TopKConfig:
     epoch_ms: int = 1000
     heavy_threshold_bytes: int = 0
     key_mode: str = "src+dst"
+    backend: str = "list"  # list | array
+    hash_mode: str = "mix"  # mix | crc32
+    hash_seed: int = 0
 
 
 @dataclass(frozen=True)
 class FanoutConfig:
     mode: str = "bitmap"  # bitmap | hll-lite
+    backend: str = "dict"  # dict | array
     bitmap_bits: int = 256
     hll_p: int = 6
     hll_reg_bits: int = 6
     candidate_k: int = 10_000
+    candidate_mode: str = "epoch"  # epoch | online
+    promote_bytes: int = 125_000
+    hash_mode: str = "mix"  # mix | crc32
+    hash_seed: int = 0
 
 
 @dataclass(frozen=True)
@@ -31,6 +39,7 @@ class ScoreConfig:
     gamma: float = 0.1
     persist_k: int = 3
     norm_mode: str = "p99"  # p99 | max | zscore
+    norm_ewma: float = 0.0  # weight kept from earlier epochs' stats; 0 disables
 
 
 @dataclass(frozen=True)
@@ -43,3 +52,6 @@ class QueueConfig:
 class EpochConfig:
     epoch_ms: int = 1000
     persist_k: int = 3
+    persist_backend: str = "dict"  # dict | array
+    persist_capacity: int = 65_536
+    persist_probes: int = 8
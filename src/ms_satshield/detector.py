@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+import heapq
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 
 from .config import TopKConfig
+from .hashing import HashFamily
 
 
 @dataclass
@@ -21,16 +25,38 @@ class AuxEntry:
     v_cnt: int
 
 
+_MAX_GENERATION = 0xFFFFFFFF
+
+# ArrayTopKFilter.update_many switches to list-mirrored tables once a batch
+# has at least 1/_LIST_BATCH_FRACTION as many packets as the table has slots.
+_LIST_BATCH_FRACTION = 8
+_TABLE_FIELDS = (
+    "_keys",
+    "_counts",
+    "_stamps",
+    "_occupied",
+    "_aux_keys",
+    "_aux_r_cnt",
+    "_aux_v_cnt",
+    "_aux_stamps",
+)
+
+
 class TopKFilter:
     """Simplified Top-k filter with auxiliary table.
 
     This keeps the structure for future P4-aligned logic, while allowing
     a simulator to run end-to-end experiments.
+
+    Slots stamped with an older generation read as empty, so `reset` is
+    O(1). Slots are appended to an occupancy index the first time they are
+    written in an epoch, so `snapshot` and `top` only visit occupied buckets.
     """
 
     def __init__(self, config: TopKConfig, seed: int = 0) -> None:
         self.config = config
         self._seed = seed
+        self._hashes = HashFamily(config.hash_seed + seed, config.hash_mode)
         self._tables: List[List[Optional[FlowRecord]]] = [
             [None for _ in range(config.buckets_per_stage)]
             for _ in range(config.stages)
@@ -38,53 +64,84 @@ class TopKFilter:
         self._aux: List[Optional[AuxEntry]] = [
             None for _ in range(config.buckets_per_stage)
         ]
-        self._min_count = 0
+        self._stamps: List[List[int]] = [
+            [0] * config.buckets_per_stage for _ in range(config.stages)
+        ]
+        self._aux_stamps: List[int] = [0] * config.buckets_per_stage
+        self._generation = 1
+        self._occupied: List[Tuple[int, int]] = []
+
+    def update(self, key: int, size: int) -> int:
+        """Insert one packet and return the packet key's stage-table count.
 
-    def update(self, key: int, size: int) -> None:
+        The count is that of the record holding `key` once the update
+        settles, or 0 if the key ended up only in the auxiliary table.
+        """
         record = FlowRecord(key=key, count=size)
+        resident = 0
+        generation = self._generation
         for stage in range(self.config.stages):
-            idx = self._hash(key, stage) % self.config.buckets_per_stage
-            bucket = self._tables[stage][idx]
-            if bucket is None:
+            idx = self._hashes.index(key, stage, self.config.buckets_per_stage)
+            stamps = self._stamps[stage]
+            if stamps[idx] != generation:
                 self._tables[stage][idx] = record
-                return
+                stamps[idx] = generation
+                self._occupied.append((stage, idx))
+                return record.count if record.key == key else resident
+            bucket = self._tables[stage][idx]
             if bucket.key == record.key:
                 bucket.count += record.count
-                return
+                return bucket.count if bucket.key == key else resident
             if bucket.count < record.count:
+                if record.key == key:
+                    resident = record.count
+                elif bucket.key == key:
+                    resident = 0
                 self._tables[stage][idx], record = record, bucket
         self._aux_update(record)
+        return resident
+
+    def update_many(self, keys: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """Sequential `update` over a batch; returns the per-row counts."""
+        update = self.update
+        return np.fromiter(
+            (update(key, size) for key, size in zip(keys.tolist(), sizes.tolist())),
+            dtype=np.int64,
+            count=len(keys),
+        )
 
     def snapshot(self) -> List[FlowRecord]:
-        records: List[FlowRecord] = []
-        min_count = None
-        for stage in range(self.config.stages):
-            for bucket in self._tables[stage]:
-                if bucket is None:
-                    continue
-                records.append(bucket)
-                if min_count is None or bucket.count < min_count:
-                    min_count = bucket.count
-        self._min_count = min_count or 0
-        return [
-            rec for rec in records
-            if rec.count >= self.config.heavy_threshold_bytes
-        ]
+        """Records at or above the heavy threshold, in slot occupancy order."""
+        tables = self._tables
+        threshold = self.config.heavy_threshold_bytes
+        records = (tables[stage][idx] for stage, idx in self._occupied)
+        return [rec for rec in records if rec.count >= threshold]
+
+    def top(self, n: Optional[int] = None) -> List[FlowRecord]:
+        """Current `n` (default `config.k`) largest heavy records, largest first."""
+        return heapq.nlargest(
+            self.config.k if n is None else n, self.snapshot(), key=lambda rec: rec.count
+        )
 
     def reset(self) -> None:
+        self._occupied = []
+        if self._generation < _MAX_GENERATION:
+            self._generation += 1
+            return
         for stage in range(self.config.stages):
-            for idx in range(self.config.buckets_per_stage):
-                self._tables[stage][idx] = None
-        for idx in range(self.config.buckets_per_stage):
-            self._aux[idx] = None
-        self._min_count = 0
+            self._tables[stage] = [None] * self.config.buckets_per_stage
+            self._stamps[stage] = [0] * self.config.buckets_per_stage
+        self._aux = [None] * self.config.buckets_per_stage
+        self._aux_stamps = [0] * self.config.buckets_per_stage
+        self._generation = 1
 
     def _aux_update(self, record: FlowRecord) -> None:
-        idx = self._hash(record.key, self.config.stages) % self.config.buckets_per_stage
-        entry = self._aux[idx]
-        if entry is None:
+        idx = self._hashes.index(record.key, self.config.stages, self.config.buckets_per_stage)
+        if self._aux_stamps[idx] != self._generation:
             self._aux[idx] = AuxEntry(key=record.key, r_cnt=record.count, v_cnt=record.count)
+            self._aux_stamps[idx] = self._generation
             return
+        entry = self._aux[idx]
         if entry.key == record.key:
             entry.r_cnt += record.count
             entry.v_cnt += record.count
@@ -95,9 +152,177 @@ class TopKFilter:
                 entry.r_cnt = record.count
                 entry.v_cnt = record.count
 
-    @staticmethod
-    def _hash(key: int, seed: int) -> int:
-        return hash((key, seed)) & 0xFFFFFFFF
+
+class ArrayTopKFilter:
+    """TopKFilter with stage and auxiliary tables held in parallel NumPy arrays.
+
+    Follows the same Algorithm 1 update as `TopKFilter` (identical hashing,
+    swap, auxiliary voting and generation-stamped reset), but keeps keys
+    and counters in flat int64 arrays instead of allocating a `FlowRecord`
+    per packet, so `snapshot`/`top` and bulk hashing are array operations.
+    Keys must fit in a signed 64-bit integer. Prefer `update_many` for
+    bulk ingestion; single-packet `update` indexes the arrays directly.
+    """
+
+    def __init__(self, config: TopKConfig, seed: int = 0) -> None:
+        self.config = config
+        self._seed = seed
+        self._hashes = HashFamily(config.hash_seed + seed, config.hash_mode)
+        slots = config.stages * config.buckets_per_stage
+        self._stage_base = np.arange(config.stages, dtype=np.int64) * config.buckets_per_stage
+        self._keys = np.zeros(slots, dtype=np.int64)
+        self._counts = np.zeros(slots, dtype=np.int64)
+        self._stamps = np.zeros(slots, dtype=np.uint32)
+        self._aux_keys = np.zeros(config.buckets_per_stage, dtype=np.int64)
+        self._aux_r_cnt = np.zeros(config.buckets_per_stage, dtype=np.int64)
+        self._aux_v_cnt = np.zeros(config.buckets_per_stage, dtype=np.int64)
+        self._aux_stamps = np.zeros(config.buckets_per_stage, dtype=np.uint32)
+        self._generation = 1
+        self._occupied = np.zeros(slots, dtype=np.int64)
+        self._occupied_count = 0
+
+    def update(self, key: int, size: int) -> int:
+        return self._update_slots(key, size, self._slots(key))
+
+    def update_many(self, keys: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """Sequential update over a batch; returns the per-row counts.
+
+        Stage indices are hashed for the whole batch at once. Each update
+        depends on the table state left by the previous one, so the swap
+        chain itself stays sequential; for batches of at least
+        1/`_LIST_BATCH_FRACTION` of the table size it runs over Python-list
+        copies of the tables, which are written back once at the end.
+        """
+        slots = self._hashes.indices(keys, self.config.stages, self.config.buckets_per_stage)
+        slots += self._stage_base
+        mirrored = len(keys) * _LIST_BATCH_FRACTION >= self._keys.size
+        if mirrored:
+            self._mirror_tables()
+        try:
+            update_slots = self._update_slots
+            return np.fromiter(
+                (
+                    update_slots(key, size, row)
+                    for key, size, row in zip(keys.tolist(), sizes.tolist(), slots.tolist())
+                ),
+                dtype=np.int64,
+                count=len(keys),
+            )
+        finally:
+            if mirrored:
+                self._restore_tables()
+
+    def _mirror_tables(self) -> None:
+        for name in _TABLE_FIELDS:
+            setattr(self, name, getattr(self, name).tolist())
+
+    def _restore_tables(self) -> None:
+        for name in _TABLE_FIELDS:
+            dtype = np.uint32 if name.endswith("stamps") else np.int64
+            setattr(self, name, np.array(getattr(self, name), dtype=dtype))
+
+    def _slots(self, key: int) -> Iterator[int]:
+        buckets = self.config.buckets_per_stage
+        for stage in range(self.config.stages):
+            yield stage * buckets + self._hashes.index(key, stage, buckets)
+
+    def _update_slots(self, key: int, size: int, slots: Iterable[int]) -> int:
+        keys = self._keys
+        counts = self._counts
+        stamps = self._stamps
+        generation = self._generation
+        # Stage slots are always derived from the packet key, while the
+        # carried record may be swapped out along the way (as in TopKFilter).
+        rec_key, rec_count = key, size
+        resident = 0
+        for slot in slots:
+            if stamps[slot] != generation:
+                stamps[slot] = generation
+                keys[slot] = rec_key
+                counts[slot] = rec_count
+                self._occupied[self._occupied_count] = slot
+                self._occupied_count += 1
+                return rec_count if rec_key == key else resident
+            bucket_key = int(keys[slot])
+            if bucket_key == rec_key:
+                counts[slot] += rec_count
+                return int(counts[slot]) if bucket_key == key else resident
+            bucket_count = int(counts[slot])
+            if bucket_count < rec_count:
+                if rec_key == key:
+                    resident = rec_count
+                elif bucket_key == key:
+                    resident = 0
+                keys[slot] = rec_key
+                counts[slot] = rec_count
+                rec_key, rec_count = bucket_key, bucket_count
+        self._aux_update(rec_key, rec_count)
+        return resident
+
+    def snapshot(self) -> List[FlowRecord]:
+        """Records at or above the heavy threshold, in slot occupancy order."""
+        return self._records(self._heavy_slots())
+
+    def top(self, n: Optional[int] = None) -> List[FlowRecord]:
+        """Current `n` (default `config.k`) largest heavy records, largest first."""
+        n = self.config.k if n is None else n
+        slots = self._heavy_slots()
+        if n <= 0:
+            return []
+        counts = self._counts[slots]
+        if slots.size > n:
+            # Keep heapq.nlargest's tie order: equal counts in occupancy order.
+            kth = np.partition(counts, slots.size - n)[slots.size - n]
+            above = np.flatnonzero(counts > kth)
+            ties = np.flatnonzero(counts == kth)[: n - above.size]
+            keep = np.sort(np.concatenate([above, ties]))
+            slots, counts = slots[keep], counts[keep]
+        return self._records(slots[np.argsort(-counts, kind="stable")])
+
+    def reset(self) -> None:
+        self._occupied_count = 0
+        if self._generation < _MAX_GENERATION:
+            self._generation += 1
+            return
+        self._stamps.fill(0)
+        self._aux_stamps.fill(0)
+        self._generation = 1
+
+    def _heavy_slots(self) -> np.ndarray:
+        slots = self._occupied[: self._occupied_count]
+        return slots[self._counts[slots] >= self.config.heavy_threshold_bytes]
+
+    def _records(self, slots: np.ndarray) -> List[FlowRecord]:
+        return [
+            FlowRecord(key=key, count=count)
+            for key, count in zip(self._keys[slots].tolist(), self._counts[slots].tolist())
+        ]
+
+    def _aux_update(self, key: int, count: int) -> None:
+        idx = self._hashes.index(key, self.config.stages, self.config.buckets_per_stage)
+        if self._aux_stamps[idx] != self._generation:
+            self._aux_stamps[idx] = self._generation
+            self._aux_keys[idx] = key
+            self._aux_r_cnt[idx] = count
+            self._aux_v_cnt[idx] = count
+            return
+        if int(self._aux_keys[idx]) == key:
+            self._aux_r_cnt[idx] += count
+            self._aux_v_cnt[idx] += count
+        else:
+            self._aux_v_cnt[idx] -= count
+            if self._aux_v_cnt[idx] <= 0:
+                self._aux_keys[idx] = key
+                self._aux_r_cnt[idx] = count
+                self._aux_v_cnt[idx] = count
+
+
+def make_topk_filter(config: TopKConfig, seed: int = 0) -> Union[TopKFilter, ArrayTopKFilter]:
+    if config.backend == "array":
+        return ArrayTopKFilter(config=config, seed=seed)
+    if config.backend == "list":
+        return TopKFilter(config=config, seed=seed)
+    raise ValueError(f"Unsupported TopK backend: {config.backend}")
 
 
 class FlowDetector:
@@ -105,13 +330,20 @@ class FlowDetector:
 
     def __init__(self, config: TopKConfig) -> None:
         self.config = config
-        self._filter = TopKFilter(config=config)
+        self._filter = make_topk_filter(config)
+
+    def on_packet(self, key: int, size: int) -> int:
+        return self._filter.update(key, size)
 
-    def on_packet(self, key: int, size: int) -> None:
-        self._filter.update(key, size)
+    def on_batch(self, keys: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        return self._filter.update_many(keys, sizes)
 
     def end_epoch(self) -> List[FlowRecord]:
         return self._filter.snapshot()
 
+    def current_heavy(self, n: Optional[int] = None) -> List[FlowRecord]:
+        """Mid-epoch view of the largest records seen so far."""
+        return self._filter.top(n)
+
     def reset(self) -> None:
         self._filter.reset()
@@ -2,14 +2,20 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Set
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
+import numpy as np
+
+from .candidates import CandidateTable
 from .config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
 from .detector import FlowDetector, FlowRecord
-from .fanout import BitmapEstimator, FanoutEstimator, HLLLiteEstimator
+from .fanout import FanoutEstimator, make_fanout_estimator
+from .persistence import PersistenceTracker, make_persistence_tracker
 from .scheduler import QueueMapper
 from .scoring import ScoreModel
+from .state import MERGE_MODES, DetectorState, merge_states
 
 
 @dataclass
@@ -21,12 +27,123 @@ class CandidateFeatures:
 
 @dataclass
 class EpochResult:
+    """One epoch's heavy records and per-candidate arrays.
+
+    Row i of every ``*_array`` describes the distinct heavy key
+    ``key_array[i]`` (first-seen order); ``count_array`` is the Top-k
+    count of its first record. The dict views are built on first access.
+    """
+
     heavy_keys: List[FlowRecord]
-    scores: Dict[int, float]
-    queue_map: Dict[int, int]
+    key_array: np.ndarray
+    count_array: np.ndarray
+    rate_array: np.ndarray
+    fanout_array: np.ndarray
+    persist_array: np.ndarray
+    score_array: np.ndarray
+    queue_array: np.ndarray
+
+    @cached_property
+    def scores(self) -> Dict[int, float]:
+        return dict(zip(self.key_array.tolist(), self.score_array.tolist()))
+
+    @cached_property
+    def queue_map(self) -> Dict[int, int]:
+        return dict(zip(self.key_array.tolist(), self.queue_array.tolist()))
+
+    @cached_property
+    def features(self) -> Dict[int, CandidateFeatures]:
+        rows = zip(
+            self.key_array.tolist(),
+            self.rate_array.tolist(),
+            self.fanout_array.tolist(),
+            self.persist_array.tolist(),
+        )
+        return {
+            key: CandidateFeatures(rate=rate, fanout=fanout, persist=persist)
+            for key, rate, fanout, persist in rows
+        }
+
+
+@dataclass
+class EpochFeatures:
+    """Unscored per-candidate arrays of one closed epoch (see EpochResult)."""
+
+    heavy_keys: List[FlowRecord]
+    key_array: np.ndarray
+    count_array: np.ndarray
+    rate_array: np.ndarray
+    fanout_array: np.ndarray
+    persist_array: np.ndarray
+
+    @classmethod
+    def concat(cls, parts: Sequence[EpochFeatures]) -> EpochFeatures:
+        """Join features of disjoint key sets (e.g. shards), in order."""
+        return cls(
+            heavy_keys=[rec for part in parts for rec in part.heavy_keys],
+            key_array=np.concatenate([part.key_array for part in parts]),
+            count_array=np.concatenate([part.count_array for part in parts]),
+            rate_array=np.concatenate([part.rate_array for part in parts]),
+            fanout_array=np.concatenate([part.fanout_array for part in parts]),
+            persist_array=np.concatenate([part.persist_array for part in parts]),
+        )
+
+    @classmethod
+    def from_state(cls, state: DetectorState, epoch_cfg: EpochConfig) -> EpochFeatures:
+        """Features of a (possibly merged) DetectorState's heavy keys."""
+        keys = state.heavy_keys
+        rates = state.byte_counts(keys) / max(1.0, epoch_cfg.epoch_ms / 1000.0)
+        return cls(
+            heavy_keys=[
+                FlowRecord(key=key, count=count)
+                for key, count in zip(keys.tolist(), state.heavy_counts.tolist())
+            ],
+            key_array=keys,
+            count_array=state.heavy_counts,
+            rate_array=rates,
+            fanout_array=state.fanouts(keys),
+            persist_array=state.persists(keys),
+        )
+
+
+class EpochScorer:
+    """Normalizes, scores and queue-maps a closed epoch's features."""
+
+    def __init__(self, score_cfg: ScoreConfig, queue_cfg: QueueConfig) -> None:
+        self._score_model = ScoreModel(score_cfg)
+        self._queue_mapper = QueueMapper(queue_cfg)
+
+    def score(self, features: EpochFeatures) -> EpochResult:
+        rates, fanouts, persists = (
+            features.rate_array,
+            features.fanout_array,
+            features.persist_array,
+        )
+        stats = self._score_model.compute_stats(rates, fanouts, persists)
+        scores = self._score_model.score_many(rates, fanouts, persists, stats)
+        self._queue_mapper.update(scores)
+        return EpochResult(
+            heavy_keys=features.heavy_keys,
+            key_array=features.key_array,
+            count_array=features.count_array,
+            rate_array=rates,
+            fanout_array=fanouts,
+            persist_array=persists,
+            score_array=scores,
+            queue_array=self._queue_mapper.map_many(scores),
+        )
 
 
 class EpochManager:
+    """Per-key-side MS-SatShield pipeline.
+
+    Fan-out and byte counts are kept only for candidates. In the default
+    ``epoch`` candidate mode these are the previous epoch's heavy keys
+    (design notes 方案 0-1); in ``online`` mode a key is also promoted as
+    soon as its Top-k count crosses `FanoutConfig.promote_bytes` within
+    the epoch, into a table bounded by `candidate_k` (方案 0-2).
+    """
+
     def __init__(
         self,
         topk_cfg: TopKConfig,
@@ -36,72 +153,245 @@ class EpochManager:
         epoch_cfg: EpochConfig,
     ) -> None:
         self._detector = FlowDetector(topk_cfg)
-        self._score_model = ScoreModel(score_cfg)
-        self._queue_mapper = QueueMapper(queue_cfg)
+        self._fanout_cfg = fanout_cfg
+        self._scorer = EpochScorer(score_cfg, queue_cfg)
         self._epoch_cfg = epoch_cfg
-        self._fanout: FanoutEstimator
-        if fanout_cfg.mode == "hll-lite":
-            self._fanout = HLLLiteEstimator(fanout_cfg)
-        else:
-            self._fanout = BitmapEstimator(fanout_cfg)
+        self._fanout: FanoutEstimator = make_fanout_estimator(fanout_cfg)
         self._candidates: Set[int] = set()
-        self._persist: Dict[int, int] = {}
+        self._candidate_array = np.empty(0, dtype=np.int64)
+        self._online: Optional[CandidateTable] = None
+        if fanout_cfg.candidate_mode == "online":
+            self._online = CandidateTable(fanout_cfg.candidate_k)
+        elif fanout_cfg.candidate_mode != "epoch":
+            raise ValueError(f"Unsupported candidate_mode: {fanout_cfg.candidate_mode}")
+        self._promote_bytes = fanout_cfg.promote_bytes
+        self._persist: PersistenceTracker = make_persistence_tracker(epoch_cfg)
         self._bytes: Dict[int, int] = {}
 
     def on_packet(self, key: int, other: int, size: int) -> None:
-        self._detector.on_packet(key, size)
-        if key in self._candidates:
-            self._fanout.update(key, other)
-            self._bytes[key] = self._bytes.get(key, 0) + size
+        count = self._detector.on_packet(key, size)
+        if self._online is not None:
+            if not self._online.touch(key):
+                if count < self._promote_bytes:
+                    return
+                self._promote(key)
+                # Credit the bytes the Top-k counted before promotion.
+                self._bytes[key] = count - size
+        elif key not in self._candidates:
+            return
+        self._fanout.update(key, other)
+        self._bytes[key] = self._bytes.get(key, 0) + size
+
+    def on_batch(self, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        """Bulk equivalent of calling `on_packet` for each row, in order."""
+        keys = np.asarray(keys, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        counts = self._detector.on_batch(keys, sizes)
+        if keys.size == 0:
+            return
+        if self._online is not None:
+            rows, seeds = self._online_rows(keys, counts, sizes)
+            self._bytes.update(seeds)
+            if rows.size:
+                self._accumulate(keys[rows], others[rows], sizes[rows])
+            return
+        if not self._candidates:
+            return
+        mask = np.isin(keys, self._candidate_array)
+        if mask.any():
+            self._accumulate(keys[mask], others[mask], sizes[mask])
+
+    @property
+    def promotions(self) -> int:
+        """Online promotions so far in the current epoch."""
+        return 0 if self._online is None else self._online.promotions
+
+    def _accumulate(self, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        self._fanout.update_many(keys, others)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros(uniq.size, dtype=np.int64)
+        np.add.at(totals, inverse, sizes)
+        for key, total in zip(uniq.tolist(), totals.tolist()):
+            self._bytes[key] = self._bytes.get(key, 0) + total
+
+    def _promote(self, key: int) -> Optional[int]:
+        evicted = self._online.add(key)
+        if evicted is not None:
+            self._fanout.discard(evicted)
+            self._bytes.pop(evicted, None)
+        return evicted
+
+    def _online_rows(
+        self, keys: np.ndarray, counts: np.ndarray, sizes: np.ndarray
+    ) -> Tuple[np.ndarray, Dict[int, int]]:
+        """Rows whose fan-out/bytes survive in online mode, and promotion byte seeds.
+
+        Membership is replayed in order, but only over rows of current
+        members or of keys reaching `promote_bytes` in the batch; other rows
+        can neither touch nor join the table. Rows of a key that is evicted
+        later in the batch are dropped, as the per-packet path would discard
+        them at eviction time.
+        """
+        table = self._online
+        threshold = self._promote_bytes
+        members = np.fromiter(table, dtype=np.int64, count=len(table))
+        live = np.concatenate([members, keys[counts >= threshold]])
+        replay = np.flatnonzero(np.isin(keys, live))
+        rows: Dict[int, List[int]] = {}
+        seeds: Dict[int, int] = {}
+        for row, key, count, size in zip(
+            replay.tolist(), keys[replay].tolist(), counts[replay].tolist(), sizes[replay].tolist()
+        ):
+            if table.touch(key):
+                rows.setdefault(key, []).append(row)
+            elif count >= threshold:
+                evicted = self._promote(key)
+                if evicted is not None:
+                    rows.pop(evicted, None)
+                    seeds.pop(evicted, None)
+                rows[key] = [row]
+                seeds[key] = count - size
+        if not rows:
+            return np.empty(0, dtype=np.int64), seeds
+        merged = np.concatenate([np.asarray(r, dtype=np.int64) for r in rows.values()])
+        return np.sort(merged), seeds
 
     def end_epoch(self) -> EpochResult:
+        return self._scorer.score(self.close_features())
+
+    def close_features(self) -> EpochFeatures:
+        """Close the epoch and return its unscored candidate features."""
         heavy = self._detector.end_epoch()
-        heavy_keys = {rec.key for rec in heavy}
-        features = self._build_features(heavy)
-        stats = self._score_model.compute_stats(
-            (f.rate for f in features.values()),
-            (f.fanout for f in features.values()),
-            (f.persist for f in features.values()),
+        keys, counts = _distinct_records(heavy)
+        rates, fanouts, persists = self._feature_arrays(keys)
+        self._rotate_epoch(heavy, keys)
+        return EpochFeatures(
+            heavy_keys=heavy,
+            key_array=keys,
+            count_array=counts,
+            rate_array=rates,
+            fanout_array=fanouts,
+            persist_array=persists,
         )
-        scores = {
-            key: self._score_model.score(f.rate, f.fanout, f.persist, stats)
-            for key, f in features.items()
-        }
-        self._queue_mapper.update(scores.values())
-        queue_map = {key: self._queue_mapper.map_score(score) for key, score in scores.items()}
-        self._rotate_epoch(heavy_keys)
-        return EpochResult(heavy_keys=heavy, scores=scores, queue_map=queue_map)
-
-    def _build_features(self, heavy: Iterable[FlowRecord]) -> Dict[int, CandidateFeatures]:
-        features: Dict[int, CandidateFeatures] = {}
-        for rec in heavy:
-            persist = float(self._persist.get(rec.key, 0))
-            rate = float(self._bytes.get(rec.key, 0)) / max(1.0, self._epoch_cfg.epoch_ms / 1000.0)
-            fanout = float(self._fanout.estimate(rec.key))
-            features[rec.key] = CandidateFeatures(rate=rate, fanout=fanout, persist=persist)
+
+    def close_state(self) -> DetectorState:
+        """Close the epoch and return its mergeable state (see `state`)."""
+        heavy = self._detector.end_epoch()
+        keys, counts = _distinct_records(heavy)
+        tracked = np.sort(np.fromiter(self._bytes.keys(), dtype=np.int64, count=len(self._bytes)))
+        tracked_bytes = np.fromiter(
+            (self._bytes[key] for key in tracked.tolist()), dtype=np.int64, count=len(tracked)
+        )
+        persist_keys, persist_counts = self._persist.items()
+        cfg = self._fanout_cfg
+        hll = cfg.mode == "hll-lite"
+        state = DetectorState(
+            fanout_mode="hll-lite" if hll else "bitmap",
+            width=(1 << cfg.hll_p) if hll else cfg.bitmap_bits,
+            reg_bits=cfg.hll_reg_bits if hll else 0,
+            heavy_keys=keys,
+            heavy_counts=counts,
+            sketch_keys=tracked,
+            sketch_rows=self._fanout.sketch_many(tracked),
+            sketch_bytes=tracked_bytes,
+            persist_keys=persist_keys,
+            persist_counts=persist_counts,
+        )
+        self._rotate_epoch(heavy, keys)
+        return state
+
+    def idle_epochs(self, count: int) -> EpochResult:
+        """Close `count` consecutive epochs in which no packet arrived.
+
+        Equivalent to `count` calls to `end_epoch` on an idle pipeline:
+        every such epoch has the same empty result, so only the first is
+        computed and persistence then decays by the remaining epochs at once.
+        """
+        return self._scorer.score(self.idle_features(count))
+
+    def idle_features(self, count: int) -> EpochFeatures:
+        """`close_features` counterpart of `idle_epochs`."""
+        if count <= 0:
+            raise ValueError(f"idle_epochs count must be positive: {count}")
+        features = self.close_features()
+        if count > 1:
+            self._persist.decay(count - 1)
         return features
 
-    def _rotate_epoch(self, heavy_keys: Set[int]) -> None:
-        for key in heavy_keys:
-            self._persist[key] = min(self._epoch_cfg.persist_k, self._persist.get(key, 0) + 1)
-        for key in list(self._persist.keys()):
-            if key not in heavy_keys:
-                self._persist[key] = max(0, self._persist[key] - 1)
-                if self._persist[key] == 0:
-                    self._persist.pop(key, None)
-        self._candidates = set(heavy_keys)
+    def _feature_arrays(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        count = len(keys)
+        key_list = keys.tolist()
+        byte_counts = np.fromiter(
+            (self._bytes.get(key, 0) for key in key_list), dtype=np.float64, count=count
+        )
+        rates = byte_counts / max(1.0, self._epoch_cfg.epoch_ms / 1000.0)
+        fanouts = np.asarray(self._fanout.estimate_many(key_list), dtype=np.float64)
+        persists = self._persist.get_many(keys)
+        return rates, fanouts, persists
+
+    def _rotate_epoch(self, heavy: List[FlowRecord], keys: np.ndarray) -> None:
+        """Start the next epoch; `keys` are the distinct keys of `heavy`."""
+        self._persist.update(keys)
+        self._candidates = set(keys.tolist())
+        self._candidate_array = keys
+        if self._online is not None:
+            ranked = sorted(heavy, key=lambda rec: rec.count, reverse=True)
+            self._online.reset(rec.key for rec in ranked)
         self._bytes.clear()
         self._fanout.reset()
         self._detector.reset()
 
 
+def _distinct_records(heavy: List[FlowRecord]) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct keys of `heavy` in first-seen order, with their first counts."""
+    count = len(heavy)
+    keys = np.fromiter((rec.key for rec in heavy), dtype=np.int64, count=count)
+    counts = np.fromiter((rec.count for rec in heavy), dtype=np.int64, count=count)
+    _, first = np.unique(keys, return_index=True)
+    if len(first) < count:
+        first.sort()
+        keys, counts = keys[first], counts[first]
+    return keys, counts
+
+
+class StateAggregator:
+    """Controller-side detection over states merged from many detectors.
+
+    Keeps its own normalization and queue-mapping state across epochs, as
+    a single EpochManager would. `counts` is the `merge_states` mode.
+    """
+
+    def __init__(
+        self,
+        score_cfg: ScoreConfig,
+        queue_cfg: QueueConfig,
+        epoch_cfg: EpochConfig,
+        counts: str = "sum",
+    ) -> None:
+        if counts not in MERGE_MODES:
+            raise ValueError(f"Unsupported merge mode: {counts}")
+        self._scorer = EpochScorer(score_cfg, queue_cfg)
+        self._epoch_cfg = epoch_cfg
+        self._counts = counts
+
+    def aggregate(self, states: Sequence[DetectorState]) -> EpochResult:
+        merged = merge_states(states, self._counts)
+        return self._scorer.score(EpochFeatures.from_state(merged, self._epoch_cfg))
+
+
 @dataclass
 class MultiEpochResult:
     results: Dict[str, EpochResult]
 
 
 class MultiKeyEpochManager:
-    """Runs MS-SatShield for src/dst keys in parallel."""
+    """Runs MS-SatShield for src/dst keys in parallel.
+
+    With `shards > 1` each side's keys are hash-partitioned across that
+    many pipelines (see `sharding`), run in worker processes or inline
+    per `shard_mode`; call `close()` to stop the workers.
+    """
 
     def __init__(
         self,
@@ -111,19 +401,32 @@ class MultiKeyEpochManager:
         queue_cfg: QueueConfig,
         epoch_cfg: EpochConfig,
         key_mode: str = "src+dst",
+        shards: int = 1,
+        shard_mode: str = "process",  # process | inline
     ) -> None:
         self.key_mode = key_mode
+        sides = [side for side in ("src", "dst") if key_mode in (side, "src+dst")]
+        if not sides:
+            raise ValueError(f"Unsupported key_mode: {key_mode}")
+        if shards <= 0:
+            raise ValueError(f"shards must be positive: {shards}")
+        self._pool = None
         self._managers: Dict[str, EpochManager] = {}
-        if key_mode in ("src", "src+dst"):
-            self._managers["src"] = EpochManager(
-                topk_cfg, fanout_cfg, score_cfg, queue_cfg, epoch_cfg
-            )
-        if key_mode in ("dst", "src+dst"):
-            self._managers["dst"] = EpochManager(
-                topk_cfg, fanout_cfg, score_cfg, queue_cfg, epoch_cfg
+        if shards == 1:
+            for side in sides:
+                self._managers[side] = EpochManager(
+                    topk_cfg, fanout_cfg, score_cfg, queue_cfg, epoch_cfg
+                )
+            return
+        from .sharding import ShardedEpochManager, ShardPool
+
+        self._pool = ShardPool(
+            topk_cfg, fanout_cfg, score_cfg, queue_cfg, epoch_cfg, sides, shards, shard_mode
+        )
+        for side in sides:
+            self._managers[side] = ShardedEpochManager(  # type: ignore[assignment]
+                self._pool, side, score_cfg, queue_cfg
             )
-        if not self._managers:
-            raise ValueError(f"Unsupported key_mode: {key_mode}")
 
     def on_packet(self, src: int, dst: int, size: int) -> None:
         manager = self._managers.get("src")
@@ -133,7 +436,29 @@ class MultiKeyEpochManager:
         if manager is not None:
             manager.on_packet(dst, src, size)
 
+    def on_batch(self, src: np.ndarray, dst: np.ndarray, size: np.ndarray) -> None:
+        manager = self._managers.get("src")
+        if manager is not None:
+            manager.on_batch(src, dst, size)
+        manager = self._managers.get("dst")
+        if manager is not None:
+            manager.on_batch(dst, src, size)
+
     def end_epoch(self) -> MultiEpochResult:
         return MultiEpochResult(
             results={key: mgr.end_epoch() for key, mgr in self._managers.items()}
         )
+
+    def idle_epochs(self, count: int) -> MultiEpochResult:
+        return MultiEpochResult(
+            results={key: mgr.idle_epochs(count) for key, mgr in self._managers.items()}
+        )
+
+    def close_state(self) -> Dict[str, DetectorState]:
+        """Close the epoch and return each side's mergeable state."""
+        return {key: mgr.close_state() for key, mgr in self._managers.items()}
+
+    def close(self) -> None:
+        """Stop shard workers, if any; a no-op for unsharded managers."""
+        if self._pool is not None:
+            self._pool.close()
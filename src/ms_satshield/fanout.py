@@ -5,16 +5,39 @@ from __future__ import annotations
 import math
 from typing import Dict, Iterable, List
 
+import numpy as np
+
 from .config import FanoutConfig
+from .hashing import HashFamily
 
 
 class FanoutEstimator:
     def update(self, key: int, other: int) -> None:
         raise NotImplementedError
 
+    def update_many(self, keys: np.ndarray, others: np.ndarray) -> None:
+        update = self.update
+        for key, other in zip(keys.tolist(), others.tolist()):
+            update(key, other)
+
     def estimate(self, key: int) -> float:
         raise NotImplementedError
 
+    def estimate_many(self, keys: Iterable[int]) -> np.ndarray:
+        return np.fromiter((self.estimate(key) for key in keys), dtype=np.float64)
+
+    def sketch_many(self, keys: np.ndarray) -> np.ndarray:
+        """Raw per-key sketches as uint8 rows, mergeable across estimators.
+
+        Bitmaps are packed ``ceil(bitmap_bits / 8)`` bytes per row (bit i in
+        byte ``i >> 3``, least significant bit first); HLL rows hold one
+        register per byte. Untracked keys get all-zero rows.
+        """
+        raise NotImplementedError
+
+    def discard(self, key: int) -> None:
+        raise NotImplementedError
+
     def reset(self) -> None:
         raise NotImplementedError
 
@@ -22,14 +45,21 @@ class FanoutEstimator:
 class BitmapEstimator(FanoutEstimator):
     def __init__(self, config: FanoutConfig) -> None:
         self._bits = config.bitmap_bits
+        self._hashes = HashFamily(config.hash_seed, config.hash_mode)
         self._maps: Dict[int, int] = {}
 
     def update(self, key: int, other: int) -> None:
-        idx = self._hash(other) % self._bits
+        idx = self._hashes.hash(other) % self._bits
         bitset = self._maps.get(key, 0)
         bitset |= 1 << idx
         self._maps[key] = bitset
 
+    def update_many(self, keys: np.ndarray, others: np.ndarray) -> None:
+        bits = self._hashes.hash_many(others) % self._bits
+        maps = self._maps
+        for key, idx in zip(keys.tolist(), bits.tolist()):
+            maps[key] = maps.get(key, 0) | (1 << idx)
+
     def estimate(self, key: int) -> float:
         bitset = self._maps.get(key, 0)
         zeros = self._bits - bitset.bit_count()
@@ -37,27 +67,235 @@ class BitmapEstimator(FanoutEstimator):
             return float(self._bits)
         return -self._bits * math.log(zeros / self._bits)
 
+    def sketch_many(self, keys: np.ndarray) -> np.ndarray:
+        width = (self._bits + 7) // 8
+        maps = self._maps
+        packed = b"".join(maps.get(key, 0).to_bytes(width, "little") for key in keys.tolist())
+        return np.frombuffer(packed, dtype=np.uint8).reshape(len(keys), width).copy()
+
+    def discard(self, key: int) -> None:
+        self._maps.pop(key, None)
+
     def reset(self) -> None:
         self._maps.clear()
 
-    @staticmethod
-    def _hash(value: int) -> int:
-        return hash(value) & 0xFFFFFFFF
+
+class _CandidateRows:
+    """Key -> row allocator owning the fixed `capacity`-row matrix of an estimator.
+
+    Keys arriving while every row is in use get a standalone spill row
+    (counted in `overflow`), so they are still estimated exactly. Rows are
+    zeroed when (re)allocated, so `reset` only drops the key maps.
+    """
+
+    def __init__(self, capacity: int, width: int, dtype: type) -> None:
+        self.matrix = np.zeros((max(capacity, 1), width), dtype=dtype)
+        self._rows: Dict[int, int] = {}
+        self._spill: Dict[int, np.ndarray] = {}
+        self._free: List[int] = []
+        self._next = 0
+
+    @property
+    def overflow(self) -> int:
+        return len(self._spill)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(row.nbytes for row in self._spill.values())
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        rows = self._rows
+        return np.fromiter(
+            (rows.get(key, -1) for key in keys.tolist()), dtype=np.int64, count=len(keys)
+        )
+
+    def row(self, key: int) -> np.ndarray:
+        """Writable sketch row of `key`, allocating it if needed."""
+        row = self.allocate(key)
+        return self.matrix[row] if row >= 0 else self._spill[key]
+
+    def allocate(self, key: int) -> int:
+        """Matrix row of `key`, or -1 if it lives in a spill row."""
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        if key in self._spill:
+            return -1
+        if self._free:
+            row = self._free.pop()
+        elif self._next < self.matrix.shape[0]:
+            row = self._next
+            self._next += 1
+        else:
+            self._spill[key] = np.zeros(self.matrix.shape[1], dtype=self.matrix.dtype)
+            return -1
+        self.matrix[row] = 0
+        self._rows[key] = row
+        return row
+
+    def allocate_many(self, keys: np.ndarray) -> np.ndarray:
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        rows = np.fromiter(
+            (self.allocate(key) for key in uniq.tolist()), dtype=np.int64, count=uniq.size
+        )
+        return rows[inverse]
+
+    def scatter(
+        self, ufunc: np.ufunc, keys: np.ndarray, rows: np.ndarray, cols: np.ndarray, values: np.ndarray
+    ) -> None:
+        """Apply ``ufunc.at`` at (row, col) for allocated `rows` of `keys`."""
+        spilled = rows < 0
+        if not spilled.any():
+            ufunc.at(self.matrix, (rows, cols), values)
+            return
+        kept = ~spilled
+        ufunc.at(self.matrix, (rows[kept], cols[kept]), values[kept])
+        for key, col, value in zip(keys[spilled].tolist(), cols[spilled].tolist(), values[spilled]):
+            row = self._spill[key]
+            row[col] = ufunc(row[col], value)
+
+    def gather(self, keys: np.ndarray) -> np.ndarray:
+        """Copy of the sketch rows of `keys` (zero rows for untracked keys)."""
+        rows = self.get_many(keys)
+        out = np.zeros((rows.size, self.matrix.shape[1]), dtype=self.matrix.dtype)
+        tracked = rows >= 0
+        out[tracked] = self.matrix[rows[tracked]]
+        if self._spill:
+            for pos in np.flatnonzero(~tracked).tolist():
+                spilled = self._spill.get(int(keys[pos]))
+                if spilled is not None:
+                    out[pos] = spilled
+        return out
+
+    def discard(self, key: int) -> None:
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._free.append(row)
+        else:
+            self._spill.pop(key, None)
+
+    def reset(self) -> None:
+        self._rows = {}
+        self._spill = {}
+        self._free = []
+        self._next = 0
+
+
+class PackedBitmapEstimator(FanoutEstimator):
+    """Bitmap estimator with one row of uint64 words per candidate.
+
+    State is a fixed `candidate_k x ceil(bitmap_bits / 64)` matrix (keys
+    beyond `candidate_k` spill, see `overflow`), and `estimate_many`
+    computes linear-counting estimates for a whole candidate set at once.
+    """
+
+    def __init__(self, config: FanoutConfig) -> None:
+        self._bits = config.bitmap_bits
+        self._hashes = HashFamily(config.hash_seed, config.hash_mode)
+        words = (config.bitmap_bits + 63) // 64
+        self._rows = _CandidateRows(config.candidate_k, words, np.uint64)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._rows.nbytes
+
+    @property
+    def overflow(self) -> int:
+        """Tracked keys held outside the `candidate_k`-row matrix."""
+        return self._rows.overflow
+
+    def update(self, key: int, other: int) -> None:
+        idx = self._hashes.hash(other) % self._bits
+        self._rows.row(key)[idx >> 6] |= np.uint64(1 << (idx & 63))
+
+    def update_many(self, keys: np.ndarray, others: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        rows = self._rows.allocate_many(keys)
+        idx = self._hashes.hash_many(others) % self._bits
+        bits = np.left_shift(np.uint64(1), (idx & 63).astype(np.uint64))
+        self._rows.scatter(np.bitwise_or, keys, rows, idx >> 6, bits)
+
+    def estimate(self, key: int) -> float:
+        return float(self.estimate_many([key])[0])
+
+    def estimate_many(self, keys: Iterable[int]) -> np.ndarray:
+        words = self._rows.gather(np.asarray(list(keys), dtype=np.int64))
+        return _bitmap_estimates(_popcount_rows(words), self._bits)
+
+    def sketch_many(self, keys: np.ndarray) -> np.ndarray:
+        words = self._rows.gather(np.asarray(keys, dtype=np.int64)).astype("<u8", copy=False)
+        return words.view(np.uint8)[:, : (self._bits + 7) // 8].copy()
+
+    def discard(self, key: int) -> None:
+        self._rows.discard(key)
+
+    def reset(self) -> None:
+        self._rows.reset()
+
+
+def _bitmap_estimates(ones: np.ndarray, bits: int) -> np.ndarray:
+    """Linear-counting estimates from per-row set-bit counts."""
+    zeros = bits - ones
+    with np.errstate(divide="ignore"):
+        est = -bits * np.log(zeros / bits)
+    return np.where(zeros == 0, float(bits), est)
+
+
+def _hll_estimates(regs: np.ndarray) -> np.ndarray:
+    """HLL estimates (with small-range correction) of uint8 register rows."""
+    m = regs.shape[1]
+    inv_sum = np.ldexp(1.0, -regs.astype(np.int64)).sum(axis=1)
+    raw = HLLLiteEstimator._alpha_m(m) * (m ** 2) / inv_sum
+    zeros = (regs == 0).sum(axis=1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / zeros)
+    return np.where(small, linear, raw)
+
+
+def sketch_estimates(mode: str, bits: int, rows: np.ndarray) -> np.ndarray:
+    """Fan-out estimates of `sketch_many` rows produced in fan-out `mode`.
+
+    `bits` is the bitmap width; it is ignored for HLL rows.
+    """
+    if mode == "hll-lite":
+        return _hll_estimates(rows)
+    if mode != "bitmap":
+        raise ValueError(f"Unsupported fan-out mode: {mode}")
+    return _bitmap_estimates(_popcount_rows(rows), bits)
+
+
+def _popcount_rows(matrix: np.ndarray) -> np.ndarray:
+    bitwise_count = getattr(np, "bitwise_count", None)
+    if bitwise_count is not None:
+        return bitwise_count(matrix).sum(axis=1, dtype=np.int64)
+    as_bytes = matrix.view(np.uint8).reshape(matrix.shape[0], -1)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
 
 
 class HLLLiteEstimator(FanoutEstimator):
+    """HLL-lite registers per candidate key.
+
+    Ranks are clamped to what an `hll_reg_bits`-wide register can hold,
+    and estimates fall back to linear counting over empty registers in
+    the small range (raw estimate <= 2.5 m), where raw HLL is biased.
+    """
+
     def __init__(self, config: FanoutConfig) -> None:
         self._p = config.hll_p
         self._m = 1 << self._p
         self._reg_bits = config.hll_reg_bits
+        self._max_rank = (1 << config.hll_reg_bits) - 1
+        self._hashes = HashFamily(config.hash_seed, config.hash_mode)
         self._maps: Dict[int, List[int]] = {}
         self._alpha = self._alpha_m(self._m)
 
     def update(self, key: int, other: int) -> None:
-        y = self._hash(other)
+        y = self._hashes.hash(other)
         j = y & (self._m - 1)
         w = y >> self._p
-        rank = self._rho(w, 32 - self._p)
+        rank = min(self._rho(w, 32 - self._p), self._max_rank)
         regs = self._maps.get(key)
         if regs is None:
             regs = [0] * self._m
@@ -65,6 +303,19 @@ class HLLLiteEstimator(FanoutEstimator):
         if rank > regs[j]:
             regs[j] = rank
 
+    def update_many(self, keys: np.ndarray, others: np.ndarray) -> None:
+        y = self._hashes.hash_many(others)
+        js = y & (self._m - 1)
+        ranks = np.minimum(self._rho_many(y >> self._p, 32 - self._p), self._max_rank)
+        maps = self._maps
+        for key, j, rank in zip(keys.tolist(), js.tolist(), ranks.tolist()):
+            regs = maps.get(key)
+            if regs is None:
+                regs = [0] * self._m
+                maps[key] = regs
+            if rank > regs[j]:
+                regs[j] = rank
+
     def estimate(self, key: int) -> float:
         regs = self._maps.get(key)
         if regs is None:
@@ -72,21 +323,38 @@ class HLLLiteEstimator(FanoutEstimator):
         inv_sum = sum(2.0 ** (-r) for r in regs)
         if inv_sum == 0:
             return 0.0
-        return self._alpha * (self._m ** 2) / inv_sum
+        raw = self._alpha * (self._m ** 2) / inv_sum
+        zeros = regs.count(0)
+        if raw <= 2.5 * self._m and zeros:
+            return self._m * math.log(self._m / zeros)
+        return raw
+
+    def sketch_many(self, keys: np.ndarray) -> np.ndarray:
+        if self._reg_bits > 8:
+            raise ValueError(f"hll_reg_bits must fit in uint8 registers: {self._reg_bits}")
+        empty = [0] * self._m
+        maps = self._maps
+        rows = [maps.get(key, empty) for key in keys.tolist()]
+        return np.array(rows, dtype=np.uint8).reshape(len(rows), self._m)
+
+    def discard(self, key: int) -> None:
+        self._maps.pop(key, None)
 
     def reset(self) -> None:
         self._maps.clear()
 
-    @staticmethod
-    def _hash(value: int) -> int:
-        return hash(value) & 0xFFFFFFFF
-
     @staticmethod
     def _rho(value: int, bits: int) -> int:
         if value == 0:
             return bits + 1
         return bits - value.bit_length() + 1
 
+    @staticmethod
+    def _rho_many(values: np.ndarray, bits: int) -> np.ndarray:
+        # frexp's exponent is the bit length for integers below 2**53 (0 for 0).
+        bit_length = np.frexp(values.astype(np.float64))[1]
+        return bits - bit_length.astype(np.int64) + 1
+
     @staticmethod
     def _alpha_m(m: int) -> float:
         if m == 16:
@@ -96,3 +364,74 @@ class HLLLiteEstimator(FanoutEstimator):
         if m == 64:
             return 0.709
         return 0.7213 / (1 + 1.079 / m)
+
+
+class HLLRegisterEstimator(FanoutEstimator):
+    """HLL-lite with a fixed `candidate_k x 2**hll_p` uint8 register matrix.
+
+    Same hashing, rank clamping and small-range correction as
+    `HLLLiteEstimator`, but updates are a single `maximum.at` scatter and
+    `estimate_many` evaluates every candidate row in one pass.
+    """
+
+    def __init__(self, config: FanoutConfig) -> None:
+        if config.hll_reg_bits > 8:
+            raise ValueError(f"hll_reg_bits must fit in uint8 registers: {config.hll_reg_bits}")
+        self._p = config.hll_p
+        self._m = 1 << self._p
+        self._max_rank = (1 << config.hll_reg_bits) - 1
+        self._hashes = HashFamily(config.hash_seed, config.hash_mode)
+        self._rows = _CandidateRows(config.candidate_k, self._m, np.uint8)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._rows.nbytes
+
+    @property
+    def overflow(self) -> int:
+        """Tracked keys held outside the `candidate_k`-row matrix."""
+        return self._rows.overflow
+
+    def update(self, key: int, other: int) -> None:
+        regs = self._rows.row(key)
+        y = self._hashes.hash(other)
+        j = y & (self._m - 1)
+        rank = min(HLLLiteEstimator._rho(y >> self._p, 32 - self._p), self._max_rank)
+        if rank > regs[j]:
+            regs[j] = rank
+
+    def update_many(self, keys: np.ndarray, others: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        rows = self._rows.allocate_many(keys)
+        y = self._hashes.hash_many(others)
+        ranks = np.minimum(HLLLiteEstimator._rho_many(y >> self._p, 32 - self._p), self._max_rank)
+        self._rows.scatter(np.maximum, keys, rows, y & (self._m - 1), ranks.astype(np.uint8))
+
+    def estimate(self, key: int) -> float:
+        return float(self.estimate_many([key])[0])
+
+    def estimate_many(self, keys: Iterable[int]) -> np.ndarray:
+        # All-zero (untracked) rows estimate 0 through the linear-counting branch.
+        return _hll_estimates(self._rows.gather(np.asarray(list(keys), dtype=np.int64)))
+
+    def sketch_many(self, keys: np.ndarray) -> np.ndarray:
+        return self._rows.gather(np.asarray(keys, dtype=np.int64))
+
+    def discard(self, key: int) -> None:
+        self._rows.discard(key)
+
+    def reset(self) -> None:
+        self._rows.reset()
+
+
+def make_fanout_estimator(config: FanoutConfig) -> FanoutEstimator:
+    if config.backend == "array":
+        if config.mode == "hll-lite":
+            return HLLRegisterEstimator(config)
+        return PackedBitmapEstimator(config)
+    if config.backend != "dict":
+        raise ValueError(f"Unsupported fan-out backend: {config.backend}")
+    if config.mode == "hll-lite":
+        return HLLLiteEstimator(config)
+    return BitmapEstimator(config)
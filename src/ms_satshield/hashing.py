@@ -0,0 +1,92 @@
+"""Seeded 32-bit hash family shared by the detector and fan-out estimators.
+
+Modes: ``mix`` (splitmix64-style) and ``crc32`` (zlib CRC-32 of the big-endian key).
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Dict
+
+import numpy as np
+
+_MASK32 = 0xFFFFFFFF
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+
+def _mix64(value: int) -> int:
+    value = ((value ^ (value >> 30)) * _MIX1) & _MASK64
+    value = ((value ^ (value >> 27)) * _MIX2) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _crc32_table() -> np.ndarray:
+    table = np.arange(256, dtype=np.uint32)
+    for _ in range(8):
+        table = np.where(table & 1, (table >> 1) ^ np.uint32(0xEDB88320), table >> 1)
+    return table.astype(np.uint32)
+
+
+_CRC32_TABLE = _crc32_table()
+
+
+class HashFamily:
+    """Family of 32-bit hashes indexed by a small integer salt."""
+
+    def __init__(self, seed: int = 0, mode: str = "mix") -> None:
+        if mode not in ("mix", "crc32"):
+            raise ValueError(f"Unsupported hash mode: {mode}")
+        self.seed = seed
+        self.mode = mode
+        self._salts: Dict[int, int] = {}
+
+    def hash(self, value: int, salt: int = 0) -> int:
+        init = self._salts.get(salt)
+        if init is None:
+            init = self._salt_init(salt)
+        if self.mode == "crc32":
+            return zlib.crc32((value & _MASK64).to_bytes(8, "big"), init)
+        return _mix64((value ^ init) & _MASK64) >> 32
+
+    def hash_many(self, values: np.ndarray, salt: int = 0) -> np.ndarray:
+        """Vectorized `hash` over an int64/uint64 array; returns int64."""
+        init = self._salts.get(salt)
+        if init is None:
+            init = self._salt_init(salt)
+        keys = np.asarray(values).astype(np.uint64, copy=False)
+        if self.mode == "crc32":
+            return self._crc32_many(keys, init)
+        x = keys ^ np.uint64(init)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(_MIX1)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(_MIX2)
+        x = x ^ (x >> np.uint64(31))
+        return (x >> np.uint64(32)).astype(np.int64)
+
+    def index(self, value: int, salt: int, buckets: int) -> int:
+        return self.hash(value, salt) % buckets
+
+    def indices(self, values: np.ndarray, stages: int, buckets: int) -> np.ndarray:
+        """Bucket index of every value under salts 0..stages-1, shape (n, stages)."""
+        out = np.empty((len(values), stages), dtype=np.int64)
+        for salt in range(stages):
+            out[:, salt] = self.hash_many(values, salt) % buckets
+        return out
+
+    def _salt_init(self, salt: int) -> int:
+        if self.mode == "crc32":
+            init = zlib.crc32(salt.to_bytes(4, "big"), self.seed & _MASK32)
+        else:
+            init = _mix64((self.seed * _GOLDEN + salt + 1) & _MASK64)
+        self._salts[salt] = init
+        return init
+
+    @staticmethod
+    def _crc32_many(keys: np.ndarray, init: int) -> np.ndarray:
+        crc = np.full(keys.shape, init ^ _MASK32, dtype=np.uint32)
+        for shift in range(56, -8, -8):
+            byte = ((keys >> np.uint64(shift)) & np.uint64(0xFF)).astype(np.uint32)
+            crc = _CRC32_TABLE[(crc ^ byte) & np.uint32(0xFF)] ^ (crc >> np.uint32(8))
+        return (crc ^ np.uint32(_MASK32)).astype(np.int64)
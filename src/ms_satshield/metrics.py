@@ -40,3 +40,21 @@ def throughput_drop(before: float, during: float) -> float:
     if before <= 0:
         return 0.0
     return max(0.0, (before - during) / before)
+
+
+def first_detection_ms(
+    flagged_by_epoch: Iterable[Iterable[int]],
+    truth: Iterable[int],
+    epoch_ms: float,
+) -> float:
+    """End of the first epoch whose flagged keys include an attack key.
+
+    Mitigation decisions take effect at epoch boundaries, so this is the
+    `mitigation_start_ms` to pass to `reaction_time`. Returns inf if no
+    attack key is ever flagged.
+    """
+    truth_set = set(truth)
+    for idx, flagged in enumerate(flagged_by_epoch):
+        if truth_set.intersection(flagged):
+            return (idx + 1) * epoch_ms
+    return float("inf")
@@ -0,0 +1,188 @@
+"""Per-key persistence counters across epochs.
+
+A key's persistence rises by one (saturating at `persist_k`) in every
+epoch it is heavy and falls by one in every epoch it is not; keys are
+forgotten when it reaches zero.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .config import EpochConfig
+from .hashing import HashFamily
+
+
+class PersistenceTracker:
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        """Persistence of every key (0 if untracked), as float64."""
+        raise NotImplementedError
+
+    def update(self, heavy: np.ndarray) -> None:
+        """Close an epoch whose distinct heavy keys are `heavy`."""
+        raise NotImplementedError
+
+    def decay(self, epochs: int) -> None:
+        """Close `epochs` epochs without heavy keys."""
+        raise NotImplementedError
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Tracked keys and their counters (int64), sorted by key."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class DictPersistence(PersistenceTracker):
+    def __init__(self, config: EpochConfig) -> None:
+        self._persist_k = config.persist_k
+        self._counts: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        counts = self._counts
+        return np.fromiter(
+            (counts.get(key, 0) for key in np.asarray(keys).tolist()),
+            dtype=np.float64,
+            count=len(keys),
+        )
+
+    def update(self, heavy: np.ndarray) -> None:
+        heavy_keys = set(np.asarray(heavy).tolist())
+        counts = self._counts
+        for key in heavy_keys:
+            counts[key] = min(self._persist_k, counts.get(key, 0) + 1)
+        for key in list(counts.keys()):
+            if key not in heavy_keys:
+                counts[key] = max(0, counts[key] - 1)
+                if counts[key] == 0:
+                    counts.pop(key, None)
+
+    def decay(self, epochs: int) -> None:
+        self._counts = {key: p - epochs for key, p in self._counts.items() if p > epochs}
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(self._counts)
+        keys = np.fromiter(self._counts.keys(), dtype=np.int64, count=count)
+        values = np.fromiter(self._counts.values(), dtype=np.int64, count=count)
+        order = np.argsort(keys)
+        return keys[order], values[order]
+
+
+class ArrayPersistence(PersistenceTracker):
+    """Fixed-capacity open-addressed table of saturating uint8 counters.
+
+    Models a bounded data-plane register table: keys are linearly probed
+    for at most `persist_probes` slots, a zero counter marks a free slot,
+    and keys that find no free slot are not tracked (counted in
+    `overflow`). Updates and decay run over the whole table at once. A
+    slot freed by decay is reused by later inserts but still continues
+    probe chains, so tracked keys never move and are never lost.
+    """
+
+    def __init__(self, config: EpochConfig) -> None:
+        if not 0 < config.persist_k <= 255:
+            raise ValueError(
+                f"persist_k must be in [1, 255] for the array tracker: {config.persist_k}"
+            )
+        if config.persist_capacity <= 0 or config.persist_probes <= 0:
+            raise ValueError("persist_capacity and persist_probes must be positive")
+        self._persist_k = config.persist_k
+        self.capacity = config.persist_capacity
+        self.probes = config.persist_probes
+        self._hashes = HashFamily()
+        self._keys = np.zeros(self.capacity, dtype=np.int64)
+        self._counts = np.zeros(self.capacity, dtype=np.uint8)
+        # Slots that ever held a key; a never-used slot ends a probe chain.
+        self._used = np.zeros(self.capacity, dtype=bool)
+        self.overflow = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._counts))
+
+    @property
+    def memory_bytes(self) -> int:
+        return int(self._keys.nbytes + self._counts.nbytes + self._used.nbytes)
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64)
+        slots = self._find(keys)
+        values = np.zeros(len(keys), dtype=np.float64)
+        found = slots >= 0
+        values[found] = self._counts[slots[found]]
+        return values
+
+    def update(self, heavy: np.ndarray) -> None:
+        heavy = np.asarray(heavy, dtype=np.int64)
+        slots = self._find(heavy)
+        hit = slots[slots >= 0]
+        counts = self._counts
+        decaying = counts > 0
+        decaying[hit] = False
+        counts[decaying] -= 1
+        counts[hit] = np.minimum(counts[hit], self._persist_k - 1) + 1
+        fresh = heavy[slots < 0]
+        self._insert(fresh, np.ones(len(fresh), dtype=np.uint8))
+
+    def decay(self, epochs: int) -> None:
+        counts = self._counts
+        counts -= np.minimum(counts, min(epochs, 255)).astype(np.uint8)
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        live = np.flatnonzero(self._counts)
+        order = np.argsort(self._keys[live])
+        live = live[order]
+        return self._keys[live], self._counts[live].astype(np.int64)
+
+    def _start(self, keys: np.ndarray) -> np.ndarray:
+        return self._hashes.hash_many(keys) % self.capacity
+
+    def _find(self, keys: np.ndarray) -> np.ndarray:
+        """Slot of every key, or -1 where it is not tracked."""
+        slots = np.full(len(keys), -1, dtype=np.int64)
+        pos = self._start(keys)
+        pending = np.arange(len(keys))
+        for _ in range(self.probes):
+            if not pending.size:
+                break
+            probe = pos[pending]
+            occupied = self._counts[probe] > 0
+            match = occupied & (self._keys[probe] == keys[pending])
+            slots[pending[match]] = probe[match]
+            # A never-used slot ends the chain: the key is absent.
+            pending = pending[self._used[probe] & ~match]
+            pos[pending] = (pos[pending] + 1) % self.capacity
+        return slots
+
+    def _insert(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """Insert distinct, untracked keys; at most one key claims a slot per step."""
+        pos = self._start(keys)
+        pending = np.arange(len(keys))
+        for _ in range(self.probes):
+            if not pending.size:
+                break
+            probe = pos[pending]
+            free = self._counts[probe] == 0
+            slots, first = np.unique(probe[free], return_index=True)
+            winners = pending[free][first]
+            self._keys[slots] = keys[winners]
+            self._counts[slots] = counts[winners]
+            self._used[slots] = True
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            pos[pending] = (pos[pending] + 1) % self.capacity
+        self.overflow += int(pending.size)
+
+
+def make_persistence_tracker(config: EpochConfig) -> PersistenceTracker:
+    if config.persist_backend == "array":
+        return ArrayPersistence(config)
+    if config.persist_backend != "dict":
+        raise ValueError(f"Unsupported persistence backend: {config.persist_backend}")
+    return DictPersistence(config)
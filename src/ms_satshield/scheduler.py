@@ -6,6 +6,8 @@ import math
 from dataclasses import dataclass
 from typing import Iterable, List
 
+import numpy as np
+
 from .config import QueueConfig
 
 
@@ -21,9 +23,8 @@ class QueueMapper:
 
     def update(self, scores: Iterable[float]) -> None:
         if self.config.mapping == "quantile":
-            self._mapping.thresholds = _quantile_thresholds(
-                list(scores), self.config.num_queues
-            )
+            values = scores if isinstance(scores, np.ndarray) else np.fromiter(scores, np.float64)
+            self._mapping.thresholds = _quantile_thresholds(values, self.config.num_queues)
         else:
             self._mapping.thresholds = []
 
@@ -35,16 +36,27 @@ class QueueMapper:
             return self.config.num_queues - 1
         return _sigmoid_bucket(score, self.config.num_queues)
 
+    def map_many(self, scores: np.ndarray) -> np.ndarray:
+        """Vectorized `map_score`; returns int64 queue indices."""
+        scores = np.asarray(scores, dtype=np.float64)
+        top = self.config.num_queues - 1
+        if self.config.mapping == "quantile":
+            thresholds = self._mapping.thresholds
+            if not thresholds:
+                return np.full(scores.shape, top, dtype=np.int64)
+            # First threshold >= score, i.e. the linear scan in map_score.
+            return np.searchsorted(np.asarray(thresholds), scores, side="left").astype(np.int64)
+        s = 1.0 / (1.0 + np.exp(-6.0 * (scores - 0.5)))
+        return np.clip((s * top).astype(np.int64), 0, top)
+
 
-def _quantile_thresholds(scores: List[float], num_queues: int) -> List[float]:
-    if not scores:
+def _quantile_thresholds(scores: np.ndarray, num_queues: int) -> List[float]:
+    """Scores at ranks ``int(q * n / num_queues)``, by O(n) selection."""
+    count = len(scores)
+    if not count:
         return []
-    scores.sort()
-    thresholds = []
-    for q in range(1, num_queues):
-        idx = int(q * len(scores) / num_queues)
-        thresholds.append(scores[min(idx, len(scores) - 1)])
-    return thresholds
+    ranks = [min(int(q * count / num_queues), count - 1) for q in range(1, num_queues)]
+    return np.partition(scores, ranks)[ranks].tolist()
 
 
 def _sigmoid_bucket(score: float, num_queues: int) -> int:
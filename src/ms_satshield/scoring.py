@@ -3,21 +3,59 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, Mapping
+import math
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
 
 from .config import ScoreConfig
 
+# Logistic approximation of the standard normal CDF (max error ~0.01).
+_ZSCORE_SLOPE = 1.702
+
 
 @dataclass(frozen=True)
 class NormStats:
-    rate_p99: float
-    fanout_p99: float
+    """Per-epoch normalization statistics.
+
+    `*_scale` is the p99 or max in those modes and the standard deviation
+    in ``zscore`` mode, where `*_center` holds the mean. Persistence is
+    always normalized by its max.
+    """
+
+    rate_scale: float
+    fanout_scale: float
     persist_max: float
+    rate_center: float = 0.0
+    fanout_center: float = 0.0
+
+    @property
+    def rate_p99(self) -> float:
+        """Former name of `rate_scale`."""
+        return self.rate_scale
+
+    @property
+    def fanout_p99(self) -> float:
+        """Former name of `fanout_scale`."""
+        return self.fanout_scale
 
 
 class ScoreModel:
+    """Weighted sum of normalized rate, fan-out and persistence.
+
+    With `norm_ewma > 0`, the stats used for scoring are an exponentially
+    weighted average across epochs (`norm_ewma` is the weight kept from
+    earlier epochs), so scores do not jump when the candidate set shifts.
+    Epochs without candidates leave the average unchanged.
+    """
+
     def __init__(self, config: ScoreConfig) -> None:
+        if config.norm_mode not in ("p99", "max", "zscore"):
+            raise ValueError(f"Unsupported norm_mode: {config.norm_mode}")
+        if not 0.0 <= config.norm_ewma < 1.0:
+            raise ValueError(f"norm_ewma must be in [0, 1): {config.norm_ewma}")
         self.config = config
+        self._stats: Optional[NormStats] = None
 
     def compute_stats(
         self,
@@ -25,28 +63,123 @@ class ScoreModel:
         fanouts: Iterable[float],
         persists: Iterable[float],
     ) -> NormStats:
-        return NormStats(
-            rate_p99=_percentile(rates, 0.99),
-            fanout_p99=_percentile(fanouts, 0.99),
-            persist_max=max(persists, default=1.0),
+        rate_values = _as_array(rates)
+        fanout_values = _as_array(fanouts)
+        persist_values = _as_array(persists)
+        persist_max = float(persist_values.max()) if persist_values.size else 1.0
+        if self.config.norm_mode == "zscore":
+            rate_center, rate_scale = _mean_std(rate_values)
+            fanout_center, fanout_scale = _mean_std(fanout_values)
+        else:
+            q = 0.99 if self.config.norm_mode == "p99" else 1.0
+            rate_center = fanout_center = 0.0
+            rate_scale = _percentile(rate_values, q)
+            fanout_scale = _percentile(fanout_values, q)
+        stats = NormStats(
+            rate_scale=rate_scale,
+            fanout_scale=fanout_scale,
+            persist_max=persist_max,
+            rate_center=rate_center,
+            fanout_center=fanout_center,
         )
+        if self.config.norm_ewma <= 0.0:
+            return stats
+        if rate_values.size == 0:
+            return stats if self._stats is None else self._stats
+        if self._stats is not None:
+            stats = _blend(self._stats, stats, self.config.norm_ewma)
+        self._stats = stats
+        return stats
 
     def score(self, rate: float, fanout: float, persist: float, stats: NormStats) -> float:
-        nr = _normalize(rate, stats.rate_p99)
-        nf = _normalize(fanout, stats.fanout_p99)
-        np = _normalize(persist, stats.persist_max)
-        return self.config.alpha * nr + self.config.beta * nf + self.config.gamma * np
+        if self.config.norm_mode == "zscore":
+            nr = _zscore(rate, stats.rate_center, stats.rate_scale)
+            nf = _zscore(fanout, stats.fanout_center, stats.fanout_scale)
+        else:
+            nr = _normalize(rate, stats.rate_scale)
+            nf = _normalize(fanout, stats.fanout_scale)
+        np_ = _normalize(persist, stats.persist_max)
+        return self.config.alpha * nr + self.config.beta * nf + self.config.gamma * np_
+
+    def score_many(
+        self,
+        rates: np.ndarray,
+        fanouts: np.ndarray,
+        persists: np.ndarray,
+        stats: NormStats,
+    ) -> np.ndarray:
+        """Vectorized `score` over aligned feature arrays."""
+        if self.config.norm_mode == "zscore":
+            nr = _zscore_many(rates, stats.rate_center, stats.rate_scale)
+            nf = _zscore_many(fanouts, stats.fanout_center, stats.fanout_scale)
+        else:
+            nr = _normalize_many(rates, stats.rate_scale)
+            nf = _normalize_many(fanouts, stats.fanout_scale)
+        np_ = _normalize_many(persists, stats.persist_max)
+        return self.config.alpha * nr + self.config.beta * nf + self.config.gamma * np_
+
+    def reset(self) -> None:
+        self._stats = None
+
+
+def _as_array(values: Iterable[float]) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.fromiter(values, dtype=np.float64)
 
 
 def _percentile(values: Iterable[float], q: float) -> float:
-    items = sorted(values)
-    if not items:
+    """Element at rank ``int(q * (n - 1))``; O(n) selection, no full sort."""
+    items = _as_array(values)
+    if not items.size:
         return 1.0
-    idx = int(q * (len(items) - 1))
-    return items[idx]
+    idx = int(q * (items.size - 1))
+    return float(np.partition(items, idx)[idx])
+
+
+def _mean_std(values: np.ndarray) -> Tuple[float, float]:
+    if not values.size:
+        return 0.0, 1.0
+    return float(values.mean()), float(values.std())
+
+
+def _blend(previous: NormStats, current: NormStats, weight: float) -> NormStats:
+    def mix(old: float, new: float) -> float:
+        return weight * old + (1.0 - weight) * new
+
+    return NormStats(
+        rate_scale=mix(previous.rate_scale, current.rate_scale),
+        fanout_scale=mix(previous.fanout_scale, current.fanout_scale),
+        persist_max=mix(previous.persist_max, current.persist_max),
+        rate_center=mix(previous.rate_center, current.rate_center),
+        fanout_center=mix(previous.fanout_center, current.fanout_center),
+    )
 
 
 def _normalize(value: float, scale: float) -> float:
     if scale <= 0:
         return 0.0
     return min(1.0, value / scale)
+
+
+def _zscore(value: float, center: float, scale: float) -> float:
+    """Map a z-score into (0, 1); values at the mean score 0.5."""
+    if scale <= 0:
+        return 0.5
+    z = (value - center) / scale
+    return 1.0 / (1.0 + math.exp(-_ZSCORE_SLOPE * max(-40.0, min(40.0, z))))
+
+
+def _normalize_many(values: np.ndarray, scale: float) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if scale <= 0:
+        return np.zeros_like(values)
+    return np.minimum(1.0, values / scale)
+
+
+def _zscore_many(values: np.ndarray, center: float, scale: float) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if scale <= 0:
+        return np.full_like(values, 0.5)
+    z = np.clip((values - center) / scale, -40.0, 40.0)
+    return 1.0 / (1.0 + np.exp(-_ZSCORE_SLOPE * z))
@@ -0,0 +1,309 @@
+"""Hash-sharded MS-SatShield pipelines across worker processes.
+
+Keys are partitioned by a salted hash into `shards` disjoint slices. Each
+shard runs a full per-side pipeline (Top-k, fan-out, persistence) with
+the unsharded table geometry, so results match the unsharded detector
+whenever no two keys of an epoch share a Top-k bucket; under contention
+a shard only competes with its own slice, like a `shards` times larger
+table (and memory grows `shards` times).
+Shards hand back unscored features at the end of an epoch;
+normalization, scoring and queue mapping run once over the union, so the
+stats stay global.
+
+In ``process`` mode each shard is a worker process fed through a
+shared-memory buffer per side; ``inline`` runs the same shards in the
+calling process and produces identical results.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+import traceback
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+import weakref
+
+import numpy as np
+
+from .config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
+from .epoch import EpochFeatures, EpochManager, EpochResult, EpochScorer
+from .hashing import HashFamily
+from .state import DetectorState, merge_states
+
+_SHARD_SALT = 0x5348
+DEFAULT_SHARD_ROWS = 1 << 18
+
+_Configs = Tuple[TopKConfig, FanoutConfig, ScoreConfig, QueueConfig, EpochConfig]
+
+
+def _close_request(manager: EpochManager, kind: str, idle: int) -> Any:
+    if kind == "state":
+        return manager.close_state()
+    return manager.idle_features(idle) if idle else manager.close_features()
+
+
+class _InlineShard:
+    def __init__(self, sides: Sequence[str], configs: _Configs) -> None:
+        self._managers = {side: EpochManager(*configs) for side in sides}
+        self._result: Optional[Any] = None
+
+    def submit(self, side: str, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        self._managers[side].on_batch(keys, others, sizes)
+
+    def request(self, side: str, kind: str, idle: int) -> None:
+        self._result = _close_request(self._managers[side], kind, idle)
+
+    def result(self) -> Any:
+        result, self._result = self._result, None
+        assert result is not None
+        return result
+
+    def close(self) -> None:
+        self._managers.clear()
+
+
+class _ProcessShard:
+    """A shard in a worker process, fed through one shared buffer per side.
+
+    Submissions are asynchronous: a side's buffer is only rewritten after
+    the worker has acknowledged the previous batch in it.
+    """
+
+    def __init__(self, sides: Sequence[str], configs: _Configs, rows: int) -> None:
+        ctx = get_context()
+        self._rows = rows
+        self._buffers = {
+            side: SharedMemory(create=True, size=3 * rows * np.dtype(np.int64).itemsize)
+            for side in sides
+        }
+        self._views = {
+            side: np.ndarray((3, rows), dtype=np.int64, buffer=shm.buf)
+            for side, shm in self._buffers.items()
+        }
+        self._busy = {side: False for side in sides}
+        self._results: Deque[Any] = deque()
+        self._conn, child = ctx.Pipe()
+        names = {side: shm.name for side, shm in self._buffers.items()}
+        untrack = ctx.get_start_method() != "fork"
+        self._process = ctx.Process(
+            target=_serve, args=(child, names, rows, configs, untrack), daemon=True
+        )
+        self._process.start()
+        child.close()
+
+    def submit(self, side: str, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        view = self._views[side]
+        for start in range(0, len(keys), self._rows):
+            stop = min(len(keys), start + self._rows)
+            self._wait(side)
+            rows = stop - start
+            view[0, :rows] = keys[start:stop]
+            view[1, :rows] = others[start:stop]
+            view[2, :rows] = sizes[start:stop]
+            self._conn.send(("batch", side, rows))
+            self._busy[side] = True
+
+    def request(self, side: str, kind: str, idle: int) -> None:
+        self._conn.send((kind, side, idle))
+
+    def result(self) -> Any:
+        while not self._results:
+            self._receive()
+        return self._results.popleft()
+
+    def close(self) -> None:
+        if self._process.is_alive():
+            try:
+                self._conn.send(("close", None, 0))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._conn.close()
+        self._views.clear()
+        for shm in self._buffers.values():
+            shm.close()
+            shm.unlink()
+        self._buffers.clear()
+
+    def _wait(self, side: str) -> None:
+        while self._busy[side]:
+            self._receive()
+
+    def _receive(self) -> None:
+        kind, side, payload = self._conn.recv()
+        if kind == "ack":
+            self._busy[side] = False
+        elif kind == "result":
+            self._results.append(payload)
+        else:
+            raise RuntimeError(f"Shard worker failed:\n{payload}")
+
+
+def _serve(
+    conn: Connection,
+    names: Dict[str, str],
+    rows: int,
+    configs: _Configs,
+    untrack: bool,
+) -> None:
+    """Worker loop: one EpochManager per side over its shared buffer."""
+    side: Optional[str] = None
+    buffers: Dict[str, SharedMemory] = {}
+    views: Dict[str, np.ndarray] = {}
+    try:
+        for buffer_side, name in names.items():
+            buffers[buffer_side] = SharedMemory(name=name)
+        if untrack:
+            # The parent owns the segments; keep this process's tracker from unlinking them.
+            for shm in buffers.values():
+                resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        views = {
+            buffer_side: np.ndarray((3, rows), dtype=np.int64, buffer=shm.buf)
+            for buffer_side, shm in buffers.items()
+        }
+        managers = {buffer_side: EpochManager(*configs) for buffer_side in names}
+        while True:
+            kind, side, arg = conn.recv()
+            if kind == "batch":
+                view = views[side]
+                managers[side].on_batch(view[0, :arg], view[1, :arg], view[2, :arg])
+                conn.send(("ack", side, None))
+            elif kind in ("features", "state"):
+                conn.send(("result", side, _close_request(managers[side], kind, arg)))
+            else:
+                break
+    except Exception:
+        conn.send(("error", side, traceback.format_exc()))
+    finally:
+        views.clear()
+        for shm in buffers.values():
+            shm.close()
+        conn.close()
+
+
+def _close_shards(shards: List[object]) -> None:
+    for shard in shards:
+        shard.close()  # type: ignore[attr-defined]
+
+
+class ShardPool:
+    """Routes each side's batches to the shard that owns every key."""
+
+    def __init__(
+        self,
+        topk_cfg: TopKConfig,
+        fanout_cfg: FanoutConfig,
+        score_cfg: ScoreConfig,
+        queue_cfg: QueueConfig,
+        epoch_cfg: EpochConfig,
+        sides: Sequence[str],
+        shards: int,
+        mode: str = "process",
+        rows: int = DEFAULT_SHARD_ROWS,
+    ) -> None:
+        if shards <= 0:
+            raise ValueError(f"shards must be positive: {shards}")
+        if mode not in ("process", "inline"):
+            raise ValueError(f"Unsupported shard mode: {mode}")
+        configs: _Configs = (topk_cfg, fanout_cfg, score_cfg, queue_cfg, epoch_cfg)
+        self.rows = rows
+        self._hashes = HashFamily(topk_cfg.hash_seed, topk_cfg.hash_mode)
+        self._shards: List[object] = []
+        for _ in range(shards):
+            if mode == "process":
+                self._shards.append(_ProcessShard(sides, configs, rows))
+            else:
+                self._shards.append(_InlineShard(sides, configs))
+        self._finalizer = weakref.finalize(self, _close_shards, self._shards)
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def dispatch(self, side: str, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        keys = np.asarray(keys, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        if not keys.size:
+            return
+        shards = self._shards
+        if len(shards) == 1:
+            shards[0].submit(side, keys, others, sizes)  # type: ignore[attr-defined]
+            return
+        owner = self._hashes.hash_many(keys, _SHARD_SALT) % len(shards)
+        # Stable, so every shard sees its rows in stream order.
+        order = np.argsort(owner, kind="stable")
+        bounds = np.searchsorted(owner[order], np.arange(len(shards) + 1)).tolist()
+        for shard, start, stop in zip(shards, bounds, bounds[1:]):
+            if stop > start:
+                rows = order[start:stop]
+                shard.submit(side, keys[rows], others[rows], sizes[rows])  # type: ignore[attr-defined]
+
+    def collect(self, side: str, idle: int = 0) -> EpochFeatures:
+        """Close the epoch (or `idle` empty epochs) on every shard."""
+        return EpochFeatures.concat(self._close_all(side, "features", idle))
+
+    def collect_state(self, side: str) -> DetectorState:
+        """Close the epoch on every shard and merge their (key-disjoint) states."""
+        return merge_states(self._close_all(side, "state", 0))
+
+    def _close_all(self, side: str, kind: str, idle: int) -> List[Any]:
+        for shard in self._shards:
+            shard.request(side, kind, idle)  # type: ignore[attr-defined]
+        return [shard.result() for shard in self._shards]  # type: ignore[attr-defined]
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+class ShardedEpochManager:
+    """EpochManager interface over one side of a ShardPool.
+
+    Per-packet input is buffered and dispatched in batches; results are
+    scored here over all shards' features.
+    """
+
+    def __init__(
+        self,
+        pool: ShardPool,
+        side: str,
+        score_cfg: ScoreConfig,
+        queue_cfg: QueueConfig,
+    ) -> None:
+        self._pool = pool
+        self._side = side
+        self._scorer = EpochScorer(score_cfg, queue_cfg)
+        self._pending: List[Tuple[int, int, int]] = []
+
+    def on_packet(self, key: int, other: int, size: int) -> None:
+        self._pending.append((key, other, size))
+        if len(self._pending) >= self._pool.rows:
+            self._flush()
+
+    def on_batch(self, keys: np.ndarray, others: np.ndarray, sizes: np.ndarray) -> None:
+        self._flush()
+        self._pool.dispatch(self._side, keys, others, sizes)
+
+    def end_epoch(self) -> EpochResult:
+        self._flush()
+        return self._scorer.score(self._pool.collect(self._side))
+
+    def close_state(self) -> DetectorState:
+        self._flush()
+        return self._pool.collect_state(self._side)
+
+    def idle_epochs(self, count: int) -> EpochResult:
+        if count <= 0:
+            raise ValueError(f"idle_epochs count must be positive: {count}")
+        self._flush()
+        return self._scorer.score(self._pool.collect(self._side, idle=count))
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        columns = np.array(self._pending, dtype=np.int64).reshape(-1, 3)
+        self._pending = []
+        self._pool.dispatch(self._side, columns[:, 0], columns[:, 1], columns[:, 2])
@@ -0,0 +1,256 @@
+"""Mergeable per-epoch detector state for distributed detection.
+
+A `DetectorState` is what one on-path detector knows at the end of an
+epoch: its distinct Top-k heavy records, the raw fan-out sketch and byte
+count of every candidate it tracked, and its persistence counters.
+States from several detectors sharing the same configs merge into one
+global view: sketches by bitwise OR (bitmaps) or register max (HLL),
+persistence by max, and heavy/byte counts by sum (disjoint vantage
+points, e.g. ingress satellites) or max (every detector sees the same
+packets).
+
+`to_bytes` gives a compact wire form: a 32-byte header, little-endian
+key/count columns, bitmap rows as packed bits and HLL registers packed
+to `hll_reg_bits` bits each.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import struct
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .fanout import sketch_estimates
+
+STATE_MAGIC = b"MSSSTATE"
+STATE_VERSION = 1
+MERGE_MODES = ("sum", "max")
+_FANOUT_MODES = ("bitmap", "hll-lite")
+# magic, version, fan-out mode, register bits, width, heavy, sketch and persistence rows
+_HEADER = struct.Struct("<8sHBBIIII4x")
+
+
+@dataclass
+class DetectorState:
+    """One detector's (or a merged) end-of-epoch state.
+
+    `width` is the bitmap size in bits, or the HLL register count.
+    `sketch_*` and `persist_*` rows are sorted by key; heavy rows keep
+    the detector's first-seen order.
+    """
+
+    fanout_mode: str
+    width: int
+    reg_bits: int
+    heavy_keys: np.ndarray
+    heavy_counts: np.ndarray
+    sketch_keys: np.ndarray
+    sketch_rows: np.ndarray
+    sketch_bytes: np.ndarray
+    persist_keys: np.ndarray
+    persist_counts: np.ndarray
+
+    def byte_counts(self, keys: np.ndarray) -> np.ndarray:
+        """Candidate bytes of every key (0 if untracked)."""
+        return _lookup(self.sketch_keys, self.sketch_bytes, keys)
+
+    def fanouts(self, keys: np.ndarray) -> np.ndarray:
+        """Fan-out estimates of every key from its sketch (0 if untracked)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        pos, found = _positions(self.sketch_keys, keys)
+        rows = np.zeros((len(keys), self.sketch_rows.shape[1]), dtype=np.uint8)
+        rows[found] = self.sketch_rows[pos[found]]
+        return sketch_estimates(self.fanout_mode, self.width, rows)
+
+    def persists(self, keys: np.ndarray) -> np.ndarray:
+        """Persistence of every key (0 if untracked)."""
+        return _lookup(self.persist_keys, self.persist_counts, keys)
+
+    @property
+    def wire_bytes(self) -> int:
+        """Size of `to_bytes()`, without serializing."""
+        return _wire_size(
+            len(self.heavy_keys),
+            len(self.sketch_keys),
+            len(self.persist_keys),
+            _row_bytes(self.fanout_mode, self.width, self.reg_bits),
+        )
+
+    def to_bytes(self) -> bytes:
+        if len(self.persist_counts) and int(self.persist_counts.max()) > 0xFFFF:
+            raise ValueError("Persistence counters must fit in 16 bits to serialize")
+        header = _HEADER.pack(
+            STATE_MAGIC,
+            STATE_VERSION,
+            _FANOUT_MODES.index(self.fanout_mode),
+            self.reg_bits,
+            self.width,
+            len(self.heavy_keys),
+            len(self.sketch_keys),
+            len(self.persist_keys),
+        )
+        parts = [
+            header,
+            self.heavy_keys.astype("<i8").tobytes(),
+            self.heavy_counts.astype("<i8").tobytes(),
+            self.sketch_keys.astype("<i8").tobytes(),
+            self.sketch_bytes.astype("<i8").tobytes(),
+            _pack_rows(self.fanout_mode, self.reg_bits, self.sketch_rows).tobytes(),
+            self.persist_keys.astype("<i8").tobytes(),
+            self.persist_counts.astype("<u2").tobytes(),
+        ]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> DetectorState:
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated detector state")
+        magic, version, mode, reg_bits, width, heavy, sketch, persist = _HEADER.unpack_from(data)
+        if magic != STATE_MAGIC:
+            raise ValueError("Not a detector state")
+        if version != STATE_VERSION:
+            raise ValueError(f"Unsupported detector state version: {version}")
+        if mode >= len(_FANOUT_MODES):
+            raise ValueError(f"Unsupported detector state fan-out mode: {mode}")
+        fanout_mode = _FANOUT_MODES[mode]
+        row_bytes = _row_bytes(fanout_mode, width, reg_bits)
+        if len(data) != _wire_size(heavy, sketch, persist, row_bytes):
+            raise ValueError("Detector state size does not match its header")
+        offset = _HEADER.size
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal offset
+            values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += values.nbytes
+            return values
+
+        heavy_keys = take("<i8", heavy).astype(np.int64)
+        heavy_counts = take("<i8", heavy).astype(np.int64)
+        sketch_keys = take("<i8", sketch).astype(np.int64)
+        sketch_bytes = take("<i8", sketch).astype(np.int64)
+        packed = take("u1", sketch * row_bytes).reshape(sketch, row_bytes)
+        return cls(
+            fanout_mode=fanout_mode,
+            width=width,
+            reg_bits=reg_bits,
+            heavy_keys=heavy_keys,
+            heavy_counts=heavy_counts,
+            sketch_keys=sketch_keys,
+            sketch_rows=_unpack_rows(fanout_mode, width, reg_bits, packed),
+            sketch_bytes=sketch_bytes,
+            persist_keys=take("<i8", persist).astype(np.int64),
+            persist_counts=take("<u2", persist).astype(np.int64),
+        )
+
+
+def _row_bytes(mode: str, width: int, reg_bits: int) -> int:
+    """Packed bytes per sketch row on the wire."""
+    if mode == "bitmap":
+        return (width + 7) // 8
+    return (width * reg_bits + 7) // 8
+
+
+def _wire_size(heavy: int, sketch: int, persist: int, row_bytes: int) -> int:
+    return _HEADER.size + 16 * heavy + (16 + row_bytes) * sketch + 10 * persist
+
+
+def _pack_rows(mode: str, reg_bits: int, rows: np.ndarray) -> np.ndarray:
+    if mode == "bitmap":
+        return rows
+    # Keep the low `reg_bits` bits of every register, MSB first.
+    bits = np.unpackbits(rows[..., None], axis=-1)[..., 8 - reg_bits :]
+    return np.packbits(bits.reshape(len(rows), rows.shape[1] * reg_bits), axis=1)
+
+
+def _unpack_rows(mode: str, width: int, reg_bits: int, packed: np.ndarray) -> np.ndarray:
+    if mode == "bitmap":
+        return packed.copy()
+    rows = len(packed)
+    bits = np.unpackbits(packed, axis=1, count=width * reg_bits).reshape(rows, width, reg_bits)
+    padded = np.zeros((rows, width, 8), dtype=np.uint8)
+    padded[..., 8 - reg_bits :] = bits
+    return np.packbits(padded, axis=-1).reshape(rows, width)
+
+
+def merge_states(states: Sequence[DetectorState], counts: str = "sum") -> DetectorState:
+    """Merge detector states into one global view.
+
+    `counts` combines heavy and candidate byte counts: ``sum`` for
+    detectors that see disjoint traffic, ``max`` for detectors that see
+    the same packets (e.g. several satellites on one path). Merged heavy
+    keys are in first-seen order across `states`.
+    """
+    if counts not in MERGE_MODES:
+        raise ValueError(f"Unsupported merge mode: {counts}")
+    if not states:
+        raise ValueError("merge_states needs at least one state")
+    first = states[0]
+    for state in states[1:]:
+        if (state.fanout_mode, state.width, state.reg_bits) != (
+            first.fanout_mode,
+            first.width,
+            first.reg_bits,
+        ):
+            raise ValueError("Cannot merge detector states with different fan-out sketches")
+    count_op = np.add if counts == "sum" else np.maximum
+    sketch_op = np.bitwise_or if first.fanout_mode == "bitmap" else np.maximum
+
+    heavy_keys, heavy_counts, first_seen = _reduce_by_key(
+        [state.heavy_keys for state in states], [state.heavy_counts for state in states], count_op
+    )
+    order = np.argsort(first_seen, kind="stable")
+    sketch_keys, sketch_rows, _ = _reduce_by_key(
+        [state.sketch_keys for state in states], [state.sketch_rows for state in states], sketch_op
+    )
+    _, sketch_bytes, _ = _reduce_by_key(
+        [state.sketch_keys for state in states], [state.sketch_bytes for state in states], count_op
+    )
+    persist_keys, persist_counts, _ = _reduce_by_key(
+        [state.persist_keys for state in states],
+        [state.persist_counts for state in states],
+        np.maximum,
+    )
+    return DetectorState(
+        fanout_mode=first.fanout_mode,
+        width=first.width,
+        reg_bits=first.reg_bits,
+        heavy_keys=heavy_keys[order],
+        heavy_counts=heavy_counts[order],
+        sketch_keys=sketch_keys,
+        sketch_rows=sketch_rows,
+        sketch_bytes=sketch_bytes,
+        persist_keys=persist_keys,
+        persist_counts=persist_counts,
+    )
+
+
+def _reduce_by_key(
+    keys: List[np.ndarray], values: List[np.ndarray], op: np.ufunc
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct keys (sorted), `op`-reduced values and first input position per key."""
+    all_keys = np.concatenate(keys)
+    all_values = np.concatenate(values)
+    order = np.argsort(all_keys, kind="stable")
+    sorted_keys = all_keys[order]
+    if not sorted_keys.size:
+        return sorted_keys, all_values, order
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    reduced = op.reduceat(all_values[order], starts, axis=0)
+    return sorted_keys[starts], reduced, order[starts]
+
+
+def _positions(sorted_keys: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, max(0, len(sorted_keys) - 1))
+    found = (sorted_keys[pos] == keys) if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+    return pos, found
+
+
+def _lookup(sorted_keys: np.ndarray, values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    keys = np.asarray(keys, dtype=np.int64)
+    pos, found = _positions(sorted_keys, keys)
+    out = np.zeros(len(keys), dtype=np.float64)
+    out[found] = values[pos[found]]
+    return out
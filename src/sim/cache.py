@@ -0,0 +1,127 @@
+"""Materialized traffic cache shared across experiment cells."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import os
+import shutil
+from typing import Callable, Dict, Hashable, Iterator, Optional
+
+import numpy as np
+
+from .flow import Packet, PacketBatch
+from .traffic import DEFAULT_BATCH_ROWS, TrafficSource, iter_batches
+
+_COLUMNS = ("ts_ms", "src", "dst", "size")
+
+
+class CachedTraffic(TrafficSource):
+    """Replays a materialized PacketBatch as zero-copy column slices."""
+
+    def __init__(self, batch: PacketBatch) -> None:
+        self.batch = batch
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self.batch, name).nbytes for name in _COLUMNS)
+
+    def packets(self) -> Iterator[Packet]:
+        for batch in self.batches():
+            yield from batch.packets()
+
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+        rows = len(self.batch)
+        for start in range(0, rows, max_rows):
+            yield self.batch.slice(start, start + max_rows)
+
+
+class TrafficCache:
+    """LRU cache of materialized traffic keyed by the source config.
+
+    A miss drains the source's `batches()` once into a single columnar
+    PacketBatch. With `directory` set, the columns are also written as
+    ``.npy`` files and reopened memory-mapped, so other processes (sweep
+    workers) and later runs reuse them without regenerating. In-memory
+    entries are evicted least-recently-used once their total size exceeds
+    `max_bytes` or their count exceeds `max_entries`. On-disk entries are
+    named after the config's repr, so clear the directory when a
+    generator's output changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 8,
+        max_bytes: int = 1 << 30,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, CachedTraffic]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, config: Hashable, factory: Callable[[], TrafficSource]) -> CachedTraffic:
+        entry = self._entries.get(config)
+        if entry is not None:
+            self._entries.move_to_end(config)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        batch = self._load(config)
+        if batch is None:
+            batch = PacketBatch.concat(list(iter_batches(factory())))
+            batch = self._store(config, batch)
+        entry = CachedTraffic(batch)
+        self._entries[config] = entry
+        self._evict()
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _evict(self) -> None:
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.nbytes > self.max_bytes
+        ):
+            self._entries.popitem(last=False)
+
+    def _path(self, config: Hashable) -> Optional[str]:
+        if self.directory is None:
+            return None
+        digest = hashlib.sha1(repr(config).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, digest)
+
+    def _load(self, config: Hashable) -> Optional[PacketBatch]:
+        path = self._path(config)
+        if path is None or not os.path.isdir(path):
+            return None
+        columns: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _COLUMNS
+        }
+        return PacketBatch(**columns)
+
+    def _store(self, config: Hashable, batch: PacketBatch) -> PacketBatch:
+        path = self._path(config)
+        if path is None:
+            return batch
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in _COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(batch, name))
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process published the same entry first.
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        loaded = self._load(config)
+        return batch if loaded is None else loaded
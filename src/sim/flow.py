@@ -3,6 +3,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
 
 
 @dataclass(frozen=True)
@@ -18,3 +21,73 @@ class Packet:
     dst: int
     size: int
     flow: FlowKey
+
+
+@dataclass(frozen=True)
+class PacketBatch:
+    """Struct-of-arrays packet columns (float64 ts_ms, int64 src/dst/size)."""
+
+    ts_ms: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+    size: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ts_ms.shape[0])
+
+    @classmethod
+    def from_columns(cls, ts_ms, src, dst, size) -> PacketBatch:
+        return cls(
+            ts_ms=np.asarray(ts_ms, dtype=np.float64),
+            src=np.asarray(src, dtype=np.int64),
+            dst=np.asarray(dst, dtype=np.int64),
+            size=np.asarray(size, dtype=np.int64),
+        )
+
+    @classmethod
+    def empty(cls) -> PacketBatch:
+        return cls.from_columns([], [], [], [])
+
+    @classmethod
+    def from_packets(cls, packets: Sequence[Packet]) -> PacketBatch:
+        return cls.from_columns(
+            [p.ts_ms for p in packets],
+            [p.src for p in packets],
+            [p.dst for p in packets],
+            [p.size for p in packets],
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence[PacketBatch]) -> PacketBatch:
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return cls(
+            ts_ms=np.concatenate([b.ts_ms for b in batches]),
+            src=np.concatenate([b.src for b in batches]),
+            dst=np.concatenate([b.dst for b in batches]),
+            size=np.concatenate([b.size for b in batches]),
+        )
+
+    def slice(self, start: int, stop: int) -> PacketBatch:
+        return PacketBatch(
+            ts_ms=self.ts_ms[start:stop],
+            src=self.src[start:stop],
+            dst=self.dst[start:stop],
+            size=self.size[start:stop],
+        )
+
+    def take(self, index: np.ndarray) -> PacketBatch:
+        return PacketBatch(
+            ts_ms=self.ts_ms[index],
+            src=self.src[index],
+            dst=self.dst[index],
+            size=self.size[index],
+        )
+
+    def packets(self) -> Iterator[Packet]:
+        for ts_ms, src, dst, size in zip(
+            self.ts_ms.tolist(), self.src.tolist(), self.dst.tolist(), self.size.tolist()
+        ):
+            yield Packet(ts_ms=ts_ms, src=src, dst=dst, size=size, flow=FlowKey(src=src, dst=dst))
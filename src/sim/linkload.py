@@ -0,0 +1,265 @@
+"""Per-link load accounting for target-link flooding experiments.
+
+Packets are attached to topology endpoints, routed with a
+`ShortestPathRouting`, and their bytes scatter-added onto every link of
+their route. Each epoch reports the offered load of every link that
+carried traffic, split into benign and attack bytes, and the benign
+throughput a capacity-limited network would deliver with and without
+the attack traffic.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import heapq
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from ms_satshield.hashing import HashFamily
+from ms_satshield.metrics import throughput_drop
+
+from .flow import PacketBatch
+from .routing import ShortestPathRouting
+from .runner import merge_epoch_windows
+from .traffic import TrafficSource
+
+Attachment = Callable[[np.ndarray], np.ndarray]
+
+
+def hash_attachment(nodes: Iterable[int], seed: int = 0) -> Attachment:
+    """Map traffic keys (e.g. addresses) onto `nodes` by a seeded hash."""
+    targets = np.asarray(list(nodes), dtype=np.int64)
+    if not targets.size:
+        raise ValueError("hash_attachment needs at least one node")
+    hashes = HashFamily(seed)
+
+    def attach(keys: np.ndarray) -> np.ndarray:
+        return targets[hashes.hash_many(np.asarray(keys, dtype=np.int64)) % targets.size]
+
+    return attach
+
+
+@dataclass(frozen=True, eq=False)
+class LinkLoadReport:
+    """Offered load of one epoch on every link that carried traffic.
+
+    Links are directed and sorted by (src, dst). Delivery assumes every
+    overloaded link drops traffic in proportion to its overload, and
+    credits each route with its worst link (downstream relief from
+    upstream drops is ignored). `baseline_delivered_bytes` applies the
+    same model to the benign traffic alone.
+    """
+
+    epoch: int
+    epoch_ms: float
+    src: np.ndarray
+    dst: np.ndarray
+    capacity_gbps: np.ndarray
+    benign_bytes: np.ndarray
+    attack_bytes: np.ndarray
+    benign_offered_bytes: float
+    benign_delivered_bytes: float
+    baseline_delivered_bytes: float
+    unrouted_bytes: float
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    @property
+    def total_bytes(self) -> np.ndarray:
+        return self.benign_bytes + self.attack_bytes
+
+    @property
+    def utilization(self) -> np.ndarray:
+        """Offered load over capacity; above 1 means the link is congested."""
+        return self.total_bytes / _capacity_bytes(self.capacity_gbps, self.epoch_ms)
+
+    @property
+    def benign_fraction(self) -> np.ndarray:
+        return _share(self.benign_bytes, self.total_bytes)
+
+    @property
+    def attack_fraction(self) -> np.ndarray:
+        return _share(self.attack_bytes, self.total_bytes)
+
+    @property
+    def throughput_drop(self) -> float:
+        """Benign throughput lost to the attack traffic (see `metrics.throughput_drop`)."""
+        return throughput_drop(self.baseline_delivered_bytes, self.benign_delivered_bytes)
+
+    def row(self, src: int, dst: int) -> int:
+        """Row of link (src, dst), or -1 if it carried no traffic."""
+        pos = int(np.searchsorted(self.src, src, side="left"))
+        stop = int(np.searchsorted(self.src, src, side="right"))
+        pos += int(np.searchsorted(self.dst[pos:stop], dst))
+        return pos if pos < stop and self.dst[pos] == dst else -1
+
+
+class LinkLoadEngine:
+    """Accumulates routed per-link bytes epoch by epoch.
+
+    `add` reduces every batch to byte totals per (topology step, endpoint
+    pair) right away; `close_epoch` routes the distinct pairs once and
+    scatter-adds their bytes onto the route links with `bincount`.
+    Packets are routed at their own timestamp, so an epoch straddling a
+    topology step uses both snapshots.
+    """
+
+    def __init__(
+        self,
+        routing: ShortestPathRouting,
+        attach: Attachment,
+        epoch_ms: float,
+    ) -> None:
+        if epoch_ms <= 0:
+            raise ValueError(f"epoch_ms must be positive: {epoch_ms}")
+        self.routing = routing
+        self.attach = attach
+        self.epoch_ms = epoch_ms
+        self.epoch = 0
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def add(self, batch: PacketBatch, attack: bool = False) -> None:
+        """Add a batch of the current epoch; `attack` labels all its bytes."""
+        if not len(batch):
+            return
+        steps = self.routing.topology.steps_of(batch.ts_ms)
+        ends = np.stack([steps, self.attach(batch.src), self.attach(batch.dst)])
+        keys, inverse = np.unique(ends, axis=1, return_inverse=True)
+        size = np.bincount(inverse.reshape(-1), weights=batch.size, minlength=keys.shape[1])
+        benign = np.zeros_like(size) if attack else size
+        self._pending.append((keys, benign, size - benign))
+
+    def close_epoch(self) -> LinkLoadReport:
+        """Report the current epoch and start the next one."""
+        report = self._report()
+        self._pending = []
+        self.epoch += 1
+        return report
+
+    def iter_epochs(
+        self,
+        benign: Iterable[TrafficSource],
+        attack: Iterable[TrafficSource] = (),
+    ) -> Iterator[LinkLoadReport]:
+        """One report per epoch, numbered like `ExperimentRunner.iter_epochs`."""
+        streams = [
+            _labelled(merge_epoch_windows(benign, self.epoch_ms), False),
+            _labelled(merge_epoch_windows(attack, self.epoch_ms), True),
+        ]
+        for epoch, label, batch in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+            while self.epoch < epoch:
+                yield self.close_epoch()
+            self.add(batch, attack=label)
+        yield self.close_epoch()
+
+    def _report(self) -> LinkLoadReport:
+        empty = np.empty(0, dtype=np.int64)
+        if not self._pending:
+            none = np.empty(0)
+            return self._build(empty, empty, none, none, none, 0.0, 0.0, 0.0, 0.0)
+        keys = np.concatenate([keys for keys, _, _ in self._pending], axis=1)
+        keys, inverse = np.unique(keys, axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        benign = np.bincount(
+            inverse, np.concatenate([b for _, b, _ in self._pending]), minlength=keys.shape[1]
+        )
+        attack = np.bincount(
+            inverse, np.concatenate([a for _, _, a in self._pending]), minlength=keys.shape[1]
+        )
+        steps, src, dst = keys
+        # Route every distinct pair on its step's snapshot; links are keyed by node pair.
+        hop_links: List[np.ndarray] = []
+        hop_caps: List[np.ndarray] = []
+        hop_pairs: List[np.ndarray] = []
+        routed = src == dst
+        nodes = 0
+        for step in np.unique(steps).tolist():
+            rows = np.flatnonzero(steps == step)
+            snap, indptr, edges = self.routing.route_edges_at(step, src[rows], dst[rows])
+            hops = np.diff(indptr)
+            routed[rows] |= hops > 0
+            nodes = snap.num_nodes
+            hop_links.append(snap.edge_keys[edges])
+            hop_caps.append(snap.capacity_gbps[edges])
+            hop_pairs.append(np.repeat(rows, hops))
+        hop_pair = np.concatenate(hop_pairs)
+        link_keys, link_of_hop = np.unique(np.concatenate(hop_links), return_inverse=True)
+        link_benign = np.bincount(link_of_hop, benign[hop_pair], minlength=link_keys.size)
+        link_attack = np.bincount(link_of_hop, attack[hop_pair], minlength=link_keys.size)
+        link_cap = np.zeros(link_keys.size)
+        link_cap[link_of_hop] = np.concatenate(hop_caps)
+        cap_bytes = _capacity_bytes(link_cap, self.epoch_ms)
+        pairs = len(benign)
+        delivered = _delivered(pairs, hop_pair, link_of_hop, cap_bytes, link_benign + link_attack)
+        baseline = _delivered(pairs, hop_pair, link_of_hop, cap_bytes, link_benign)
+        link_src, link_dst = np.divmod(link_keys, nodes)
+        return self._build(
+            link_src,
+            link_dst,
+            link_cap,
+            link_benign,
+            link_attack,
+            float(benign[routed].sum()),
+            float((benign * delivered)[routed].sum()),
+            float((benign * baseline)[routed].sum()),
+            float((benign + attack)[~routed].sum()),
+        )
+
+    def _build(
+        self,
+        src: np.ndarray,
+        dst: np.ndarray,
+        capacity: np.ndarray,
+        benign: np.ndarray,
+        attack: np.ndarray,
+        offered: float,
+        delivered: float,
+        baseline: float,
+        unrouted: float,
+    ) -> LinkLoadReport:
+        return LinkLoadReport(
+            epoch=self.epoch,
+            epoch_ms=self.epoch_ms,
+            src=src,
+            dst=dst,
+            capacity_gbps=capacity,
+            benign_bytes=benign,
+            attack_bytes=attack,
+            benign_offered_bytes=offered,
+            benign_delivered_bytes=delivered,
+            baseline_delivered_bytes=baseline,
+            unrouted_bytes=unrouted,
+        )
+
+
+def _labelled(
+    windows: Iterator[Tuple[int, PacketBatch]], attack: bool
+) -> Iterator[Tuple[int, bool, PacketBatch]]:
+    for epoch, batch in windows:
+        yield epoch, attack, batch
+
+
+def _capacity_bytes(capacity_gbps: np.ndarray, epoch_ms: float) -> np.ndarray:
+    return capacity_gbps * (1e9 / 8.0) * (epoch_ms / 1000.0)
+
+
+def _delivered(
+    pairs: int,
+    hop_pair: np.ndarray,
+    link_of_hop: np.ndarray,
+    cap_bytes: np.ndarray,
+    load: np.ndarray,
+) -> np.ndarray:
+    """Delivered share of every pair: the worst pass-through ratio on its route."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(load > cap_bytes, cap_bytes / load, 1.0)
+    share = np.ones(pairs)
+    np.minimum.at(share, hop_pair, ratio[link_of_hop])
+    return share
+
+
+def _share(part: np.ndarray, total: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, part / np.where(total > 0, total, 1), 0.0)
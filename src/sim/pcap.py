@@ -0,0 +1,378 @@
+"""Streaming pcap/pcapng traffic source.
+
+The capture is memory-mapped, so only the pages being read are resident.
+Record headers are walked sequentially, which is unavoidable for
+variable-length records. Everything after that works on whole batches:
+link-layer decoding, the IPv4/IPv6 version check and address extraction.
+Non-IP frames, and frames captured too short to hold the IP header, are
+skipped.
+
+Keys: an IPv4 address maps to its 32-bit value. An IPv6 address maps into
+``[2**62, 2**63)``, so it can never collide with an IPv4 key. ``fold``
+mixes all 128 bits into the key; ``prefix64`` keys on the /64 prefix
+only.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import mmap
+import os
+import struct
+import traceback
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .flow import Packet, PacketBatch
+from .traffic import DEFAULT_BATCH_ROWS, TrafficSource
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_GOLDEN = 0x9E3779B97F4A7C15
+_IPV6_TAG = 1 << 62
+
+# linktype -> (ethertype offset or -1, L3 offset)
+_LINK_LAYERS = {
+    0: (-1, 4),  # BSD loopback
+    1: (12, 14),  # Ethernet
+    12: (-1, 0),  # raw IP
+    14: (-1, 0),  # raw IP (OpenBSD)
+    101: (-1, 0),  # raw IP
+    108: (-1, 4),  # OpenBSD loopback
+    113: (14, 16),  # Linux cooked capture
+    228: (-1, 0),  # raw IPv4
+    229: (-1, 0),  # raw IPv6
+    276: (0, 20),  # Linux cooked capture v2
+}
+_VLAN_TAGS = (0x8100, 0x88A8)
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86DD
+
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-3),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-3),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-6),
+}
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+# Header walk: longest run of equal-length records checked in one step.
+_MAX_RUN = 1 << 16
+
+
+@dataclass(frozen=True)
+class _Frames:
+    """Per-frame capture fields gathered by a header walk."""
+
+    ts_ms: np.ndarray
+    data: np.ndarray  # file offset of the link-layer frame
+    caplen: np.ndarray
+    origlen: np.ndarray
+    linktype: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ts_ms.shape[0])
+
+
+def ipv6_key(hi: int, lo: int, mode: str = "fold") -> int:
+    """Key of the IPv6 address with 64-bit halves `hi`, `lo`."""
+    if mode == "fold":
+        folded = (hi ^ (lo * _GOLDEN)) & _MASK64
+    elif mode == "prefix64":
+        folded = hi
+    else:
+        raise ValueError(f"Unsupported ipv6_key mode: {mode}")
+    return (folded >> 2) | _IPV6_TAG
+
+
+def ip_key(address: str, ipv6_mode: str = "fold") -> int:
+    """Key PcapSource assigns to a textual IPv4/IPv6 address."""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 4:
+        return int(ip)
+    value = int(ip)
+    return ipv6_key(value >> 64, value & _MASK64, ipv6_mode)
+
+
+def ipv6_keys(hi: np.ndarray, lo: np.ndarray, mode: str = "fold") -> np.ndarray:
+    """Vectorized `ipv6_key` over uint64 halves; returns int64."""
+    if mode == "fold":
+        folded = hi ^ (lo * np.uint64(_GOLDEN))
+    elif mode == "prefix64":
+        folded = hi
+    else:
+        raise ValueError(f"Unsupported ipv6_key mode: {mode}")
+    return ((folded >> np.uint64(2)) | np.uint64(_IPV6_TAG)).astype(np.int64)
+
+
+class PcapSource(TrafficSource):
+    """Replays IP packets from a time-ordered pcap or pcapng file.
+
+    Timestamps are in ms relative to `origin_ms` (default: the first
+    frame). Packet size is the original wire length of the whole captured
+    frame, link-layer header included, not the IP total length.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        origin_ms: Optional[float] = None,
+        ipv6_mode: str = "fold",
+    ) -> None:
+        if ipv6_mode not in ("fold", "prefix64"):
+            raise ValueError(f"Unsupported ipv6_key mode: {ipv6_mode}")
+        self.path = path
+        self.origin_ms = origin_ms
+        self.ipv6_mode = ipv6_mode
+        self.skipped = 0
+
+    def packets(self) -> Iterator[Packet]:
+        for batch in self.batches():
+            yield from batch.packets()
+
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+        self.skipped = 0
+        if os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as handle, mmap.mmap(
+            handle.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            buf = np.frombuffer(view, dtype=np.uint8)
+            reader: Optional[_FrameReader] = None
+            try:
+                reader = _open_reader(view, buf)
+                origin = self.origin_ms
+                while True:
+                    frames = reader.read(max_rows)
+                    if not len(frames):
+                        return
+                    if origin is None:
+                        origin = float(frames.ts_ms[0])
+                    batch = _decode(buf, frames, origin, self.ipv6_mode)
+                    self.skipped += len(frames) - len(batch)
+                    if len(batch):
+                        yield batch
+            except Exception as exc:
+                # Traceback frames still hold NumPy views of the mapping.
+                traceback.clear_frames(exc.__traceback__)
+                raise
+            finally:
+                # The mapping cannot close while NumPy still exports it.
+                del reader, buf
+
+
+def _open_reader(view: mmap.mmap, buf: np.ndarray) -> _FrameReader:
+    magic = view[:4]
+    if magic in _PCAP_MAGIC:
+        return _PcapReader(view, buf)
+    if len(view) >= 12 and struct.unpack_from("<I", view, 0)[0] == _PCAPNG_SHB:
+        return _PcapngReader(view)
+    raise ValueError(f"Not a pcap/pcapng capture (magic {bytes(magic)!r})")
+
+
+class _FrameReader:
+    def read(self, limit: int) -> _Frames:
+        raise NotImplementedError
+
+
+class _PcapReader(_FrameReader):
+    """Walks pcap records.
+
+    Captures taken with a snap length mostly hold equal-length records,
+    so the walk speculates: it checks a whole run of records at the
+    current stride in one vectorized step and falls back to single steps
+    where lengths vary, growing the speculated run while it keeps paying
+    off.
+    """
+
+    def __init__(self, view: mmap.mmap, buf: np.ndarray) -> None:
+        if len(view) < 24:
+            raise ValueError("Truncated pcap header")
+        endian, self._frac_ms = _PCAP_MAGIC[view[:4]]
+        self._view = view
+        self._buf = buf
+        self._u32 = np.dtype(f"{endian}u4")
+        self._caplen = struct.Struct(f"{endian}I").unpack_from
+        self._linktype = struct.unpack_from(f"{endian}I", view, 20)[0] & 0xFFFF
+        self._pos = 24
+        self._run = 16
+
+    def read(self, limit: int) -> _Frames:
+        offsets = self._walk(limit)
+        header = _gather(self._buf, offsets, 16).view(self._u32).astype(np.int64)
+        return _Frames(
+            ts_ms=header[:, 0] * 1000.0 + header[:, 1] * self._frac_ms,
+            data=offsets + 16,
+            caplen=header[:, 2],
+            origlen=header[:, 3],
+            linktype=np.full(len(offsets), self._linktype, dtype=np.int64),
+        )
+
+    def _walk(self, limit: int) -> np.ndarray:
+        """File offsets of up to `limit` complete records from the cursor."""
+        view, buf, pos, size = self._view, self._buf, self._pos, len(self._view)
+        caplen_at = self._caplen
+        runs: List[np.ndarray] = []
+        count = 0
+        while count < limit and pos + 16 <= size:
+            stride = 16 + caplen_at(view, pos + 8)[0]
+            run = min(self._run, limit - count, (size - pos) // stride)
+            if run < 4:
+                # Plain walk for a while before speculating again.
+                singles: List[int] = []
+                for _ in range(min(64, limit - count)):
+                    if pos + 16 > size:
+                        break
+                    stride = 16 + caplen_at(view, pos + 8)[0]
+                    if pos + stride > size:
+                        break
+                    singles.append(pos)
+                    pos += stride
+                if not singles:
+                    break  # truncated final record
+                runs.append(np.array(singles, dtype=np.int64))
+                count += len(singles)
+                self._run = 16
+                continue
+            starts = pos + stride * np.arange(run, dtype=np.int64)
+            same = _gather(buf, starts + 8, 4).view(self._u32).ravel() == stride - 16
+            accepted = run if same.all() else max(1, int(np.argmin(same)))
+            self._run = min(_MAX_RUN, run * 2) if accepted == run else 1
+            runs.append(starts[:accepted])
+            pos += accepted * stride
+            count += accepted
+        self._pos = pos
+        return np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+
+
+class _PcapngReader(_FrameReader):
+    """Walks pcapng blocks; handles EPB, SPB and legacy packet blocks."""
+
+    def __init__(self, view: mmap.mmap) -> None:
+        self._view = view
+        self._pos = 0
+        self._endian = "<"
+        # Per interface: (linktype, ms per timestamp unit).
+        self._interfaces: List[Tuple[int, float]] = []
+        self._last_ts = 0.0
+
+    def read(self, limit: int) -> _Frames:
+        view, size = self._view, len(self._view)
+        ts_ms: List[float] = []
+        frames: List[Tuple[int, int, int, int]] = []
+        while len(frames) < limit and self._pos + 12 <= size:
+            pos = self._pos
+            if struct.unpack_from("<I", view, pos)[0] == _PCAPNG_SHB:
+                order = struct.unpack_from("<I", view, pos + 8)[0]
+                self._endian = "<" if order == _PCAPNG_BYTE_ORDER else ">"
+                self._interfaces = []
+            endian = self._endian
+            block_type, block_len = struct.unpack_from(f"{endian}II", view, pos)
+            if block_len < 12 or pos + block_len > size:
+                break  # truncated final block
+            if block_type == 1:
+                self._interfaces.append(self._interface(pos, block_len))
+            elif block_type in (2, 6):
+                if block_type == 6:
+                    iface, ts_hi, ts_lo, caplen, origlen = struct.unpack_from(
+                        f"{endian}IIIII", view, pos + 8
+                    )
+                else:
+                    iface, _, ts_hi, ts_lo, caplen, origlen = struct.unpack_from(
+                        f"{endian}HHIIII", view, pos + 8
+                    )
+                linktype, unit_ms = self._interfaces[iface]
+                self._last_ts = ((ts_hi << 32) | ts_lo) * unit_ms
+                ts_ms.append(self._last_ts)
+                frames.append((pos + 28, caplen, origlen, linktype))
+            elif block_type == 3:
+                origlen = struct.unpack_from(f"{endian}I", view, pos + 8)[0]
+                caplen = min(origlen, block_len - 16)
+                linktype = self._interfaces[0][0]
+                ts_ms.append(self._last_ts)
+                frames.append((pos + 12, caplen, origlen, linktype))
+            self._pos = pos + block_len
+        # Offsets and lengths stay int64: float64 would round past 2**53.
+        columns = np.array(frames, dtype=np.int64).reshape(-1, 4)
+        return _Frames(
+            ts_ms=np.array(ts_ms, dtype=np.float64),
+            data=columns[:, 0],
+            caplen=columns[:, 1],
+            origlen=columns[:, 2],
+            linktype=columns[:, 3],
+        )
+
+    def _interface(self, pos: int, block_len: int) -> Tuple[int, float]:
+        endian = self._endian
+        linktype = struct.unpack_from(f"{endian}H", self._view, pos + 8)[0]
+        unit_ms = 1e-3
+        opt, end = pos + 16, pos + block_len - 4
+        while opt + 4 <= end:
+            code, length = struct.unpack_from(f"{endian}HH", self._view, opt)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:  # if_tsresol
+                resol = self._view[opt + 4]
+                base = 2.0 if resol & 0x80 else 10.0
+                unit_ms = base ** -(resol & 0x7F) * 1000.0
+            opt += 4 + (length + 3) // 4 * 4
+        return linktype, unit_ms
+
+
+def _decode(buf: np.ndarray, frames: _Frames, origin_ms: float, ipv6_mode: str) -> PacketBatch:
+    """Vectorized L2/L3 decode of gathered frames into a PacketBatch."""
+    data, caplen, linktype = frames.data, frames.caplen, frames.linktype
+    rows = len(frames)
+    l3 = np.full(rows, -1, dtype=np.int64)
+    ethertype = np.full(rows, -1, dtype=np.int64)
+    for code, (type_off, l3_off) in _LINK_LAYERS.items():
+        mask = linktype == code
+        if not mask.any():
+            continue
+        l3[mask] = l3_off
+        if type_off >= 0:
+            ethertype[mask] = _be16(buf, data[mask] + type_off)
+    if (linktype == 1).any():
+        # Up to two 802.1Q/802.1ad tags on Ethernet.
+        for _ in range(2):
+            tagged = (linktype == 1) & np.isin(ethertype, _VLAN_TAGS)
+            ethertype[tagged] = _be16(buf, data[tagged] + l3[tagged] + 2)
+            l3[tagged] += 4
+    known = l3 >= 0
+    version = np.zeros(rows, dtype=np.int64)
+    version[known] = buf[np.minimum(data[known] + l3[known], len(buf) - 1)] >> 4
+    is_v4 = known & (version == 4) & (caplen >= l3 + 20)
+    is_v6 = known & (version == 6) & (caplen >= l3 + 40)
+    has_type = ethertype >= 0
+    is_v4 &= ~has_type | (ethertype == _ETHERTYPE_IPV4)
+    is_v6 &= ~has_type | (ethertype == _ETHERTYPE_IPV6)
+
+    keep = is_v4 | is_v6
+    src = np.zeros(rows, dtype=np.int64)
+    dst = np.zeros(rows, dtype=np.int64)
+    start = data + l3
+    if is_v4.any():
+        src[is_v4] = _gather(buf, start[is_v4] + 12, 4).view(">u4").ravel()
+        dst[is_v4] = _gather(buf, start[is_v4] + 16, 4).view(">u4").ravel()
+    if is_v6.any():
+        for column, offset in ((src, 8), (dst, 24)):
+            halves = _gather(buf, start[is_v6] + offset, 16).view(">u8").astype(np.uint64)
+            column[is_v6] = ipv6_keys(halves[:, 0], halves[:, 1], ipv6_mode)
+    return PacketBatch(
+        ts_ms=frames.ts_ms[keep] - origin_ms,
+        src=src[keep],
+        dst=dst[keep],
+        size=frames.origlen[keep],
+    )
+
+
+def _gather(buf: np.ndarray, start: np.ndarray, width: int) -> np.ndarray:
+    """Bytes [start, start + width) of every row, shape (n, width)."""
+    return buf[start[:, None] + np.arange(width, dtype=np.int64)]
+
+
+def _be16(buf: np.ndarray, pos: np.ndarray) -> np.ndarray:
+    pos = np.minimum(pos, len(buf) - 2)
+    return (buf[pos].astype(np.int64) << 8) | buf[pos + 1]
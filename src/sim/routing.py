@@ -0,0 +1,261 @@
+"""Cached shortest-path routing over time-stepped topology snapshots."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Protocol, Tuple
+
+import numpy as np
+
+from .topology import Path, TopologySnapshot
+
+_UNREACHED = np.iinfo(np.int64).max
+
+
+class SnapshotProvider(Protocol):
+    """TopologyProvider with CSR snapshots addressable by step (e.g. WalkerTopology)."""
+
+    def snapshot(self, ts_ms: float) -> TopologySnapshot:
+        ...
+
+    def step_snapshot(self, step: int) -> TopologySnapshot:
+        ...
+
+    def steps_of(self, ts_ms: np.ndarray) -> np.ndarray:
+        ...
+
+
+@dataclass(eq=False)
+class _Tree:
+    """Shortest-path tree toward one destination, valid for one or more steps."""
+
+    dst: int
+    step: int
+    dist: np.ndarray
+    next_hop: np.ndarray
+    nodes: Dict[int, np.ndarray] = field(default_factory=dict)
+    paths: Dict[Tuple[int, int], List[Path]] = field(default_factory=dict)
+    # Entry node per source at `step`; ground attachments change between steps.
+    entries: Dict[int, int] = field(default_factory=dict)
+
+
+class ShortestPathRouting:
+    """RoutingModel with hop-count shortest paths over topology snapshots.
+
+    Paths toward a destination come from a BFS tree rooted at it; ties
+    go to the lowest-numbered next hop, so routes are deterministic.
+    Trees are built on first use and cached (LRU of `max_trees`). When a
+    cached tree is used at a later step, only the links that changed in
+    between are examined: a tree that loses none of its links and gains
+    no shortcut is reused as is (with its memoized `Path` objects), one
+    whose only change is a lower-numbered equal-length next hop is
+    patched in place, and only the rest are rebuilt.
+
+    Ground stations (nodes numbered from `snapshot.satellites` up) are
+    endpoints, not relays, unless `transit_ground` is set. A tree then
+    spans the satellites and its own destination only, so ground-link
+    handovers elsewhere never invalidate it; a ground source joins the
+    tree through its attached satellite closest to the destination.
+    """
+
+    def __init__(
+        self,
+        topology: SnapshotProvider,
+        max_trees: int = 4096,
+        transit_ground: bool = False,
+    ) -> None:
+        self.topology = topology
+        self.max_trees = max_trees
+        self.transit_ground = transit_ground
+        self.built = 0
+        self.patched = 0
+        self.reused = 0
+        self._trees: "OrderedDict[int, _Tree]" = OrderedDict()
+        self._diffs: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def paths(self, src: int, dst: int, ts_ms: float) -> List[Path]:
+        """The shortest path from `src` to `dst` (empty if unreachable)."""
+        snap = self.topology.snapshot(ts_ms)
+        tree = self._tree(snap, dst)
+        entry = self._entry(snap, tree, src)
+        if entry < 0:
+            return []
+        # Ground sources share the tree's memo per attachment satellite.
+        memo_key = (src, entry)
+        memo = tree.paths.get(memo_key)
+        if memo is None:
+            nodes = self._route(snap, tree, src)
+            edges = snap.edge_ids(nodes[:-1], nodes[1:])
+            links = [snap.link(edge) for edge in edges.tolist()]
+            memo = [Path(nodes=nodes.tolist(), links=links)]
+            tree.paths[memo_key] = memo
+        return memo
+
+    def next_hops(self, dst: int, ts_ms: float) -> np.ndarray:
+        """Next hop of every tree node toward `dst` (-1 at `dst` and elsewhere)."""
+        return self._tree(self.topology.snapshot(ts_ms), dst).next_hop
+
+    def route_nodes(self, src: int, dst: int, ts_ms: float) -> np.ndarray:
+        """Node sequence from `src` to `dst`, or an empty array if unreachable."""
+        snap = self.topology.snapshot(ts_ms)
+        return self._route(snap, self._tree(snap, dst), src)
+
+    def route_edges(
+        self, src: np.ndarray, dst: np.ndarray, ts_ms: float
+    ) -> Tuple[TopologySnapshot, np.ndarray, np.ndarray]:
+        """Edge ids of the routes of many (src, dst) pairs at `ts_ms`.
+
+        Returns the snapshot the ids refer to and a CSR pair: the edges of
+        pair ``i`` are ``edges[indptr[i]:indptr[i + 1]]`` (none if
+        unreachable).
+        """
+        return self._route_edges(self.topology.snapshot(ts_ms), src, dst)
+
+    def route_edges_at(
+        self, step: int, src: np.ndarray, dst: np.ndarray
+    ) -> Tuple[TopologySnapshot, np.ndarray, np.ndarray]:
+        """`route_edges` on the snapshot of topology step `step`."""
+        return self._route_edges(self.topology.step_snapshot(step), src, dst)
+
+    def _route_edges(
+        self, snap: TopologySnapshot, src: np.ndarray, dst: np.ndarray
+    ) -> Tuple[TopologySnapshot, np.ndarray, np.ndarray]:
+        pairs = zip(np.asarray(src).tolist(), np.asarray(dst).tolist())
+        routes = [self._route(snap, self._tree(snap, d), s) for s, d in pairs]
+        hops = np.array([max(0, len(nodes) - 1) for nodes in routes], dtype=np.int64)
+        indptr = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum(hops, out=indptr[1:])
+        if not indptr[-1]:
+            return snap, indptr, np.empty(0, dtype=np.int64)
+        heads = np.concatenate([nodes[:-1] for nodes in routes if len(nodes) > 1])
+        tails = np.concatenate([nodes[1:] for nodes in routes if len(nodes) > 1])
+        return snap, indptr, snap.edge_ids(heads, tails)
+
+    def _entry(self, snap: TopologySnapshot, tree: _Tree, src: int) -> int:
+        """First tree node on the route from `src`, or -1 if unreachable."""
+        entry = tree.entries.get(src)
+        if entry is not None:
+            return entry
+        if self._relays(snap, np.array([src]), tree.dst)[0]:
+            entry = src if tree.dist[src] != _UNREACHED else -1
+        else:
+            sats = snap.neighbors(src).astype(np.int64)
+            sats = sats[tree.dist[sats] != _UNREACHED]
+            entry = int(sats[np.lexsort((sats, tree.dist[sats]))[0]]) if sats.size else -1
+        tree.entries[src] = entry
+        return entry
+
+    def _route(self, snap: TopologySnapshot, tree: _Tree, src: int) -> np.ndarray:
+        entry = self._entry(snap, tree, src)
+        if entry < 0:
+            return np.empty(0, dtype=np.int64)
+        nodes = self._nodes(tree, entry)
+        if entry != src:
+            nodes = np.concatenate([[src], nodes])
+        return nodes
+
+    def _nodes(self, tree: _Tree, src: int) -> np.ndarray:
+        nodes = tree.nodes.get(src)
+        if nodes is not None:
+            return nodes
+        hops = [src]
+        next_hop = tree.next_hop
+        while hops[-1] != tree.dst:
+            hops.append(int(next_hop[hops[-1]]))
+        nodes = np.asarray(hops, dtype=np.int64)
+        tree.nodes[src] = nodes
+        return nodes
+
+    def _tree(self, snap: TopologySnapshot, dst: int) -> _Tree:
+        tree = self._trees.get(dst)
+        if tree is not None:
+            self._trees.move_to_end(dst)
+            if tree.step != snap.step:
+                tree = self._migrate(tree, snap)
+                self._trees[dst] = tree
+            return tree
+        tree = self._build(snap, dst)
+        self._trees[dst] = tree
+        while len(self._trees) > self.max_trees:
+            self._trees.popitem(last=False)
+        return tree
+
+    def _relays(self, snap: TopologySnapshot, nodes: np.ndarray, dst: int) -> np.ndarray:
+        """Which `nodes` belong to the tree toward `dst`."""
+        if self.transit_ground:
+            return np.ones(nodes.shape, dtype=bool)
+        return (nodes < snap.satellites) | (nodes == dst)
+
+    def _build(self, snap: TopologySnapshot, dst: int) -> _Tree:
+        """Level-synchronous BFS from `dst` over the CSR adjacency."""
+        self.built += 1
+        indptr, indices = snap.indptr, snap.indices
+        dist = np.full(snap.num_nodes, _UNREACHED, dtype=np.int64)
+        next_hop = np.full(snap.num_nodes, -1, dtype=np.int64)
+        dist[dst] = 0
+        frontier = np.array([dst], dtype=np.int64)
+        level = 0
+        while frontier.size:
+            level += 1
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            ends = np.cumsum(counts)
+            rows = np.repeat(starts - (ends - counts), counts) + np.arange(total)
+            nbrs = indices[rows].astype(np.int64)
+            parents = np.repeat(frontier, counts)
+            fresh = (dist[nbrs] == _UNREACHED) & self._relays(snap, nbrs, dst)
+            # The frontier is sorted, so a node's first occurrence carries
+            # its lowest-numbered parent.
+            reached, first = np.unique(nbrs[fresh], return_index=True)
+            dist[reached] = level
+            next_hop[reached] = parents[fresh][first]
+            frontier = reached
+        return _Tree(dst=dst, step=snap.step, dist=dist, next_hop=next_hop)
+
+    def _migrate(self, tree: _Tree, snap: TopologySnapshot) -> _Tree:
+        removed, added = self._diff(tree.step, snap)
+        dist, next_hop = tree.dist, tree.next_hop
+        # Keys are node * num_nodes + neighbour; both directions of a link are present.
+        node, via = self._tree_links(snap, removed, tree.dst)
+        if np.any(next_hop[node] == via):
+            return self._build(snap, tree.dst)
+        node, via = self._tree_links(snap, added, tree.dst)
+        reached = dist[via] != _UNREACHED
+        node, via = node[reached], via[reached]
+        if np.any(dist[via] + 1 < dist[node]):
+            return self._build(snap, tree.dst)
+        better = (dist[via] + 1 == dist[node]) & (via < next_hop[node])
+        if not better.any():
+            self.reused += 1
+            tree.step = snap.step
+            tree.entries.clear()
+            return tree
+        self.patched += 1
+        patched = next_hop.copy()
+        np.minimum.at(patched, node[better], via[better])
+        return _Tree(dst=tree.dst, step=snap.step, dist=dist, next_hop=patched)
+
+    def _tree_links(
+        self, snap: TopologySnapshot, keys: np.ndarray, dst: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        node, via = np.divmod(keys, snap.num_nodes)
+        inside = self._relays(snap, node, dst) & self._relays(snap, via, dst)
+        return node[inside], via[inside]
+
+    def _diff(self, step: int, snap: TopologySnapshot) -> Tuple[np.ndarray, np.ndarray]:
+        """Edge keys removed and added between `step` and `snap`."""
+        key = (step, snap.step)
+        diff = self._diffs.get(key)
+        if diff is None:
+            old = self.topology.step_snapshot(step)
+            removed = np.setdiff1d(old.edge_keys, snap.edge_keys, assume_unique=True)
+            added = np.setdiff1d(snap.edge_keys, old.edge_keys, assume_unique=True)
+            diff = (removed, added)
+            if len(self._diffs) >= 64:
+                self._diffs.clear()
+            self._diffs[key] = diff
+        return diff
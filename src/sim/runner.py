@@ -3,54 +3,199 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-import heapq
-from typing import Iterable, Iterator, List, Tuple
+import itertools
+import math
+from typing import Iterable, Iterator, List, Optional, Protocol, Tuple
+
+import numpy as np
 
 from ms_satshield.epoch import EpochManager
-from .flow import Packet
-from .traffic import TrafficSource
+from .flow import Packet, PacketBatch
+from .traffic import DEFAULT_BATCH_ROWS, TrafficSource, iter_batches
 
 
 @dataclass(frozen=True)
 class ExperimentConfig:
     epoch_ms: int
+    mode: str = "packet"  # packet | window
+
+
+class ResultSink(Protocol):
+    def write(self, epoch: int, result: object) -> None:
+        ...
 
 
 class ExperimentRunner:
+    """Drives a detector over merged traffic, one result per epoch.
+
+    In ``packet`` mode every packet goes through `on_packet`; in
+    ``window`` mode each epoch's packets are handed to `on_batch` as one
+    PacketBatch. Both produce the same results.
+    """
+
     def __init__(self, detector: EpochManager, config: ExperimentConfig) -> None:
+        if config.mode not in ("packet", "window"):
+            raise ValueError(f"Unsupported runner mode: {config.mode}")
         self.detector = detector
         self.config = config
 
     def run(self, sources: Iterable[TrafficSource]) -> List[object]:
-        events: List[object] = []
-        current_epoch_ms = 0.0
-        for packet in _merge_sources(sources):
-            while packet.ts_ms >= current_epoch_ms + self.config.epoch_ms:
-                events.append(self.detector.end_epoch())
-                current_epoch_ms += self.config.epoch_ms
-            self.detector.on_packet(packet.src, packet.dst, packet.size)
-        events.append(self.detector.end_epoch())
-        return events
+        return list(self.iter_epochs(sources))
 
+    def run_to(self, sources: Iterable[TrafficSource], sink: ResultSink) -> int:
+        """Stream every epoch's result into `sink`; returns the epoch count."""
+        epochs = 0
+        for epoch, result in enumerate(self.iter_epochs(sources)):
+            sink.write(epoch, result)
+            epochs += 1
+        return epochs
 
-def _merge_sources(sources: Iterable[TrafficSource]) -> Iterator[Packet]:
-    heap: List[Tuple[float, int, Packet]] = []
-    iterators: List[Iterator[Packet]] = []
-    for idx, source in enumerate(sources):
-        iterator = iter(source.packets())
-        iterators.append(iterator)
-        try:
-            packet = next(iterator)
-        except StopIteration:
-            continue
-        heapq.heappush(heap, (packet.ts_ms, idx, packet))
-
-    while heap:
-        _, idx, packet = heapq.heappop(heap)
-        yield packet
-        iterator = iterators[idx]
-        try:
-            next_packet = next(iterator)
-        except StopIteration:
+    def iter_epochs(self, sources: Iterable[TrafficSource]) -> Iterator[object]:
+        """Lazily yield each epoch's result as the merged stream passes it.
+
+        Only the current epoch's traffic is held, so long runs stay in
+        constant memory when the results are consumed as they arrive.
+        Runs of empty epochs share a single result object.
+        """
+        if self.config.mode == "window":
+            pieces = merge_epoch_windows(sources, self.config.epoch_ms)
+        else:
+            pieces = merge_epoch_batches(sources, self.config.epoch_ms)
+        current_epoch = 0
+        for epoch, batch in pieces:
+            if epoch > current_epoch:
+                yield from self._close_epochs(epoch - current_epoch)
+                current_epoch = epoch
+            self._ingest(batch)
+        yield self.detector.end_epoch()
+
+    def _ingest(self, batch: PacketBatch) -> None:
+        if self.config.mode == "window":
+            self.detector.on_batch(batch.src, batch.dst, batch.size)
+            return
+        on_packet = self.detector.on_packet
+        for src, dst, size in zip(batch.src.tolist(), batch.dst.tolist(), batch.size.tolist()):
+            on_packet(src, dst, size)
+
+    def _close_epochs(self, count: int) -> Iterator[object]:
+        """Close the current epoch and the `count - 1` empty ones after it."""
+        yield self.detector.end_epoch()
+        if count > 1:
+            yield from itertools.repeat(self.detector.idle_epochs(count - 1), count - 1)
+
+
+class _SourceCursor:
+    """Buffered read position in one source's time-ordered batch stream."""
+
+    def __init__(self, batches: Iterator[PacketBatch]) -> None:
+        self._batches = batches
+        self._head = PacketBatch.empty()
+        self.exhausted = False
+
+    @property
+    def empty(self) -> bool:
+        return len(self._head) == 0
+
+    def first_ts(self) -> float:
+        self._fill()
+        return float(self._head.ts_ms[0]) if len(self._head) else math.inf
+
+    def last_ts(self) -> float:
+        """Timestamp bound for every row not yet buffered (inf once exhausted)."""
+        self._fill()
+        if self.exhausted:
+            return math.inf
+        return float(self._head.ts_ms[-1])
+
+    def extend(self) -> None:
+        """Buffer one more chunk from the source."""
+        for batch in self._batches:
+            if len(batch):
+                self._head = PacketBatch.concat([self._head, batch])
+                return
+        self.exhausted = True
+
+    def take_before(self, limit: float) -> PacketBatch:
+        self._fill()
+        cut = int(np.searchsorted(self._head.ts_ms, limit, side="left"))
+        taken = self._head.slice(0, cut)
+        self._head = self._head.slice(cut, len(self._head))
+        return taken
+
+    def _fill(self) -> None:
+        if len(self._head) == 0 and not self.exhausted:
+            self.extend()
+
+
+def merge_epoch_batches(
+    sources: Iterable[TrafficSource],
+    epoch_ms: float,
+    max_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[Tuple[int, PacketBatch]]:
+    """Merge time-ordered sources into (epoch index, batch) pieces.
+
+    Every piece lies inside one epoch window ``[e * epoch_ms, (e + 1) *
+    epoch_ms)`` (timestamps before 0 count as epoch 0), pieces arrive in
+    epoch order, and rows keep the exact interleaving of a heap merge on
+    (ts_ms, source index): each step takes, from every source, the rows
+    strictly before a horizon no source can undercut, and stable-sorts
+    their concatenation in source order. Pieces hold at most about one
+    buffered chunk per source.
+    """
+    cursors = [_SourceCursor(iter_batches(source, max_rows)) for source in sources]
+    epoch: Optional[int] = None
+    while True:
+        cursors = [cursor for cursor in cursors if not (cursor.exhausted and cursor.empty)]
+        if not cursors:
+            return
+        head = min(cursor.first_ts() for cursor in cursors)
+        if head == math.inf:
+            return
+        if epoch is None or head >= (epoch + 1) * epoch_ms:
+            epoch = _epoch_of(head, epoch_ms, epoch or 0)
+        window_end = (epoch + 1) * epoch_ms
+        horizon = min(window_end, min(cursor.last_ts() for cursor in cursors))
+        if horizon <= head:
+            # The lagging source's buffer holds only rows at `head`; widen it.
+            for cursor in cursors:
+                if cursor.last_ts() == horizon:
+                    cursor.extend()
             continue
-        heapq.heappush(heap, (next_packet.ts_ms, idx, next_packet))
+        pieces = [cursor.take_before(horizon) for cursor in cursors]
+        merged = PacketBatch.concat([piece for piece in pieces if len(piece)])
+        if len(pieces) > 1:
+            merged = merged.take(np.argsort(merged.ts_ms, kind="stable"))
+        yield epoch, merged
+
+
+def merge_epoch_windows(
+    sources: Iterable[TrafficSource],
+    epoch_ms: float,
+    max_rows: int = DEFAULT_BATCH_ROWS,
+) -> Iterator[Tuple[int, PacketBatch]]:
+    """Like `merge_epoch_batches`, but one batch per non-empty epoch."""
+    pending: List[PacketBatch] = []
+    pending_epoch = 0
+    for epoch, batch in merge_epoch_batches(sources, epoch_ms, max_rows):
+        if pending and epoch != pending_epoch:
+            yield pending_epoch, PacketBatch.concat(pending)
+            pending = []
+        pending_epoch = epoch
+        pending.append(batch)
+    if pending:
+        yield pending_epoch, PacketBatch.concat(pending)
+
+
+def _epoch_of(ts_ms: float, epoch_ms: float, floor: int) -> int:
+    epoch = max(floor, int(ts_ms // epoch_ms))
+    while ts_ms >= (epoch + 1) * epoch_ms:
+        epoch += 1
+    while epoch > floor and ts_ms < epoch * epoch_ms:
+        epoch -= 1
+    return epoch
+
+
+def _merge_sources(sources: Iterable[TrafficSource]) -> Iterator[Packet]:
+    """Per-packet view of the merged stream, in heap-merge order."""
+    for _, batch in merge_epoch_batches(sources, math.inf):
+        yield from batch.packets()
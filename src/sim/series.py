@@ -0,0 +1,161 @@
+"""Append-only columnar time series of per-key epoch results.
+
+A series is a directory with a ``schema.json`` and one raw little-endian
+file per column. Each closed epoch appends one row per heavy key and side,
+so a run holds at most one epoch of results in memory. Readers memory-map
+the column files directly; rows are in epoch order.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import BinaryIO, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from ms_satshield.epoch import EpochResult, MultiEpochResult
+
+SERIES_VERSION = 1
+SIDES = ("src", "dst")
+SERIES_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("side", "u1"),
+    ("epoch", "<u4"),
+    ("key", "<i8"),
+    ("bytes", "<i8"),
+    ("fanout", "<f4"),
+    ("persist", "<u2"),
+    ("score", "<f4"),
+    ("queue", "u1"),
+)
+_SCHEMA_FILE = "schema.json"
+
+
+def _column_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.bin")
+
+
+class EpochSeriesWriter:
+    """Result sink that streams EpochResult/MultiEpochResult rows to disk.
+
+    `side` labels plain EpochResults; MultiEpochResults carry their own
+    sides. Opening a writer truncates any series already in `directory`.
+    """
+
+    def __init__(self, directory: str, side: str = "src") -> None:
+        if side not in SIDES:
+            raise ValueError(f"Unsupported series side: {side}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.side = side
+        self.rows = 0
+        schema = {
+            "version": SERIES_VERSION,
+            "sides": list(SIDES),
+            "columns": [list(column) for column in SERIES_COLUMNS],
+        }
+        with open(os.path.join(directory, _SCHEMA_FILE), "w") as handle:
+            json.dump(schema, handle)
+        self._files: Dict[str, BinaryIO] = {
+            name: open(_column_path(directory, name), "wb") for name, _ in SERIES_COLUMNS
+        }
+
+    def write(self, epoch: int, result: object) -> None:
+        if isinstance(result, MultiEpochResult):
+            parts: Iterable[Tuple[str, EpochResult]] = result.results.items()
+        else:
+            parts = [(self.side, result)]  # type: ignore[list-item]
+        for side, side_result in parts:
+            columns = _result_columns(SIDES.index(side), epoch, side_result)
+            for name, dtype in SERIES_COLUMNS:
+                self._files[name].write(columns[name].astype(dtype, copy=False).tobytes())
+            self.rows += len(columns["key"])
+
+    def flush(self) -> None:
+        for handle in self._files.values():
+            handle.flush()
+
+    def close(self) -> None:
+        for handle in self._files.values():
+            handle.close()
+
+    def __enter__(self) -> EpochSeriesWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _result_columns(side: int, epoch: int, result: EpochResult) -> Dict[str, np.ndarray]:
+    count = len(result.key_array)
+    return {
+        "side": np.full(count, side, dtype=np.uint8),
+        "epoch": np.full(count, epoch, dtype=np.uint32),
+        "key": result.key_array,
+        "bytes": result.count_array,
+        "fanout": result.fanout_array,
+        "persist": result.persist_array,
+        "score": result.score_array,
+        "queue": result.queue_array,
+    }
+
+
+class EpochSeries:
+    """Read-only, memory-mapped view of a series written by EpochSeriesWriter.
+
+    Columns are exposed as NumPy arrays by name. A trailing partial row
+    (e.g. from an interrupted run) is ignored.
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, _SCHEMA_FILE)) as handle:
+            schema = json.load(handle)
+        if schema.get("version") != SERIES_VERSION:
+            raise ValueError(f"Unsupported series version: {schema.get('version')}")
+        self.directory = directory
+        self.sides: Tuple[str, ...] = tuple(schema["sides"])
+        dtypes = [(name, np.dtype(dtype)) for name, dtype in schema["columns"]]
+        rows = min(
+            os.path.getsize(_column_path(directory, name)) // dtype.itemsize
+            for name, dtype in dtypes
+        )
+        self.columns: Dict[str, np.ndarray] = {
+            name: _map_column(_column_path(directory, name), dtype, rows) for name, dtype in dtypes
+        }
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def epoch_rows(self, epoch: int) -> slice:
+        """Row range of `epoch` (binary search on the epoch column)."""
+        epochs = self.columns["epoch"]
+        start = int(np.searchsorted(epochs, epoch, side="left"))
+        stop = int(np.searchsorted(epochs, epoch, side="right"))
+        return slice(start, stop)
+
+    def side_mask(self, side: str) -> np.ndarray:
+        return self.columns["side"] == self.sides.index(side)
+
+    def iter_epochs(self) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """Yield (epoch, column views) for every epoch that has rows."""
+        epochs = self.columns["epoch"]
+        if not self.rows:
+            return
+        bounds = np.flatnonzero(np.diff(epochs)) + 1
+        starts = np.concatenate([[0], bounds]).tolist()
+        stops = np.concatenate([bounds, [self.rows]]).tolist()
+        for start, stop in zip(starts, stops):
+            yield int(epochs[start]), {
+                name: column[start:stop] for name, column in self.columns.items()
+            }
+
+
+def _map_column(path: str, dtype: np.dtype, rows: int) -> np.ndarray:
+    if rows == 0:
+        # np.memmap cannot map an empty file.
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+import itertools
 import random
-from typing import Dict, Iterator, List, Optional
+from typing import Iterator, List, Optional, Tuple
 
-from .flow import FlowKey, Packet
-from .traffic import AttackParams, TrafficSource
+import numpy as np
+
+from .flow import FlowKey, Packet, PacketBatch
+from .traffic import DEFAULT_BATCH_ROWS, AttackParams, TrafficSource
 
 
 @dataclass(frozen=True)
@@ -47,6 +50,27 @@ class SyntheticBenign(TrafficSource):
                 ts_ms = base_ts + (idx / max(1, len(self._flows))) * (epoch_ms - 1)
                 yield Packet(ts_ms=ts_ms, src=flow.src, dst=flow.dst, size=size, flow=flow)
 
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+        epoch_ms = self.config.epoch_ms
+        epoch_count = max(1, int(self.config.duration_ms / epoch_ms))
+        flows = len(self._flows)
+        src = np.fromiter((flow.src for flow in self._flows), dtype=np.int64, count=flows)
+        dst = np.fromiter((flow.dst for flow in self._flows), dtype=np.int64, count=flows)
+        rates = np.asarray(self._rates_kbps, dtype=np.float64)
+        sizes = (rates * 1000 / 8 * (epoch_ms / 1000)).astype(np.int64)
+        sizes[sizes <= 0] = 1
+        offsets = (np.arange(flows, dtype=np.float64) / max(1, flows)) * (epoch_ms - 1)
+        for epoch in range(epoch_count):
+            ts_ms = epoch * epoch_ms + offsets
+            for start in range(0, flows, max_rows):
+                stop = start + max_rows
+                yield PacketBatch(
+                    ts_ms=ts_ms[start:stop],
+                    src=src[start:stop],
+                    dst=dst[start:stop],
+                    size=sizes[start:stop],
+                )
+
 
 @dataclass(frozen=True)
 class SyntheticAttackConfig:
@@ -61,6 +85,14 @@ class SyntheticAttackConfig:
 
 
 class SyntheticAttack(TrafficSource):
+    """Bots spreading a fixed per-bot rate over a (sampled) decoy set.
+
+    Decoy assignment is held as a bots x decoy_sample index matrix (or
+    implied when every bot uses every decoy), and packets are generated
+    as fixed-size column chunks of the bot-major, decoy-minor order, so
+    memory stays bounded by `max_rows` regardless of bots x decoys.
+    """
+
     def __init__(self, config: SyntheticAttackConfig) -> None:
         self.config = config
         rng = random.Random(config.seed)
@@ -68,31 +100,48 @@ class SyntheticAttack(TrafficSource):
         self.attack_dsts = [20_000_000 + i for i in range(config.decoys)]
         sample = config.decoy_sample or config.decoys
         self._decoy_sample = max(1, min(sample, config.decoys))
-        self._bot_decoys: Dict[int, List[int]] = {}
-        for bot in self.attack_srcs:
-            if self._decoy_sample == config.decoys:
-                decoys = list(self.attack_dsts)
-            else:
-                decoys = rng.sample(self.attack_dsts, self._decoy_sample)
-            self._bot_decoys[bot] = decoys
+        # Sampling positions from range(decoys) consumes the RNG exactly like
+        # sampling from attack_dsts, so assignments stay seed-reproducible.
+        # random.sample draws by rejection, so each bot's share of the RNG
+        # stream depends on the previous bots' draws and cannot be split
+        # up front; the rows are streamed straight into the matrix instead.
+        self._decoy_matrix: Optional[np.ndarray] = None
+        if self._decoy_sample != config.decoys:
+            population = range(config.decoys)
+            rows = (rng.sample(population, self._decoy_sample) for _ in range(config.bots))
+            self._decoy_matrix = np.fromiter(
+                itertools.chain.from_iterable(rows),
+                dtype=np.int64,
+                count=config.bots * self._decoy_sample,
+            ).reshape(config.bots, self._decoy_sample)
 
     def packets(self) -> Iterator[Packet]:
+        for batch in self.batches():
+            yield from batch.packets()
+
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
         epoch_ms = self.config.epoch_ms
         bytes_per_bot = self.config.rate_mbps * 1_000_000 / 8 * (epoch_ms / 1000)
-        bytes_per_flow = bytes_per_bot / self._decoy_sample
+        size = max(1, int(bytes_per_bot / self._decoy_sample))
+        rows = self.config.bots * self._decoy_sample
+        if rows <= 0:
+            return
         for ts_ms in range(self.config.attack_start_ms, self.config.attack_end_ms, epoch_ms):
-            for bot_idx, bot in enumerate(self.attack_srcs):
-                decoys = self._bot_decoys[bot]
-                for decoy_idx, decoy in enumerate(decoys):
-                    size = int(bytes_per_flow)
-                    if size <= 0:
-                        size = 1
-                    flow = FlowKey(src=bot, dst=decoy)
-                    offset = (bot_idx + decoy_idx / max(1, len(decoys))) / max(1, self.config.bots)
-                    yield Packet(
-                        ts_ms=ts_ms + offset * (epoch_ms - 1),
-                        src=bot,
-                        dst=decoy,
-                        size=size,
-                        flow=flow,
-                    )
+            for start in range(0, rows, max_rows):
+                src, dst, offsets = self._chunk_columns(start, min(rows, start + max_rows))
+                yield PacketBatch(
+                    ts_ms=ts_ms + offsets * (epoch_ms - 1),
+                    src=src,
+                    dst=dst,
+                    size=np.full(src.size, size, dtype=np.int64),
+                )
+
+    def _chunk_columns(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        row = np.arange(start, stop, dtype=np.int64)
+        bot_idx, decoy_idx = np.divmod(row, self._decoy_sample)
+        if self._decoy_matrix is None:
+            decoy = decoy_idx
+        else:
+            decoy = self._decoy_matrix[bot_idx, decoy_idx]
+        offsets = (bot_idx + decoy_idx / self._decoy_sample) / max(1, self.config.bots)
+        return 10_000_000 + bot_idx, 20_000_000 + decoy, offsets
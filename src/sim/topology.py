@@ -2,8 +2,15 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, List, Protocol
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+import hashlib
+import math
+import os
+from typing import Iterable, Iterator, List, Optional, Protocol, Tuple
+
+import numpy as np
 
 
 @dataclass(frozen=True)
@@ -27,3 +34,316 @@ class RoutingModel(Protocol):
 class TopologyProvider(Protocol):
     def snapshot(self, ts_ms: float) -> Iterable[Link]:
         ...
+
+
+EARTH_RADIUS_KM = 6371.0
+_EARTH_MU_KM3_S2 = 398_600.4418
+_EARTH_ROTATION_RAD_S = 7.2921159e-5
+_GSL_CHUNK = 1024
+
+
+@dataclass(frozen=True)
+class WalkerConfig:
+    """Walker constellation with +Grid ISLs and ground-station links.
+
+    Satellite ``plane * sats_per_plane + slot`` comes first, then station i (lat, lon).
+    """
+
+    planes: int = 24
+    sats_per_plane: int = 22
+    phasing: int = 1
+    pattern: str = "delta"  # delta | star
+    altitude_km: float = 550.0
+    inclination_deg: float = 53.0
+    polar_cutoff_deg: float = 70.0
+    min_elevation_deg: float = 25.0
+    gsl_links: int = 1
+    isl_gbps: float = 20.0
+    gsl_gbps: float = 10.0
+    step_ms: int = 10_000
+    ground_stations: Tuple[Tuple[float, float], ...] = field(default=())
+
+    @property
+    def satellites(self) -> int:
+        return self.planes * self.sats_per_plane
+
+    @property
+    def nodes(self) -> int:
+        return self.satellites + len(self.ground_stations)
+
+
+@dataclass(frozen=True, eq=False)
+class TopologySnapshot:
+    """Directed links of one topology step in CSR form; edge ids index `indices`."""
+
+    step: int
+    start_ms: float
+    satellites: int
+    isl_gbps: float
+    gsl_gbps: float
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        return self.num_edges
+
+    def __iter__(self) -> Iterator[Link]:
+        capacity = self.capacity_gbps.tolist()
+        for edge, (src, dst) in enumerate(zip(self.edge_src.tolist(), self.indices.tolist())):
+            yield Link(src=src, dst=dst, capacity_gbps=capacity[edge])
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def link(self, edge: int) -> Link:
+        return Link(
+            src=int(self.edge_src[edge]),
+            dst=int(self.indices[edge]),
+            capacity_gbps=float(self.capacity_gbps[edge]),
+        )
+
+    def edge_ids(self, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """Edge id of every (src, dst) pair, or -1 where there is no link."""
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        wanted = src * self.num_nodes + dst
+        keys = self.edge_keys
+        if not keys.size:
+            return np.full(wanted.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(keys, wanted), keys.size - 1)
+        return np.where(keys[pos] == wanted, pos, -1)
+
+    @cached_property
+    def edge_src(self) -> np.ndarray:
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+
+    @cached_property
+    def edge_keys(self) -> np.ndarray:
+        """``src * num_nodes + dst`` per edge; sorted, as rows and columns are."""
+        return self.edge_src * self.num_nodes + self.indices
+
+    @cached_property
+    def capacity_gbps(self) -> np.ndarray:
+        isl = (self.edge_src < self.satellites) & (self.indices < self.satellites)
+        return np.where(isl, self.isl_gbps, self.gsl_gbps)
+
+
+class WalkerTopology:
+    """TopologyProvider over a Walker constellation, computed at each step's start.
+
+    Steps are kept in an LRU of `max_steps` and, with `cache_dir`, as ``.npz`` files.
+    """
+
+    def __init__(
+        self,
+        config: WalkerConfig,
+        origin_ms: float = 0.0,
+        cache_dir: Optional[str] = None,
+        max_steps: int = 4096,
+    ) -> None:
+        if config.planes <= 0 or config.sats_per_plane <= 0:
+            raise ValueError("planes and sats_per_plane must be positive")
+        if config.pattern not in ("delta", "star"):
+            raise ValueError(f"Unsupported Walker pattern: {config.pattern}")
+        if config.step_ms <= 0:
+            raise ValueError(f"step_ms must be positive: {config.step_ms}")
+        if config.gsl_links < 0:
+            raise ValueError(f"gsl_links must be non-negative: {config.gsl_links}")
+        self.config = config
+        self.origin_ms = origin_ms
+        self.max_steps = max_steps
+        self.generated = 0
+        self._steps: "OrderedDict[int, TopologySnapshot]" = OrderedDict()
+        self._directory: Optional[str] = None
+        if cache_dir is not None:
+            digest = hashlib.sha1(repr((config, origin_ms)).encode()).hexdigest()[:16]
+            self._directory = os.path.join(cache_dir, f"walker-{digest}")
+        self._stations = _station_vectors(config.ground_stations)
+        self._plane_slot = np.divmod(np.arange(config.satellites), config.sats_per_plane)
+
+    def step_of(self, ts_ms: float) -> int:
+        step = math.floor((ts_ms - self.origin_ms) / self.config.step_ms)
+        if step < 0:
+            raise ValueError(f"ts_ms {ts_ms} precedes the topology origin {self.origin_ms}")
+        return step
+
+    def steps_of(self, ts_ms: np.ndarray) -> np.ndarray:
+        """Vectorized `step_of`."""
+        steps = np.floor((np.asarray(ts_ms, dtype=np.float64) - self.origin_ms) / self.config.step_ms)
+        if steps.size and steps.min() < 0:
+            raise ValueError(f"Timestamps precede the topology origin {self.origin_ms}")
+        return steps.astype(np.int64)
+
+    def snapshot(self, ts_ms: float) -> TopologySnapshot:
+        return self.step_snapshot(self.step_of(ts_ms))
+
+    def step_snapshot(self, step: int) -> TopologySnapshot:
+        snap = self._steps.get(step)
+        if snap is not None:
+            self._steps.move_to_end(step)
+            return snap
+        snap = self._load(step)
+        if snap is None:
+            snap = self._generate(step)
+            self._store(snap)
+        self._steps[step] = snap
+        while len(self._steps) > self.max_steps:
+            self._steps.popitem(last=False)
+        return snap
+
+    def precompute(self, start_ms: float, end_ms: float) -> None:
+        """Materialize every step overlapping ``[start_ms, end_ms)``."""
+        for step in range(self.step_of(start_ms), self.step_of(end_ms - 1e-9) + 1):
+            self.step_snapshot(step)
+
+    def positions_km(self, t_s: float) -> np.ndarray:
+        """Earth-fixed satellite positions at `t_s` seconds, shape (satellites, 3)."""
+        cfg = self.config
+        plane, slot = self._plane_slot
+        radius = EARTH_RADIUS_KM + cfg.altitude_km
+        motion = math.sqrt(_EARTH_MU_KM3_S2 / radius ** 3)
+        spread = 2.0 * math.pi if cfg.pattern == "delta" else math.pi
+        raan = spread * plane / cfg.planes
+        anomaly = (
+            2.0 * math.pi * slot / cfg.sats_per_plane
+            + 2.0 * math.pi * cfg.phasing * plane / cfg.satellites
+            + motion * t_s
+        )
+        # Fold Earth rotation into the node longitude to get Earth-fixed coordinates.
+        node = raan - _EARTH_ROTATION_RAD_S * t_s
+        inc = math.radians(cfg.inclination_deg)
+        cos_u, sin_u = np.cos(anomaly), np.sin(anomaly)
+        cos_n, sin_n = np.cos(node), np.sin(node)
+        return radius * np.stack(
+            [
+                cos_n * cos_u - sin_n * sin_u * math.cos(inc),
+                sin_n * cos_u + cos_n * sin_u * math.cos(inc),
+                sin_u * math.sin(inc),
+            ],
+            axis=1,
+        )
+
+    def _generate(self, step: int) -> TopologySnapshot:
+        cfg = self.config
+        start_ms = self.origin_ms + step * cfg.step_ms
+        pos = self.positions_km(start_ms / 1000.0)
+        src, dst = self._isl_edges(pos)
+        gs_src, gs_dst = self._gsl_edges(pos)
+        src = np.concatenate([src, gs_src])
+        dst = np.concatenate([dst, gs_dst])
+        nodes = cfg.nodes
+        keys = np.unique(np.concatenate([src * nodes + dst, dst * nodes + src]))
+        rows, cols = np.divmod(keys, nodes)
+        indptr = np.zeros(nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=nodes), out=indptr[1:])
+        self.generated += 1
+        return TopologySnapshot(
+            step=step,
+            start_ms=start_ms,
+            satellites=cfg.satellites,
+            isl_gbps=cfg.isl_gbps,
+            gsl_gbps=cfg.gsl_gbps,
+            indptr=indptr,
+            indices=cols.astype(np.int32),
+        )
+
+    def _isl_edges(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cfg = self.config
+        planes, per_plane = cfg.planes, cfg.sats_per_plane
+        plane, slot = self._plane_slot
+        sats = np.arange(cfg.satellites, dtype=np.int64)
+        intra = plane * per_plane + (slot + 1) % per_plane
+        src, dst = [sats], [intra]
+        lat_ok = np.abs(pos[:, 2]) <= np.linalg.norm(pos, axis=1) * math.sin(
+            math.radians(cfg.polar_cutoff_deg)
+        )
+        cross = plane < planes - 1
+        cross_dst = (plane + 1) * per_plane + slot
+        if cfg.pattern == "delta" and planes > 1:
+            # Slot s of the last plane lines up with slot s + F of plane 0.
+            cross = np.ones(cfg.satellites, dtype=bool)
+            seam = plane == planes - 1
+            cross_dst = np.where(seam, (slot + cfg.phasing) % per_plane, cross_dst)
+        cross_src = sats[cross]
+        cross_dst = cross_dst[cross]
+        active = lat_ok[cross_src] & lat_ok[cross_dst]
+        src.append(cross_src[active])
+        dst.append(cross_dst[active])
+        src_arr, dst_arr = np.concatenate(src), np.concatenate(dst)
+        keep = src_arr != dst_arr
+        return src_arr[keep], dst_arr[keep]
+
+    def _gsl_edges(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cfg = self.config
+        stations = self._stations
+        links = min(cfg.gsl_links, cfg.satellites)
+        if not len(stations) or links == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        radius = EARTH_RADIUS_KM + cfg.altitude_km
+        min_sin = math.sin(math.radians(cfg.min_elevation_deg))
+        src, dst = [], []
+        for start in range(0, len(stations), _GSL_CHUNK):
+            # All satellites share one orbit radius, so elevation rises
+            # monotonically with the projection onto the station's zenith.
+            proj = stations[start : start + _GSL_CHUNK] @ pos.T
+            if links == 1:
+                best = np.argmax(proj, axis=1)[:, None]
+            elif links < cfg.satellites:
+                best = np.argpartition(-proj, links - 1, axis=1)[:, :links]
+            else:
+                best = np.broadcast_to(np.arange(cfg.satellites), proj.shape)
+            top = np.take_along_axis(proj, best, axis=1)
+            slant = np.sqrt(radius ** 2 + EARTH_RADIUS_KM ** 2 - 2.0 * EARTH_RADIUS_KM * top)
+            visible = (top - EARTH_RADIUS_KM) >= min_sin * slant
+            station = np.arange(start, start + len(proj))[:, None] + cfg.satellites
+            src.append(np.broadcast_to(station, best.shape)[visible])
+            dst.append(best[visible].astype(np.int64))
+        return np.concatenate(src), np.concatenate(dst)
+
+    def _step_path(self, step: int) -> Optional[str]:
+        if self._directory is None:
+            return None
+        return os.path.join(self._directory, f"step-{step:08d}.npz")
+
+    def _load(self, step: int) -> Optional[TopologySnapshot]:
+        path = self._step_path(step)
+        if path is None or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            indptr, indices = data["indptr"], data["indices"]
+        cfg = self.config
+        return TopologySnapshot(
+            step=step,
+            start_ms=self.origin_ms + step * cfg.step_ms,
+            satellites=cfg.satellites,
+            isl_gbps=cfg.isl_gbps,
+            gsl_gbps=cfg.gsl_gbps,
+            indptr=indptr,
+            indices=indices,
+        )
+
+    def _store(self, snap: TopologySnapshot) -> None:
+        path = self._step_path(snap.step)
+        if path is None:
+            return
+        os.makedirs(self._directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, indptr=snap.indptr, indices=snap.indices)
+        # Atomic publish; a concurrent writer of the same step wrote identical data.
+        os.replace(tmp_path, path)
+
+
+def _station_vectors(stations: Iterable[Tuple[float, float]]) -> np.ndarray:
+    """Unit Earth-fixed position vectors of (lat, lon) degree pairs."""
+    coords = np.asarray(list(stations), dtype=np.float64).reshape(-1, 2)
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
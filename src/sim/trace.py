@@ -0,0 +1,213 @@
+"""Fixed-width binary packet traces.
+
+A trace file is a 32-byte header followed by little-endian records of
+``TRACE_DTYPE`` (ts_ms, src, dst, size), sorted by timestamp. Readers
+memory-map the records, so every column is a zero-copy strided view with
+PacketBatch dtypes. An optional ``<trace>.idx.npz`` sidecar holds the
+first row of every fixed time bucket, bounding timestamp lookups to one
+bucket.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .flow import PacketBatch
+
+TRACE_MAGIC = b"P4DTRACE"
+TRACE_VERSION = 1
+TRACE_DTYPE = np.dtype([("ts_ms", "<f8"), ("src", "<i8"), ("dst", "<i8"), ("size", "<i8")])
+TRACE_COLUMNS = ("ts_ms", "src", "dst", "size")
+_HEADER = struct.Struct("<8sIIQ8x")  # magic, version, record size, rows
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx.npz"
+
+
+class TraceWriter:
+    """Appends time-ordered PacketBatches to a new trace file.
+
+    The row count in the header is written on `close`; a trace whose
+    writer never closed reads as empty.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.rows = 0
+        self._last_ts = -math.inf
+        self._handle: BinaryIO = open(path, "wb")
+        self._handle.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_DTYPE.itemsize, 0))
+
+    def write(self, batch: PacketBatch) -> None:
+        rows = len(batch)
+        if not rows:
+            return
+        ts_ms = np.asarray(batch.ts_ms, dtype=np.float64)
+        if ts_ms[0] < self._last_ts or np.any(np.diff(ts_ms) < 0):
+            raise ValueError("Trace timestamps must be non-decreasing")
+        records = np.empty(rows, dtype=TRACE_DTYPE)
+        for name in TRACE_COLUMNS:
+            records[name] = getattr(batch, name)
+        self._handle.write(records.tobytes())
+        self._last_ts = float(ts_ms[-1])
+        self.rows += rows
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        self._handle.seek(0)
+        self._handle.write(
+            _HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_DTYPE.itemsize, self.rows)
+        )
+        self._handle.close()
+
+    def __enter__(self) -> TraceWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class TraceFile:
+    """Memory-mapped, read-only view of a trace file."""
+
+    def __init__(self, path: str, use_index: bool = True) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Truncated trace header: {path}")
+        magic, version, record_size, rows = _HEADER.unpack(header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"Not a version {TRACE_VERSION} trace file: {path}")
+        if record_size != TRACE_DTYPE.itemsize:
+            raise ValueError(f"Unexpected trace record size {record_size}: {path}")
+        available = (os.path.getsize(path) - _HEADER.size) // record_size
+        self.rows = min(rows, available)
+        if self.rows:
+            self.records = np.memmap(
+                path, dtype=TRACE_DTYPE, mode="r", offset=_HEADER.size, shape=(self.rows,)
+            )
+        else:
+            # np.memmap cannot map zero records.
+            self.records = np.empty(0, dtype=TRACE_DTYPE)
+        self.ts_ms: np.ndarray = self.records["ts_ms"]
+        self._index: Optional[Tuple[float, float, np.ndarray]] = None
+        if use_index and os.path.exists(index_path(path)):
+            with np.load(index_path(path)) as data:
+                self._index = (
+                    float(data["origin_ms"]),
+                    float(data["bucket_ms"]),
+                    np.asarray(data["offsets"], dtype=np.int64),
+                )
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def indexed(self) -> bool:
+        return self._index is not None
+
+    def first_row(self, ts_ms: float) -> int:
+        """Index of the first record with timestamp >= `ts_ms`."""
+        lo, hi = 0, self.rows
+        if self._index is not None:
+            origin, bucket_ms, offsets = self._index
+            bucket = math.floor((ts_ms - origin) / bucket_ms)
+            if bucket < 0:
+                return 0
+            if bucket >= len(offsets) - 1:
+                return self.rows
+            lo, hi = int(offsets[bucket]), int(offsets[bucket + 1])
+        return lo + int(np.searchsorted(self.ts_ms[lo:hi], ts_ms, side="left"))
+
+    def slice(self, start: int, stop: int) -> PacketBatch:
+        """Rows [start, stop) as zero-copy column views."""
+        records = self.records[start:stop]
+        return PacketBatch(
+            ts_ms=records["ts_ms"], src=records["src"], dst=records["dst"], size=records["size"]
+        )
+
+
+def build_trace_index(path: str, bucket_ms: float) -> str:
+    """Write the time-bucket index sidecar for `path`; returns its path."""
+    if bucket_ms <= 0:
+        raise ValueError(f"bucket_ms must be positive: {bucket_ms}")
+    trace = TraceFile(path, use_index=False)
+    origin = float(trace.ts_ms[0]) if trace.rows else 0.0
+    last = float(trace.ts_ms[-1]) if trace.rows else 0.0
+    buckets = int((last - origin) // bucket_ms) + 1
+    edges = origin + bucket_ms * np.arange(buckets + 1, dtype=np.float64)
+    offsets = np.searchsorted(trace.ts_ms, edges, side="left").astype(np.int64)
+    out = index_path(path)
+    with open(out, "wb") as handle:
+        np.savez(handle, origin_ms=origin, bucket_ms=float(bucket_ms), offsets=offsets)
+    return out
+
+
+def convert_text_trace(
+    text_path: str,
+    trace_path: str,
+    columns: Sequence[str] = TRACE_COLUMNS,
+    delimiter: Optional[str] = ",",
+    chunk_rows: int = 1 << 20,
+    header: Optional[bool] = None,
+) -> int:
+    """Convert a CSV/whitespace text trace into a binary trace file.
+
+    `columns` names the text fields in order; fields named other than
+    ts_ms/src/dst/size are skipped. `header` says whether the first
+    non-blank line is a header; by default it is one when any of its
+    ts_ms/src/dst/size fields is non-numeric. Rows must already be in
+    timestamp order. Returns the number of records written.
+    """
+    missing = [name for name in TRACE_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Text trace columns missing {missing}")
+    usecols = [columns.index(name) for name in TRACE_COLUMNS]
+    dtype = [(name, TRACE_DTYPE[name]) for name in TRACE_COLUMNS]
+    with open(text_path) as source, TraceWriter(trace_path) as writer:
+        lines = _skip_header(source, delimiter, usecols, header)
+        while True:
+            chunk = list(itertools.islice(lines, chunk_rows))
+            if not chunk:
+                break
+            parsed = np.loadtxt(
+                chunk, dtype=dtype, delimiter=delimiter, usecols=usecols, ndmin=1
+            )
+            writer.write(PacketBatch(*(parsed[name] for name in TRACE_COLUMNS)))
+        return writer.rows
+
+
+def _skip_header(
+    lines: Iterator[str],
+    delimiter: Optional[str],
+    usecols: Sequence[int],
+    header: Optional[bool],
+) -> Iterator[str]:
+    lines = (line for line in lines if line.strip())
+    first = next(lines, None)
+    if first is None:
+        return iter(())
+    if header is None:
+        header = not _numeric_fields(first, delimiter, usecols)
+    if header:
+        return lines
+    return itertools.chain([first], lines)
+
+
+def _numeric_fields(line: str, delimiter: Optional[str], usecols: Sequence[int]) -> bool:
+    fields = line.split(delimiter)
+    try:
+        for col in usecols:
+            float(fields[col])
+    except (IndexError, ValueError):
+        return False
+    return True
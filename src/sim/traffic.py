@@ -3,15 +3,47 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, Iterator, Protocol
+import math
+from typing import Iterable, Iterator, List, Optional, Protocol, Tuple
 
-from .flow import Packet
+import numpy as np
+
+from .flow import Packet, PacketBatch
+from .trace import TraceFile
+
+DEFAULT_BATCH_ROWS = 65_536
 
 
 class TrafficSource(Protocol):
     def packets(self) -> Iterator[Packet]:
         ...
 
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+        """Time-ordered column batches of at most `max_rows` packets."""
+        return batches_from_packets(self.packets(), max_rows)
+
+
+def batches_from_packets(
+    packets: Iterable[Packet], max_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[PacketBatch]:
+    """Adapt a per-packet stream into PacketBatch chunks."""
+    chunk: List[Packet] = []
+    for packet in packets:
+        chunk.append(packet)
+        if len(chunk) >= max_rows:
+            yield PacketBatch.from_packets(chunk)
+            chunk = []
+    if chunk:
+        yield PacketBatch.from_packets(chunk)
+
+
+def iter_batches(source: object, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+    """Column batches from any source, including packet-only duck types."""
+    batches = getattr(source, "batches", None)
+    if batches is not None:
+        return iter(batches(max_rows))
+    return batches_from_packets(source.packets(), max_rows)  # type: ignore[attr-defined]
+
 
 @dataclass(frozen=True)
 class AttackParams:
@@ -31,8 +63,44 @@ class LFABase(TrafficSource):
 
 
 class BenignReplay(TrafficSource):
-    def __init__(self, trace_path: str) -> None:
+    """Replays a binary trace (see sim.trace) over ``[start_ms, end_ms)``.
+
+    The trace is memory-mapped and batches are zero-copy views of it.
+    The start offset is found through the trace's time index when one
+    exists, otherwise by binary search; timestamps are replayed as
+    recorded.
+    """
+
+    def __init__(
+        self,
+        trace_path: str,
+        start_ms: Optional[float] = None,
+        end_ms: Optional[float] = None,
+        use_index: bool = True,
+    ) -> None:
         self.trace_path = trace_path
+        self.trace = TraceFile(trace_path, use_index=use_index)
+        self.start_row = 0 if start_ms is None else self.trace.first_row(start_ms)
+        self.stop_row = self.trace.rows if end_ms is None else self.trace.first_row(end_ms)
+        self.stop_row = max(self.start_row, self.stop_row)
 
     def packets(self) -> Iterator[Packet]:
-        raise NotImplementedError
+        for batch in self.batches():
+            yield from batch.packets()
+
+    def batches(self, max_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[PacketBatch]:
+        for start in range(self.start_row, self.stop_row, max_rows):
+            yield self.trace.slice(start, min(self.stop_row, start + max_rows))
+
+    def epochs(self, epoch_ms: float) -> Iterator[Tuple[int, PacketBatch]]:
+        """Yield (epoch index, batch) for every non-empty epoch in range."""
+        if self.stop_row <= self.start_row:
+            return
+        ts_ms = self.trace.ts_ms[self.start_row : self.stop_row]
+        first = math.floor(float(ts_ms[0]) / epoch_ms)
+        last = math.floor(float(ts_ms[-1]) / epoch_ms)
+        edges = np.arange(first, last + 2, dtype=np.float64) * epoch_ms
+        bounds = (np.searchsorted(ts_ms, edges, side="left") + self.start_row).tolist()
+        for epoch, start, stop in zip(range(first, last + 1), bounds, bounds[1:]):
+            if stop > start:
+                yield epoch, self.trace.slice(start, stop)
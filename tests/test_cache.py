@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+from sim.cache import TrafficCache
+from sim.flow import PacketBatch
+
+
+class _Source:
+    def __init__(self, rows, offset=0):
+        self.rows = rows
+        self.offset = offset
+        self.calls = 0
+
+    def batches(self, max_rows=4):
+        self.calls += 1
+        ids = np.arange(self.rows) + self.offset
+        for start in range(0, self.rows, max_rows):
+            part = ids[start : start + max_rows]
+            yield PacketBatch.from_columns(part * 1.0, part, part + 100, np.full(part.size, 64))
+
+
+def _unused():
+    raise AssertionError("factory called on a cached entry")
+
+
+def test_lru_evicts_least_recently_used_by_count():
+    cache = TrafficCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.get(key, lambda: _Source(3))
+    cache.get("a", _unused)
+    cache.get("c", lambda: _Source(3))
+    assert list(cache._entries) == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.get("b", lambda: _Source(3))
+    assert list(cache._entries) == ["c", "b"]
+    assert cache.misses == 4
+
+
+def test_max_bytes_bounds_total_size():
+    row_bytes = 4 * 8
+    cache = TrafficCache(max_entries=10, max_bytes=25 * row_bytes)
+    for key in range(4):
+        cache.get(key, lambda: _Source(10))
+        assert cache.nbytes <= cache.max_bytes
+    assert list(cache._entries) == [2, 3]
+    # A single entry larger than the budget is still kept.
+    cache.get("big", lambda: _Source(40))
+    assert list(cache._entries) == ["big"]
+    assert cache.nbytes == 40 * row_bytes
+
+
+def test_cached_batches_replay_source_columns():
+    entry = TrafficCache().get("a", lambda: _Source(10, offset=5))
+    chunks = list(entry.batches(max_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert PacketBatch.concat(chunks).src.tolist() == list(range(5, 15))
+    assert [p.dst for p in entry.packets()] == list(range(105, 115))
+
+
+def test_directory_entries_reopen_memory_mapped(tmp_path):
+    source = _Source(10, offset=7)
+    first = TrafficCache(directory=str(tmp_path)).get(("cfg", 1), lambda: source)
+    assert source.calls == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    reopened = TrafficCache(directory=str(tmp_path))
+    entry = reopened.get(("cfg", 1), _unused)
+    assert reopened.misses == 1
+    assert isinstance(entry.batch.src, np.memmap)
+    for name in ("ts_ms", "src", "dst", "size"):
+        np.testing.assert_array_equal(getattr(entry.batch, name), getattr(first.batch, name))
+        assert getattr(entry.batch, name).dtype == getattr(first.batch, name).dtype
+    assert entry.batch.src.tolist() == list(range(7, 17))
+
+
+def test_publish_race_keeps_existing_entry(tmp_path):
+    cache = TrafficCache(directory=str(tmp_path))
+    cache.get("cfg", lambda: _Source(4))
+    batch = PacketBatch.from_columns([0.0], [99], [99], [1])
+    stored = TrafficCache(directory=str(tmp_path))._store("cfg", batch)
+    assert stored.src.tolist() == [0, 1, 2, 3]
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(cache._path("cfg"))]
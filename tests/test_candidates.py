@@ -0,0 +1,27 @@
+import pytest
+
+from ms_satshield.candidates import CandidateTable
+
+
+def test_promotion_evicts_least_recently_seen():
+    table = CandidateTable(3)
+    for key in (1, 2, 3):
+        assert table.add(key) is None
+    assert table.touch(1)
+    assert not table.touch(9)
+    assert table.add(4) == 2
+    assert list(table) == [3, 1, 4]
+    assert (table.promotions, table.evictions) == (4, 1)
+
+
+def test_reset_seeds_most_important_last_evicted():
+    table = CandidateTable(3)
+    table.reset([7, 8, 7, 9, 10])
+    assert len(table) == 3 and 10 not in table
+    assert table.add(11) == 9
+    assert table.promotions == 1 and table.evictions == 1
+
+
+def test_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        CandidateTable(0)
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import TopKConfig
+from ms_satshield.detector import _MAX_GENERATION, ArrayTopKFilter, FlowDetector, TopKFilter
+
+
+def _epochs(seed=7, epochs=4, packets=4000):
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        keys = (rng.pareto(1.1, packets) * 40).astype(np.int64)
+        sizes = rng.integers(64, 1500, packets).astype(np.int64)
+        yield keys, sizes
+
+
+def _records(records):
+    return [(rec.key, rec.count) for rec in records]
+
+
+def _list_aux(filt):
+    return {
+        idx: (entry.key, entry.r_cnt, entry.v_cnt)
+        for idx, entry in enumerate(filt._aux)
+        if filt._aux_stamps[idx] == filt._generation
+    }
+
+
+def _array_aux(filt):
+    live = np.flatnonzero(np.asarray(filt._aux_stamps) == filt._generation)
+    return {
+        int(idx): (int(filt._aux_keys[idx]), int(filt._aux_r_cnt[idx]), int(filt._aux_v_cnt[idx]))
+        for idx in live
+    }
+
+
+@pytest.mark.parametrize("hash_mode", ["mix", "crc32"])
+def test_array_filter_matches_list_filter(hash_mode):
+    config = TopKConfig(stages=3, buckets_per_stage=64, heavy_threshold_bytes=2000, hash_mode=hash_mode)
+    ref, arr = TopKFilter(config), ArrayTopKFilter(config)
+    for epoch, (keys, sizes) in enumerate(_epochs()):
+        # Alternate single-packet and mirrored bulk updates on the array side.
+        if epoch % 2:
+            expected = [ref.update(k, s) for k, s in zip(keys.tolist(), sizes.tolist())]
+            got = arr.update_many(keys, sizes).tolist()
+        else:
+            expected = ref.update_many(keys, sizes).tolist()
+            got = [arr.update(k, s) for k, s in zip(keys.tolist(), sizes.tolist())]
+        assert got == expected
+        assert _records(arr.snapshot()) == _records(ref.snapshot())
+        assert _records(arr.top(5)) == _records(ref.top(5))
+        assert _array_aux(arr) == _list_aux(ref)
+        ref.reset()
+        arr.reset()
+        assert arr.snapshot() == [] and _array_aux(arr) == {}
+
+
+def test_on_batch_matches_on_packet():
+    for backend in ("list", "array"):
+        config = TopKConfig(stages=4, buckets_per_stage=128, backend=backend)
+        per_packet, batched = FlowDetector(config), FlowDetector(config)
+        for keys, sizes in _epochs(seed=3):
+            expected = [per_packet.on_packet(k, s) for k, s in zip(keys.tolist(), sizes.tolist())]
+            # Small chunks stay on the array tables, large ones are mirrored.
+            got = np.concatenate(
+                [batched.on_batch(keys[lo:hi], sizes[lo:hi]) for lo, hi in ((0, 50), (50, 1000), (1000, None))]
+            )
+            assert got.tolist() == expected
+            assert _records(batched.end_epoch()) == _records(per_packet.end_epoch())
+            per_packet.reset()
+            batched.reset()
+
+
+@pytest.mark.parametrize("cls", [TopKFilter, ArrayTopKFilter])
+def test_reset_survives_generation_wraparound(cls):
+    config = TopKConfig(stages=3, buckets_per_stage=64)
+    epochs = list(_epochs(seed=5, epochs=3, packets=2000))
+    wrapped = cls(config)
+    wrapped._generation = _MAX_GENERATION - 1
+    for keys, sizes in epochs:
+        wrapped.reset()
+        wrapped.update_many(keys, sizes)
+        fresh = cls(config)
+        fresh.update_many(keys, sizes)
+        assert _records(wrapped.snapshot()) == _records(fresh.snapshot())
+    assert wrapped._generation == 2
+
+
+@pytest.mark.parametrize("backend", ["list", "array"])
+def test_top_orders_by_count_then_occupancy(backend):
+    config = TopKConfig(stages=2, buckets_per_stage=32, backend=backend)
+    detector = FlowDetector(config)
+    rng = np.random.default_rng(0)
+    # Equal packet sizes give many tied counts.
+    detector.on_batch(rng.integers(0, 200, 3000), np.full(3000, 100))
+    snapshot = _records(detector.end_epoch())
+    expected = sorted(snapshot, key=lambda rec: -rec[1])
+    for n in (0, 1, 3, 7, 20, len(snapshot) + 5):
+        assert _records(detector.current_heavy(n)) == expected[:n]
+    assert len(detector.current_heavy()) == min(config.k, len(snapshot))
+
+
+def test_top_matches_between_backends_with_ties():
+    config = TopKConfig(stages=2, buckets_per_stage=32, heavy_threshold_bytes=300)
+    ref, arr = TopKFilter(config), ArrayTopKFilter(config)
+    keys = np.random.default_rng(1).integers(0, 200, 3000)
+    sizes = np.full(3000, 100)
+    ref.update_many(keys, sizes)
+    arr.update_many(keys, sizes)
+    for n in range(0, 70, 3):
+        assert _records(arr.top(n)) == _records(ref.top(n))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import FanoutConfig
+from ms_satshield.fanout import (
+    BitmapEstimator,
+    HLLLiteEstimator,
+    HLLRegisterEstimator,
+    PackedBitmapEstimator,
+)
+
+
+def _pairs(seed, packets=5000, keys=300):
+    rng = np.random.default_rng(seed)
+    key = rng.integers(0, keys, packets).astype(np.int64)
+    # Give keys widely different peer counts, up to saturating the sketch.
+    other = (key * 7919 + rng.integers(0, 1 + key * 4, packets)).astype(np.int64)
+    return key, other
+
+
+@pytest.mark.parametrize("hash_mode", ["mix", "crc32"])
+@pytest.mark.parametrize("candidate_k", [10_000, 16])
+def test_packed_bitmap_matches_dict(hash_mode, candidate_k):
+    config = FanoutConfig(bitmap_bits=128, candidate_k=candidate_k, hash_mode=hash_mode)
+    ref, packed = BitmapEstimator(config), PackedBitmapEstimator(config)
+    for epoch in range(3):
+        keys, others = _pairs(seed=epoch)
+        ref.update_many(keys, others)
+        packed.update_many(keys[:2000], others[:2000])
+        for key, other in zip(keys[2000:].tolist(), others[2000:].tolist()):
+            packed.update(key, other)
+        query = np.arange(-5, 310, dtype=np.int64)
+        np.testing.assert_array_equal(packed.estimate_many(query), ref.estimate_many(query))
+        np.testing.assert_array_equal(packed.sketch_many(query), ref.sketch_many(query))
+        for key in range(0, 300, 7):
+            ref.discard(key)
+            packed.discard(key)
+        np.testing.assert_array_equal(packed.estimate_many(query), ref.estimate_many(query))
+        ref.reset()
+        packed.reset()
+
+
+@pytest.mark.parametrize("estimator", [PackedBitmapEstimator, HLLRegisterEstimator])
+def test_matrix_capped_at_candidate_k(estimator):
+    config = FanoutConfig(mode="hll-lite" if estimator is HLLRegisterEstimator else "bitmap", candidate_k=4)
+    sketch = estimator(config)
+    rows_before = sketch._rows.matrix.shape
+    keys = np.arange(50, dtype=np.int64)
+    sketch.update_many(keys, keys + 1000)
+    sketch.update(49, 7)
+    assert sketch._rows.matrix.shape == rows_before == (4, rows_before[1])
+    assert sketch.overflow == 46
+    assert (sketch.estimate_many(keys) > 0).all()
+
+
+def test_discard_reuses_freed_rows():
+    config = FanoutConfig(candidate_k=4)
+    packed = PackedBitmapEstimator(config)
+    packed.update_many(np.arange(4, dtype=np.int64), np.arange(4, dtype=np.int64))
+    memory = packed.memory_bytes
+    for key in range(4):
+        packed.discard(key)
+    fresh = np.arange(10, 14, dtype=np.int64)
+    packed.update_many(fresh, fresh)
+    assert packed.overflow == 0
+    assert packed.memory_bytes == memory
+    assert (packed.estimate_many(fresh) > 0).all()
+    assert (packed.estimate_many(np.arange(4, dtype=np.int64)) == 0).all()
+
+
+@pytest.mark.parametrize("hll_p,reg_bits", [(6, 6), (4, 3), (8, 8)])
+@pytest.mark.parametrize("candidate_k", [10_000, 16])
+def test_hll_registers_match_dict(hll_p, reg_bits, candidate_k):
+    config = FanoutConfig(mode="hll-lite", hll_p=hll_p, hll_reg_bits=reg_bits, candidate_k=candidate_k)
+    ref, regs = HLLLiteEstimator(config), HLLRegisterEstimator(config)
+    for epoch in range(3):
+        keys, others = _pairs(seed=10 + epoch)
+        ref.update_many(keys[:2500], others[:2500])
+        for key, other in zip(keys[2500:].tolist(), others[2500:].tolist()):
+            ref.update(key, other)
+        regs.update_many(keys, others)
+        query = np.arange(-5, 310, dtype=np.int64)
+        np.testing.assert_array_equal(regs.sketch_many(query), ref.sketch_many(query))
+        np.testing.assert_allclose(regs.estimate_many(query), ref.estimate_many(query), rtol=1e-12)
+        ref.reset()
+        regs.reset()
@@ -0,0 +1,34 @@
+import numpy as np
+
+from sim.flow import FlowKey, Packet, PacketBatch
+
+
+def _batch():
+    return PacketBatch.from_columns([1.0, 2.0, 3.5], [10, 11, 12], [20, 21, 22], [100, 200, 300])
+
+
+def test_from_columns_dtypes():
+    batch = _batch()
+    assert len(batch) == 3
+    assert batch.ts_ms.dtype == np.float64
+    assert batch.src.dtype == batch.dst.dtype == batch.size.dtype == np.int64
+
+
+def test_packets_round_trip():
+    batch = _batch()
+    packets = list(batch.packets())
+    assert packets[1] == Packet(ts_ms=2.0, src=11, dst=21, size=200, flow=FlowKey(src=11, dst=21))
+    again = PacketBatch.from_packets(packets)
+    for name in ("ts_ms", "src", "dst", "size"):
+        np.testing.assert_array_equal(getattr(again, name), getattr(batch, name))
+
+
+def test_concat_slice_take():
+    batch = _batch()
+    joined = PacketBatch.concat([batch.slice(0, 1), PacketBatch.empty(), batch.slice(1, 3)])
+    np.testing.assert_array_equal(joined.size, batch.size)
+    assert PacketBatch.concat([batch]) is batch
+    assert len(PacketBatch.concat([])) == 0
+    taken = batch.take(np.array([2, 0]))
+    np.testing.assert_array_equal(taken.src, [12, 10])
+    np.testing.assert_array_equal(taken.ts_ms, [3.5, 1.0])
@@ -0,0 +1,46 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from ms_satshield.hashing import HashFamily
+
+VALUES = np.array([0, 1, 2, 12345, -1, -(2**63), 2**63 - 1, 0xDEADBEEF], dtype=np.int64)
+
+
+@pytest.mark.parametrize("mode", ["mix", "crc32"])
+@pytest.mark.parametrize("salt", [0, 3])
+def test_hash_many_matches_scalar(mode, salt):
+    family = HashFamily(seed=9, mode=mode)
+    expected = [family.hash(value, salt) for value in VALUES.tolist()]
+    got = family.hash_many(VALUES, salt)
+    assert got.dtype == np.int64
+    assert got.tolist() == expected
+    assert all(0 <= value < 2**32 for value in expected)
+
+
+def test_crc32_is_zlib_compatible():
+    family = HashFamily(seed=5, mode="crc32")
+    init = zlib.crc32((3).to_bytes(4, "big"), 5)
+    assert family.hash(42, 3) == zlib.crc32((42).to_bytes(8, "big"), init)
+
+
+@pytest.mark.parametrize("mode", ["mix", "crc32"])
+def test_seed_and_salt_change_hashes(mode):
+    values = np.arange(1000, dtype=np.int64)
+    base = HashFamily(seed=0, mode=mode).hash_many(values)
+    assert (HashFamily(seed=1, mode=mode).hash_many(values) != base).mean() > 0.99
+    assert (HashFamily(seed=0, mode=mode).hash_many(values, salt=1) != base).mean() > 0.99
+
+
+def test_indices_match_index():
+    family = HashFamily(seed=2)
+    indices = family.indices(VALUES, stages=3, buckets=17)
+    assert indices.shape == (len(VALUES), 3)
+    for row, value in enumerate(VALUES.tolist()):
+        assert indices[row].tolist() == [family.index(value, stage, 17) for stage in range(3)]
+
+
+def test_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        HashFamily(mode="md5")
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from sim.flow import PacketBatch
+from sim.linkload import LinkLoadEngine, hash_attachment
+from sim.routing import ShortestPathRouting
+from sim.topology import TopologySnapshot
+
+_STEP_MS = 500
+# 8e-6 Gbps carries exactly 1000 bytes per 1000 ms epoch.
+_GBPS = 8e-6
+
+
+class _SteppedLine:
+    """Four satellites: step 0 is the line 0-1-2, step 1 swaps 0-1 for 0-2; node 3 is isolated."""
+
+    _LINKS = {0: [(0, 1), (1, 2)], 1: [(0, 2), (1, 2)]}
+
+    def __init__(self, start_skew_ms=0.0):
+        # A skewed start_ms no longer maps back to its own step through snapshot().
+        self._skew = start_skew_ms
+
+    def step_snapshot(self, step):
+        pairs = np.array(self._LINKS[min(step, 1)], dtype=np.int64)
+        keys = np.unique(np.concatenate([pairs[:, 0] * 4 + pairs[:, 1], pairs[:, 1] * 4 + pairs[:, 0]]))
+        rows, cols = np.divmod(keys, 4)
+        indptr = np.zeros(5, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=4), out=indptr[1:])
+        start_ms = step * float(_STEP_MS) - self._skew
+        return TopologySnapshot(step, start_ms, 4, _GBPS, _GBPS, indptr, cols.astype(np.int32))
+
+    def snapshot(self, ts_ms):
+        return self.step_snapshot(int(ts_ms // _STEP_MS))
+
+    def steps_of(self, ts_ms):
+        return (np.asarray(ts_ms) // _STEP_MS).astype(np.int64)
+
+
+class _ArraySource:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def batches(self, max_rows):
+        for start in range(0, len(self._batch), max_rows):
+            yield self._batch.slice(start, start + max_rows)
+
+
+def _engine(start_skew_ms=0.0):
+    topology = _SteppedLine(start_skew_ms)
+    return LinkLoadEngine(ShortestPathRouting(topology), lambda keys: np.asarray(keys), 1000.0)
+
+
+def _benign():
+    # 0 -> 2 before the step boundary goes 0-1-2, after it 0-2; node 3 is unreachable.
+    return PacketBatch.from_columns([100.0, 700.0, 800.0], [0, 0, 0], [2, 2, 3], [600, 300, 50])
+
+
+def _attack():
+    return PacketBatch.from_columns([200.0], [1], [2], [900])
+
+
+def _links(report):
+    return list(zip(report.src.tolist(), report.dst.tolist()))
+
+
+def test_report_on_hand_computed_snapshot():
+    engine = _engine()
+    engine.add(_benign())
+    engine.add(_attack(), attack=True)
+    report = engine.close_epoch()
+    assert report.epoch == 0 and engine.epoch == 1
+    assert _links(report) == [(0, 1), (0, 2), (1, 2)]
+    assert report.benign_bytes.tolist() == [600, 300, 600]
+    assert report.attack_bytes.tolist() == [0, 0, 900]
+    np.testing.assert_allclose(report.utilization, [0.6, 0.3, 1.5])
+    np.testing.assert_allclose(report.benign_fraction, [1.0, 1.0, 0.4])
+    np.testing.assert_allclose(report.attack_fraction, [0.0, 0.0, 0.6])
+    assert report.unrouted_bytes == 50
+    assert report.benign_offered_bytes == 900
+    # Link (1, 2) passes 1000 of 1500 offered bytes, so the early 0 -> 2 flow keeps 2/3.
+    assert report.benign_delivered_bytes == pytest.approx(600 * 2 / 3 + 300)
+    assert report.baseline_delivered_bytes == pytest.approx(900)
+    assert report.throughput_drop == pytest.approx(200 / 900)
+    assert report.row(1, 2) == 2
+    assert report.row(2, 1) == -1
+
+
+@pytest.mark.parametrize("start_skew_ms", [0.0, 1.0])
+def test_routes_each_packet_on_its_own_step(start_skew_ms):
+    engine = _engine(start_skew_ms)
+    engine.add(PacketBatch.from_columns([499.0, 500.0], [0, 0], [2, 2], [10, 20]))
+    report = engine.close_epoch()
+    # The epoch straddles the step boundary: link 0-1 only exists in step 0.
+    assert _links(report) == [(0, 1), (0, 2), (1, 2)]
+    assert report.benign_bytes.tolist() == [10, 20, 10]
+    assert report.throughput_drop == 0.0
+
+
+def test_iter_epochs_labels_and_numbers_epochs():
+    benign = PacketBatch.from_columns([100.0, 2100.0], [0, 0], [2, 2], [600, 100])
+    reports = list(_engine().iter_epochs([_ArraySource(benign)], [_ArraySource(_attack())]))
+    assert [report.epoch for report in reports] == [0, 1, 2]
+    assert reports[0].attack_bytes.tolist() == [0, 900]
+    assert reports[0].benign_bytes.tolist() == [600, 600]
+    assert len(reports[1]) == 0 and reports[1].throughput_drop == 0.0
+    assert _links(reports[2]) == [(0, 2)]
+
+
+def test_hash_attachment_is_stable():
+    attach = hash_attachment([10, 20, 30], seed=3)
+    keys = np.arange(1000)
+    nodes = attach(keys)
+    assert set(nodes.tolist()) == {10, 20, 30}
+    np.testing.assert_array_equal(attach(keys), nodes)
+    with pytest.raises(ValueError):
+        hash_attachment([])
@@ -0,0 +1,188 @@
+import ipaddress
+import struct
+
+import numpy as np
+import pytest
+
+from sim.flow import PacketBatch
+from sim.pcap import PcapSource, ip_key
+
+_V4 = [("10.0.0.1", "192.168.1.9"), ("10.0.0.2", "8.8.8.8"), ("172.16.5.4", "10.0.0.1")]
+_V6 = [("2001:db8::1", "2001:db8:1::2"), ("fe80::1", "2001:db8::1")]
+
+
+def _ipv4(src, dst, payload=0):
+    header = bytearray(20)
+    header[0] = 0x45
+    header[12:16] = ipaddress.IPv4Address(src).packed
+    header[16:20] = ipaddress.IPv4Address(dst).packed
+    return bytes(header) + bytes(payload)
+
+
+def _ipv6(src, dst, payload=0):
+    header = bytearray(40)
+    header[0] = 0x60
+    header[8:24] = ipaddress.IPv6Address(src).packed
+    header[24:40] = ipaddress.IPv6Address(dst).packed
+    return bytes(header) + bytes(payload)
+
+
+def _ethernet(packet, vlans=()):
+    ethertype = 0x86DD if packet[0] >> 4 == 6 else 0x0800
+    tags = b"".join(struct.pack(">HH", tpid, 7) for tpid in vlans)
+    return bytes(12) + tags + struct.pack(">H", ethertype) + packet
+
+
+def _pcap(records, endian="<", nanos=False, linktype=1):
+    magic = 0xA1B23C4D if nanos else 0xA1B2C3D4
+    out = struct.pack(f"{endian}IHHiIII", magic, 2, 4, 0, 0, 65535, linktype)
+    for sec, frac, frame in records:
+        out += struct.pack(f"{endian}IIII", sec, frac, len(frame), len(frame)) + frame
+    return out
+
+
+def _block(endian, block_type, body):
+    body += bytes(-len(body) % 4)
+    size = len(body) + 12
+    return struct.pack(f"{endian}II", block_type, size) + body + struct.pack(f"{endian}I", size)
+
+
+def _shb(endian="<"):
+    return _block(endian, 0x0A0D0D0A, struct.pack(f"{endian}IHHq", 0x1A2B3C4D, 1, 0, -1))
+
+
+def _idb(endian="<", linktype=1, tsresol=None):
+    options = b""
+    if tsresol is not None:
+        options = struct.pack(f"{endian}HH", 9, 1) + bytes([tsresol]) + bytes(3) + bytes(4)
+    return _block(endian, 1, struct.pack(f"{endian}HHI", linktype, 0, 65535) + options)
+
+
+def _epb(endian, ts, frame, iface=0):
+    body = struct.pack(f"{endian}IIIII", iface, ts >> 32, ts & 0xFFFFFFFF, len(frame), len(frame))
+    return _block(endian, 6, body + frame)
+
+
+def _legacy(endian, ts, frame, iface=0):
+    body = struct.pack(f"{endian}HHIIII", iface, 0, ts >> 32, ts & 0xFFFFFFFF, len(frame), len(frame))
+    return _block(endian, 2, body + frame)
+
+
+def _spb(endian, frame):
+    return _block(endian, 3, struct.pack(f"{endian}I", len(frame)) + frame)
+
+
+def _read(tmp_path, data, max_rows=1000, **kwargs):
+    path = tmp_path / "capture"
+    path.write_bytes(data)
+    source = PcapSource(str(path), **kwargs)
+    batches = list(source.batches(max_rows=max_rows))
+    assert all(0 < len(batch) <= max_rows for batch in batches)
+    batch = PacketBatch.concat(batches) if batches else PacketBatch.empty()
+    return source, batch
+
+
+def _keys(pairs):
+    return [ip_key(src) for src, _ in pairs], [ip_key(dst) for _, dst in pairs]
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+@pytest.mark.parametrize("nanos", [False, True])
+def test_pcap_magic_and_byte_order(tmp_path, endian, nanos):
+    unit = 1_000_000 if nanos else 1_000
+    frames = [_ethernet(_ipv4(src, dst, payload=10 * idx)) for idx, (src, dst) in enumerate(_V4)]
+    records = [(100 + idx, (idx * 250) * unit, frame) for idx, frame in enumerate(frames)]
+    _, batch = _read(tmp_path, _pcap(records, endian, nanos))
+    srcs, dsts = _keys(_V4)
+    assert batch.src.tolist() == srcs
+    assert batch.dst.tolist() == dsts
+    np.testing.assert_allclose(batch.ts_ms, [0.0, 1250.0, 2500.0])
+    # Size is the captured frame length, Ethernet header included.
+    assert batch.size.tolist() == [len(frame) for frame in frames]
+    assert batch.size[0] == 14 + 20
+
+
+def test_pcap_vlan_ipv6_and_skipped_frames(tmp_path):
+    frames = [
+        _ethernet(_ipv4(*_V4[0]), vlans=(0x8100,)),
+        _ethernet(_ipv6(*_V6[0])),
+        bytes(12) + struct.pack(">H", 0x0806) + bytes(28),  # ARP
+        _ethernet(_ipv6(*_V6[1]), vlans=(0x88A8, 0x8100)),
+        _ethernet(_ipv4(*_V4[1]))[:30],  # too short for the IP header
+    ]
+    source, batch = _read(tmp_path, _pcap([(1, idx, frame) for idx, frame in enumerate(frames)]))
+    srcs, dsts = _keys([_V4[0], _V6[0], _V6[1]])
+    assert batch.src.tolist() == srcs
+    assert batch.dst.tolist() == dsts
+    assert source.skipped == 2
+    assert (batch.src[1:] >= 1 << 62).all()
+
+
+def test_pcap_raw_ip_linktype(tmp_path):
+    packets = [_ipv4(*_V4[0]), _ipv6(*_V6[0])]
+    _, batch = _read(tmp_path, _pcap([(0, 0, p) for p in packets], linktype=101))
+    assert batch.src.tolist() == _keys([_V4[0], _V6[0]])[0]
+    assert batch.size.tolist() == [20, 40]
+
+
+@pytest.mark.parametrize("max_rows", [1, 3, 7, 1000])
+def test_pcap_batches_and_truncated_tail(tmp_path, max_rows):
+    rng = np.random.default_rng(5)
+    pairs = [_V4[i % 3] for i in range(60)]
+    # Long equal-length runs exercise the speculative walk; the rest vary.
+    payloads = [0] * 30 + rng.integers(0, 40, 30).tolist()
+    records = [(idx, 0, _ethernet(_ipv4(s, d, p))) for idx, ((s, d), p) in enumerate(zip(pairs, payloads))]
+    data = _pcap(records)
+    source, batch = _read(tmp_path, data[:-5], max_rows=max_rows)
+    assert len(batch) == 59
+    assert batch.src.tolist() == _keys(pairs)[0][:59]
+    np.testing.assert_allclose(batch.ts_ms, np.arange(59) * 1000.0)
+    assert source.skipped == 0
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+def test_pcapng_blocks(tmp_path, endian):
+    frames = [_ethernet(_ipv4(*pair)) for pair in _V4] + [_ethernet(_ipv6(*_V6[0]), vlans=(0x8100,))]
+    data = (
+        _shb(endian)
+        + _idb(endian)
+        + _idb(endian, linktype=101)
+        + _epb(endian, 5_000_000, frames[0])
+        + _legacy(endian, 5_250_000, frames[1])
+        + _spb(endian, frames[2])
+        + _epb(endian, 6_000_000, _ipv4(*_V4[2]), iface=1)
+        + _epb(endian, 7_000_000, frames[3])
+    )
+    _, batch = _read(tmp_path, data, max_rows=2)
+    srcs, dsts = _keys(_V4 + [_V4[2], _V6[0]])
+    assert batch.src.tolist() == srcs
+    assert batch.dst.tolist() == dsts
+    # The SPB carries no timestamp and reuses the previous one.
+    np.testing.assert_allclose(batch.ts_ms, [0.0, 250.0, 250.0, 1000.0, 2000.0])
+    assert batch.size.tolist() == [len(f) for f in frames[:3]] + [20, len(frames[3])]
+
+
+@pytest.mark.parametrize("tsresol,unit_ms", [(3, 1.0), (9, 1e-6), (0x80 | 10, 1000.0 / 1024)])
+def test_pcapng_if_tsresol(tmp_path, tsresol, unit_ms):
+    frame = _ethernet(_ipv4(*_V4[0]))
+    data = _shb() + _idb(tsresol=tsresol) + _epb("<", 4096, frame) + _epb("<", 4096 + 2048, frame)
+    _, batch = _read(tmp_path, data, origin_ms=0.0)
+    np.testing.assert_allclose(batch.ts_ms, [4096 * unit_ms, 6144 * unit_ms])
+
+
+def test_pcapng_truncated_tail_and_new_section(tmp_path):
+    frame = _ethernet(_ipv4(*_V4[0]))
+    data = _shb() + _idb() + _epb("<", 1000, frame)
+    # A second, big-endian section with its own interfaces.
+    data += _shb(">") + _idb(">") + _epb(">", 2000, _ethernet(_ipv4(*_V4[1])))
+    data += _epb(">", 3000, frame)[:-6]
+    _, batch = _read(tmp_path, data)
+    assert batch.src.tolist() == _keys(_V4[:2])[0]
+    np.testing.assert_allclose(batch.ts_ms, [0.0, 1.0])
+
+
+def test_rejects_unknown_magic(tmp_path):
+    path = tmp_path / "capture"
+    path.write_bytes(b"not a capture at all")
+    with pytest.raises(ValueError, match="Not a pcap"):
+        list(PcapSource(str(path)).batches())
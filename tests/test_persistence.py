@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import EpochConfig
+from ms_satshield.persistence import ArrayPersistence, DictPersistence
+
+
+def _epochs(seed, epochs=60, universe=400, heavy=40):
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        keys = rng.choice(universe, size=int(rng.integers(0, heavy)), replace=False).astype(np.int64)
+        # Occasional idle gaps exercise bulk decay.
+        idle = int(rng.integers(1, 4)) if epoch % 7 == 6 else 0
+        yield keys * 7919 - 1_000_000, idle
+
+
+def _items(tracker):
+    keys, counts = tracker.items()
+    return dict(zip(keys.tolist(), counts.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_array_matches_dict_at_default_capacity(seed):
+    config = EpochConfig(persist_k=3, persist_backend="array")
+    ref, table = DictPersistence(config), ArrayPersistence(config)
+    for heavy, idle in _epochs(seed):
+        ref.update(heavy)
+        table.update(heavy)
+        if idle:
+            ref.decay(idle)
+            table.decay(idle)
+        assert _items(table) == _items(ref)
+        probe = np.arange(-1_000_000, 2_300_000, 7919, dtype=np.int64)
+        np.testing.assert_array_equal(table.get_many(probe), ref.get_many(probe))
+    assert table.overflow == 0
+    assert len(table) == len(ref)
+
+
+def test_expiry_keeps_resident_keys_in_place():
+    # With capacity 8, keys 5 and 10 start at slot 0, key 0 at 1, key 9 at 2.
+    table = ArrayPersistence(EpochConfig(persist_k=3, persist_capacity=8, persist_probes=3))
+    table.update(np.array([5, 0, 10, 6]))  # 10 probes to slot 2
+    table.update(np.array([5, 0, 10, 9, 12]))  # 6 expires; 9 probes to slot 3
+    table.update(np.array([5, 0, 10, 9]))  # 12 expires
+    assert _items(table) == {0: 3, 5: 3, 9: 2, 10: 3}
+    assert table.overflow == 0
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("capacity,probes", [(32, 2), (48, 4), (64, 1)])
+def test_tiny_table_only_loses_counted_inserts(seed, capacity, probes):
+    config = EpochConfig(persist_k=5, persist_capacity=capacity, persist_probes=probes)
+    table = ArrayPersistence(config)
+    # Reference with the same losses: a key the table could not insert is skipped.
+    ref, lost = {}, 0
+    for heavy, idle in _epochs(seed):
+        table.update(heavy)
+        tracked = table.get_many(heavy) > 0
+        for key, ok in zip(heavy.tolist(), tracked.tolist()):
+            if key in ref:
+                ref[key] = min(5, ref[key] + 1)
+            elif ok:
+                ref[key] = 1
+            else:
+                lost += 1
+        heavy_set = set(heavy.tolist())
+        ref = {key: p - (key not in heavy_set) for key, p in ref.items()}
+        ref = {key: p - idle for key, p in ref.items() if p > idle}
+        if idle:
+            table.decay(idle)
+        assert _items(table) == ref
+        assert table.overflow == lost
+    assert lost > 0
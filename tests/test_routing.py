@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from sim.routing import ShortestPathRouting
+from sim.topology import TopologySnapshot, WalkerConfig, WalkerTopology
+
+
+class _RandomGraphs:
+    """Step-addressable random graphs that drift a few links per step."""
+
+    def __init__(self, seed, nodes=60, satellites=45, links=150, churn=2):
+        self._rng = np.random.default_rng(seed)
+        self._nodes, self._satellites, self._churn = nodes, satellites, churn
+        self._edges = self._random_edges(links)
+        self._steps = {}
+
+    def _random_edges(self, count):
+        src = self._rng.integers(0, self._nodes, count)
+        dst = self._rng.integers(0, self._nodes, count)
+        keep = src != dst
+        return set(zip(src[keep].tolist(), dst[keep].tolist()))
+
+    def step_snapshot(self, step):
+        while step not in self._steps:
+            current = len(self._steps)
+            if current:
+                dropped = sorted(self._edges)[: self._churn]
+                self._edges = (self._edges - set(dropped)) | self._random_edges(self._churn)
+            self._steps[current] = self._snapshot(current)
+        return self._steps[step]
+
+    def snapshot(self, ts_ms):
+        return self.step_snapshot(int(ts_ms // 1000))
+
+    def steps_of(self, ts_ms):
+        return (np.asarray(ts_ms) // 1000).astype(np.int64)
+
+    def _snapshot(self, step):
+        pairs = np.array(sorted(self._edges), dtype=np.int64).reshape(-1, 2)
+        keys = np.unique(np.concatenate([pairs[:, 0] * self._nodes + pairs[:, 1], pairs[:, 1] * self._nodes + pairs[:, 0]]))
+        rows, cols = np.divmod(keys, self._nodes)
+        indptr = np.zeros(self._nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self._nodes), out=indptr[1:])
+        return TopologySnapshot(step, step * 1000.0, self._satellites, 20.0, 10.0, indptr, cols.astype(np.int32))
+
+
+def _walker():
+    rng = np.random.default_rng(5)
+    stations = tuple(zip(rng.uniform(-50, 50, 30).tolist(), rng.uniform(-180, 180, 30).tolist()))
+    config = WalkerConfig(planes=8, sats_per_plane=10, ground_stations=stations, gsl_links=2, min_elevation_deg=10.0)
+    return WalkerTopology(config)
+
+
+def _assert_matches_fresh(topology, steps, step_ms, transit_ground):
+    cached = ShortestPathRouting(topology, transit_ground=transit_ground)
+    nodes = topology.step_snapshot(0).num_nodes
+    rng = np.random.default_rng(0)
+    dsts = rng.integers(0, nodes, 24)
+    srcs = rng.integers(0, nodes, 24)
+    for step in range(steps):
+        ts_ms = step * step_ms + 1.0
+        fresh = ShortestPathRouting(topology, transit_ground=transit_ground)
+        for dst in dsts.tolist():
+            np.testing.assert_array_equal(cached.next_hops(dst, ts_ms), fresh.next_hops(dst, ts_ms))
+        for src, dst in zip(srcs.tolist(), dsts.tolist()):
+            np.testing.assert_array_equal(cached.route_nodes(src, dst, ts_ms), fresh.route_nodes(src, dst, ts_ms))
+            assert cached.paths(src, dst, ts_ms) == fresh.paths(src, dst, ts_ms)
+        snap, indptr, edges = cached.route_edges(srcs, dsts, ts_ms)
+        assert snap.step == step
+        _, fresh_indptr, fresh_edges = fresh.route_edges(srcs, dsts, ts_ms)
+        np.testing.assert_array_equal(indptr, fresh_indptr)
+        np.testing.assert_array_equal(edges, fresh_edges)
+        at_snap, at_indptr, at_edges = cached.route_edges_at(step, srcs, dsts)
+        assert at_snap is snap
+        np.testing.assert_array_equal(at_indptr, indptr)
+        np.testing.assert_array_equal(at_edges, edges)
+    return cached
+
+
+def test_walker_routes_match_fresh_builds():
+    topology = _walker()
+    cached = _assert_matches_fresh(topology, steps=8, step_ms=topology.config.step_ms, transit_ground=False)
+    assert cached.reused + cached.patched > 0
+
+
+@pytest.mark.parametrize("transit_ground", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_random_graph_routes_match_fresh_builds(seed, transit_ground):
+    _assert_matches_fresh(_RandomGraphs(seed), steps=10, step_ms=1000, transit_ground=transit_ground)
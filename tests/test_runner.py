@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
+from ms_satshield.epoch import MultiKeyEpochManager
+from sim.flow import PacketBatch
+from sim.runner import ExperimentConfig, ExperimentRunner, merge_epoch_batches, merge_epoch_windows
+
+
+class _ArraySource:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def batches(self, max_rows):
+        for start in range(0, len(self._batch), max_rows):
+            yield self._batch.slice(start, start + max_rows)
+
+
+def _sources(seed, count=4):
+    rng = np.random.default_rng(seed)
+    batches = []
+    for idx in range(count):
+        rows = int(rng.integers(0, 300))
+        # Coarse integer timestamps give many cross-source ties; some are negative.
+        ts = np.sort(rng.integers(-20, 400, rows)).astype(np.float64)
+        batches.append(
+            PacketBatch.from_columns(ts, np.full(rows, idx), np.arange(rows), rng.integers(64, 1500, rows))
+        )
+    return batches
+
+
+def _heap_order(batches):
+    """(ts_ms, source index, row) order of a per-packet heap merge."""
+    rows = [(ts, idx, pos) for idx, b in enumerate(batches) for pos, ts in enumerate(b.ts_ms.tolist())]
+    return [(idx, pos) for _, idx, pos in sorted(rows)]
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("max_rows", [1, 7, 1000])
+def test_merge_matches_heap_order(seed, max_rows):
+    batches = _sources(seed)
+    epoch_ms = 50.0
+    pieces = list(merge_epoch_batches([_ArraySource(b) for b in batches], epoch_ms, max_rows))
+    merged = PacketBatch.concat([batch for _, batch in pieces])
+    assert list(zip(merged.src.tolist(), merged.dst.tolist())) == _heap_order(batches)
+    epochs = [epoch for epoch, _ in pieces]
+    assert epochs == sorted(epochs)
+    for epoch, batch in pieces:
+        assert len(batch) > 0
+        assert (batch.ts_ms < (epoch + 1) * epoch_ms).all()
+        assert epoch == 0 or (batch.ts_ms >= epoch * epoch_ms).all()
+
+    windows = list(merge_epoch_windows([_ArraySource(b) for b in batches], epoch_ms, max_rows))
+    assert [epoch for epoch, _ in windows] == sorted(set(epochs))
+    joined = PacketBatch.concat([batch for _, batch in windows])
+    np.testing.assert_array_equal(joined.ts_ms, merged.ts_ms)
+    np.testing.assert_array_equal(joined.src, merged.src)
+
+
+def _detector():
+    return MultiKeyEpochManager(
+        TopKConfig(stages=4, buckets_per_stage=64), FanoutConfig(), ScoreConfig(), QueueConfig(), EpochConfig()
+    )
+
+
+@pytest.mark.parametrize("mode", ["packet", "window"])
+def test_runner_matches_per_packet_heap_loop(mode):
+    batches = _sources(seed=21, count=3)
+    epoch_ms = 40
+    # Reference: the per-packet heap merge loop the runner replaced.
+    reference, expected, current = _detector(), [], 0.0
+    for idx, pos in _heap_order(batches):
+        batch = batches[idx]
+        ts = float(batch.ts_ms[pos])
+        while ts >= current + epoch_ms:
+            expected.append(reference.end_epoch())
+            current += epoch_ms
+        reference.on_packet(int(batch.src[pos]), int(batch.dst[pos]), int(batch.size[pos]))
+    expected.append(reference.end_epoch())
+
+    runner = ExperimentRunner(_detector(), ExperimentConfig(epoch_ms=epoch_ms, mode=mode))
+    results = runner.run([_ArraySource(b) for b in batches])
+    assert len(results) == len(expected)
+    for got, want in zip(results, expected):
+        for side in want.results:
+            np.testing.assert_array_equal(got.results[side].key_array, want.results[side].key_array)
+            np.testing.assert_array_equal(got.results[side].score_array, want.results[side].score_array)
+
+
+@pytest.mark.parametrize("gap", [1, 2, 3, 5])
+@pytest.mark.parametrize("backend", ["dict", "array"])
+def test_idle_gap_matches_empty_end_epochs(gap, backend):
+    epoch_ms = 100
+    # Keys 1-3 are heavy in epochs 0-2 and again after the gap; key 9 only in epoch 2.
+    rows = [(e * epoch_ms + t, src, 50 + t, 100) for e in range(3) for src in (1, 2, 3) for t in range(5)]
+    rows += [(2 * epoch_ms + t, 9, t, 100) for t in range(5)]
+    rows += [((3 + gap) * epoch_ms + t, src, 50 + t, 100) for src in (1, 2, 3) for t in range(5)]
+    ts, src, dst, size = zip(*rows)
+    traffic = PacketBatch.from_columns(ts, src, dst, size)
+
+    def detector():
+        return MultiKeyEpochManager(
+            TopKConfig(stages=4, buckets_per_stage=64),
+            FanoutConfig(),
+            ScoreConfig(),
+            QueueConfig(),
+            EpochConfig(persist_backend=backend),
+        )
+
+    reference, expected = detector(), []
+    for epoch in range(4 + gap):
+        for pos in np.flatnonzero((traffic.ts_ms // epoch_ms) == epoch).tolist():
+            reference.on_packet(int(traffic.src[pos]), int(traffic.dst[pos]), int(traffic.size[pos]))
+        expected.append(reference.end_epoch())
+
+    windowed = detector()
+    runner = ExperimentRunner(windowed, ExperimentConfig(epoch_ms=epoch_ms, mode="window"))
+    results = runner.run([_ArraySource(traffic)])
+    assert len(results) == len(expected)
+    for got, want in zip(results, expected):
+        for side in want.results:
+            for name in ("key_array", "count_array", "persist_array", "queue_array"):
+                np.testing.assert_array_equal(getattr(got.results[side], name), getattr(want.results[side], name))
+            np.testing.assert_allclose(got.results[side].score_array, want.results[side].score_array)
+    final = results[-1].results["src"]
+    assert final.key_array.tolist() == [1, 2, 3]
+    assert final.persist_array.tolist() == [max(0, 3 - gap)] * 3
+    for side in ("src", "dst"):
+        got_keys, got_counts = windowed._managers[side]._persist.items()
+        want_keys, want_counts = reference._managers[side]._persist.items()
+        np.testing.assert_array_equal(got_keys, want_keys)
+        np.testing.assert_array_equal(got_counts, want_counts)
+    assert 9 not in windowed._managers["src"]._persist.items()[0].tolist()
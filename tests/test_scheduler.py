@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import QueueConfig
+from ms_satshield.scheduler import QueueMapper, _quantile_thresholds
+
+
+def _sorted_thresholds(scores, num_queues):
+    """The sort-based thresholds `_quantile_thresholds` replaced."""
+    ordered = sorted(scores)
+    return [ordered[min(int(q * len(ordered) / num_queues), len(ordered) - 1)] for q in range(1, num_queues)]
+
+
+def _score_sets():
+    rng = np.random.default_rng(4)
+    return [
+        rng.random(500),
+        np.round(rng.random(300), 1),  # many ties
+        np.full(20, 0.5),
+        np.array([0.7]),  # single-key epoch
+        np.array([0.2, 0.2, 0.9]),
+        np.array([-3.0, 0.0, 0.5, 1.0, 4.0]),
+    ]
+
+
+@pytest.mark.parametrize("num_queues", [2, 4, 7])
+def test_quantile_thresholds_match_sort(num_queues):
+    for scores in _score_sets():
+        assert _quantile_thresholds(scores.copy(), num_queues) == _sorted_thresholds(scores.tolist(), num_queues)
+    assert _quantile_thresholds(np.empty(0), num_queues) == []
+
+
+@pytest.mark.parametrize("mapping", ["sigmoid", "quantile"])
+@pytest.mark.parametrize("num_queues", [2, 4, 7])
+def test_map_many_matches_map_score(mapping, num_queues):
+    mapper = QueueMapper(QueueConfig(num_queues=num_queues, mapping=mapping))
+    probes = np.concatenate([np.linspace(-1.0, 2.0, 61)] + _score_sets())
+    for scores in _score_sets() + [np.empty(0)]:
+        mapper.update(scores)
+        for query in (scores, probes):
+            expected = [mapper.map_score(score) for score in query.tolist()]
+            got = mapper.map_many(query)
+            assert got.dtype == np.int64
+            assert got.tolist() == expected
+
+
+def test_update_accepts_iterables():
+    mapper = QueueMapper(QueueConfig(num_queues=4, mapping="quantile"))
+    mapper.update(iter([0.3, 0.1, 0.2, 0.4]))
+    assert mapper.map_many(np.array([0.1, 0.2, 0.3, 0.4, 0.5])).tolist() == [0, 0, 1, 2, 3]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from ms_satshield.config import ScoreConfig
+from ms_satshield.scoring import NormStats, ScoreModel
+
+
+def _features(seed, count=200):
+    rng = np.random.default_rng(seed)
+    rates = rng.lognormal(8.0, 2.0, count)
+    fanouts = rng.integers(0, 300, count).astype(np.float64)
+    persists = rng.integers(0, 4, count).astype(np.float64)
+    return rates, fanouts, persists
+
+
+def test_norm_stats_keep_former_names():
+    stats = NormStats(10.0, 20.0, 3.0)
+    assert (stats.rate_p99, stats.fanout_p99) == (stats.rate_scale, stats.fanout_scale) == (10.0, 20.0)
+
+
+@pytest.mark.parametrize("norm_mode", ["p99", "max", "zscore"])
+def test_score_many_matches_score(norm_mode):
+    model = ScoreModel(ScoreConfig(norm_mode=norm_mode))
+    rates, fanouts, persists = _features(seed=1)
+    stats = model.compute_stats(rates, fanouts, persists)
+    # Degenerate stats exercise the zero-scale branches.
+    for current in (stats, NormStats(0.0, 0.0, 0.0, rate_center=5.0)):
+        expected = [model.score(r, f, p, current) for r, f, p in zip(rates, fanouts, persists)]
+        np.testing.assert_allclose(model.score_many(rates, fanouts, persists, current), expected, rtol=1e-12)
+
+
+def test_p99_and_max_stats():
+    rates = np.arange(1.0, 201.0)
+    p99 = ScoreModel(ScoreConfig(norm_mode="p99")).compute_stats(rates, rates, [1.0, 3.0])
+    assert (p99.rate_scale, p99.persist_max) == (198.0, 3.0)
+    top = ScoreModel(ScoreConfig(norm_mode="max")).compute_stats(rates, rates, [])
+    assert (top.rate_scale, top.fanout_scale, top.persist_max) == (200.0, 200.0, 1.0)
+
+
+@pytest.mark.parametrize("norm_mode", ["p99", "max", "zscore"])
+def test_ewma_ignores_empty_epochs(norm_mode):
+    model = ScoreModel(ScoreConfig(norm_mode=norm_mode, norm_ewma=0.75))
+    plain = ScoreModel(ScoreConfig(norm_mode=norm_mode))
+    # Before any candidates, an empty epoch gets the plain defaults.
+    assert model.compute_stats([], [], []) == plain.compute_stats([], [], [])
+    first = model.compute_stats(*_features(seed=2))
+    assert first == plain.compute_stats(*_features(seed=2))
+    assert model.compute_stats([], [], []) == first
+    assert model.compute_stats([], [], []) == first
+    second = model.compute_stats(*_features(seed=3))
+    fresh = plain.compute_stats(*_features(seed=3))
+    assert second.rate_scale == pytest.approx(0.75 * first.rate_scale + 0.25 * fresh.rate_scale)
+    assert second.fanout_center == pytest.approx(0.75 * first.fanout_center + 0.25 * fresh.fanout_center)
+    model.reset()
+    assert model.compute_stats(*_features(seed=3)) == fresh
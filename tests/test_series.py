@@ -0,0 +1,88 @@
+import gc
+import weakref
+
+import numpy as np
+
+from ms_satshield.config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
+from ms_satshield.epoch import MultiKeyEpochManager
+from sim.flow import PacketBatch
+from sim.runner import ExperimentConfig, ExperimentRunner
+from sim.series import SERIES_COLUMNS, EpochSeries, EpochSeriesWriter
+
+_EPOCH_MS = 100
+
+
+class _ArraySource:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def batches(self, max_rows):
+        for start in range(0, len(self._batch), max_rows):
+            yield self._batch.slice(start, start + max_rows)
+
+
+def _traffic(seed=3):
+    rng = np.random.default_rng(seed)
+    # Epoch 2 has no traffic, so its results are empty.
+    ts = rng.choice([0, 1, 3, 4, 5], 4000) * _EPOCH_MS + rng.integers(0, _EPOCH_MS, 4000)
+    ts.sort()
+    src = (rng.pareto(1.2, ts.size) * 20).astype(np.int64)
+    return PacketBatch.from_columns(ts, src, rng.integers(0, 300, ts.size), rng.integers(64, 1500, ts.size))
+
+
+def _runner():
+    detector = MultiKeyEpochManager(
+        TopKConfig(stages=4, buckets_per_stage=64), FanoutConfig(), ScoreConfig(), QueueConfig(), EpochConfig()
+    )
+    return ExperimentRunner(detector, ExperimentConfig(epoch_ms=_EPOCH_MS, mode="window"))
+
+
+def test_series_round_trip(tmp_path):
+    traffic = _traffic()
+    expected = _runner().run([_ArraySource(traffic)])
+    with EpochSeriesWriter(str(tmp_path)) as writer:
+        assert _runner().run_to([_ArraySource(traffic)], writer) == len(expected) == 6
+    series = EpochSeries(str(tmp_path))
+    assert len(series) == writer.rows
+    for name, dtype in SERIES_COLUMNS:
+        assert series[name].dtype == np.dtype(dtype)
+    assert len(series["key"][series.epoch_rows(2)]) == 0
+    assert [epoch for epoch, _ in series.iter_epochs()] == [0, 1, 3, 4, 5]
+    for epoch, result in enumerate(expected):
+        rows = series.epoch_rows(epoch)
+        for side in ("src", "dst"):
+            want = result.results[side]
+            mask = series.side_mask(side)[rows]
+            got = {name: series[name][rows][mask] for name, _ in SERIES_COLUMNS}
+            assert (got["epoch"] == epoch).all()
+            np.testing.assert_array_equal(got["key"], want.key_array)
+            np.testing.assert_array_equal(got["bytes"], want.count_array)
+            np.testing.assert_array_equal(got["persist"], want.persist_array)
+            np.testing.assert_array_equal(got["queue"], want.queue_array)
+            np.testing.assert_array_equal(got["fanout"], want.fanout_array.astype(np.float32))
+            np.testing.assert_array_equal(got["score"], want.score_array.astype(np.float32))
+
+
+def test_series_ignores_partial_trailing_row(tmp_path):
+    with EpochSeriesWriter(str(tmp_path)) as writer:
+        _runner().run_to([_ArraySource(_traffic())], writer)
+    with open(tmp_path / "key.bin", "ab") as handle:
+        handle.write(b"\x01\x02\x03")
+    assert len(EpochSeries(str(tmp_path))) == writer.rows
+
+
+class _WeakSink:
+    def __init__(self):
+        self.refs = []
+
+    def write(self, epoch, result):
+        gc.collect()
+        # Every earlier epoch is gone unless it is this very (shared idle) object.
+        assert all(ref() is None or ref() is result for ref in self.refs)
+        self.refs.append(weakref.ref(result))
+
+
+def test_run_to_releases_past_epochs():
+    sink = _WeakSink()
+    assert _runner().run_to([_ArraySource(_traffic())], sink) == 6
+    assert len(sink.refs) == 6
@@ -0,0 +1,189 @@
+from multiprocessing import Pipe
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from ms_satshield.config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
+from ms_satshield.epoch import EpochManager, MultiKeyEpochManager
+from ms_satshield.hashing import HashFamily
+from ms_satshield.sharding import ShardPool, _serve
+
+
+def test_worker_reports_setup_failure():
+    parent, child = Pipe()
+    configs = (TopKConfig(), FanoutConfig(), ScoreConfig(), QueueConfig(), EpochConfig())
+    _serve(child, {"src": "p4ddos-missing-segment"}, 16, configs, untrack=False)
+    kind, side, payload = parent.recv()
+    assert (kind, side) == ("error", None)
+    assert "FileNotFoundError" in payload
+
+
+def _configs(candidate_mode="epoch", mode="bitmap"):
+    return (
+        TopKConfig(),
+        FanoutConfig(mode=mode, candidate_mode=candidate_mode, promote_bytes=20_000),
+        ScoreConfig(),
+        QueueConfig(),
+        EpochConfig(),
+    )
+
+
+def _collision_free_keys(count=300):
+    """Keys with distinct first-stage Top-k buckets, so the unsharded table is exact."""
+    buckets = TopKConfig().buckets_per_stage
+    candidates = np.arange(count * 4, dtype=np.int64)
+    _, first = np.unique(HashFamily().hash_many(candidates, 0) % buckets, return_index=True)
+    return candidates[np.sort(first)[:count]]
+
+
+def _traffic(seed, epochs=4, packets=4000):
+    rng = np.random.default_rng(seed)
+    pool = _collision_free_keys()
+    for _ in range(epochs):
+        src = pool[np.minimum((rng.pareto(1.2, packets) * 30).astype(np.int64), len(pool) - 1)]
+        dst = pool[rng.integers(0, len(pool), packets)]
+        size = rng.integers(64, 1500, packets).astype(np.int64)
+        yield src, dst, size
+
+
+def _by_key(result):
+    order = np.argsort(result.key_array, kind="stable")
+    return {
+        name: getattr(result, name)[order]
+        for name in ("key_array", "count_array", "rate_array", "fanout_array", "persist_array", "queue_array")
+    }, result.score_array[order]
+
+
+def _assert_same(got, want):
+    for side, expected in want.results.items():
+        got_columns, got_scores = _by_key(got.results[side])
+        want_columns, want_scores = _by_key(expected)
+        for name, column in want_columns.items():
+            np.testing.assert_array_equal(got_columns[name], column, err_msg=f"{side}.{name}")
+        np.testing.assert_allclose(got_scores, want_scores, rtol=1e-12)
+
+
+def _drive(manager, input_mode, seed):
+    """Epoch results over traffic with an idle gap, fed per packet or in batches."""
+    results = []
+    for epoch, (src, dst, size) in enumerate(_traffic(seed)):
+        if input_mode == "packet":
+            for row in zip(src.tolist(), dst.tolist(), size.tolist()):
+                manager.on_packet(*row)
+        else:
+            for lo in range(0, len(src), 900):
+                manager.on_batch(src[lo : lo + 900], dst[lo : lo + 900], size[lo : lo + 900])
+        results.append(manager.end_epoch())
+        if epoch == 1:
+            results.append(manager.idle_epochs(2))
+    return results
+
+
+@pytest.mark.parametrize("shard_mode", ["inline", "process"])
+@pytest.mark.parametrize("input_mode", ["packet", "batch"])
+@pytest.mark.parametrize("candidate_mode", ["epoch", "online"])
+def test_sharded_matches_unsharded(shard_mode, input_mode, candidate_mode):
+    configs = _configs(candidate_mode)
+    expected = _drive(MultiKeyEpochManager(*configs), input_mode, seed=5)
+    sharded = MultiKeyEpochManager(*configs, shards=3, shard_mode=shard_mode)
+    try:
+        results = _drive(sharded, input_mode, seed=5)
+    finally:
+        sharded.close()
+    assert len(results) == len(expected)
+    assert any(len(r.results["src"].key_array) for r in expected)
+    for got, want in zip(results, expected):
+        _assert_same(got, want)
+
+
+class _Recorder:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, side, keys, others, sizes):
+        self.rows.append((side, keys.tolist(), others.tolist(), sizes.tolist()))
+
+    def close(self):
+        pass
+
+
+def test_dispatch_routes_each_key_to_one_shard_in_order():
+    pool = ShardPool(*_configs(), sides=["src"], shards=3, mode="inline")
+    pool._shards[:] = [_Recorder() for _ in range(3)]
+    rng = np.random.default_rng(2)
+    owners = {}
+    for _ in range(4):
+        keys = rng.integers(0, 50, 200)
+        pool.dispatch("src", keys, np.arange(200), keys + 1000)
+        for shard_id, shard in enumerate(pool._shards):
+            _, shard_keys, others, sizes = shard.rows[-1]
+            assert others == sorted(others)
+            assert sizes == [key + 1000 for key in shard_keys]
+            for key in shard_keys:
+                assert owners.setdefault(key, shard_id) == shard_id
+    assert len(set(owners.values())) == 3
+    pool.dispatch("src", np.empty(0), np.empty(0), np.empty(0))
+    assert all(len(shard.rows) == 4 for shard in pool._shards)
+
+
+def test_process_shards_refill_small_buffers():
+    configs = _configs()
+    pools = [
+        ShardPool(*configs, sides=["src", "dst"], shards=2, mode="inline"),
+        ShardPool(*configs, sides=["src", "dst"], shards=2, mode="process", rows=64),
+    ]
+    names = [shm.name for shard in pools[1]._shards for shm in shard._buffers.values()]
+    try:
+        for src, dst, size in _traffic(seed=8, epochs=2, packets=1000):
+            for pool in pools:
+                pool.dispatch("src", src, dst, size)
+                pool.dispatch("dst", dst, src, size)
+            for side in ("src", "dst"):
+                inline, process = (pool.collect(side) for pool in pools)
+                np.testing.assert_array_equal(process.key_array, inline.key_array)
+                np.testing.assert_array_equal(process.fanout_array, inline.fanout_array)
+                np.testing.assert_array_equal(process.rate_array, inline.rate_array)
+    finally:
+        for pool in pools:
+            pool.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+
+def test_worker_errors_surface_in_parent():
+    pool = ShardPool(*_configs(), sides=["src"], shards=2, mode="process", rows=16)
+    try:
+        pool._shards[0].request("dst", "features", 0)
+        with pytest.raises(RuntimeError, match="Shard worker failed"):
+            pool._shards[0].result()
+    finally:
+        pool.close()
+
+
+def test_collect_state_merges_into_unsharded_state():
+    configs = _configs()
+    single = EpochManager(*configs)
+    pool = ShardPool(*configs, sides=["src"], shards=3, mode="inline")
+    for src, dst, size in _traffic(seed=9, epochs=3):
+        single.on_batch(src, dst, size)
+        pool.dispatch("src", src, dst, size)
+        want, got = single.close_state(), pool.collect_state("src")
+        for name in ("sketch_keys", "sketch_rows", "sketch_bytes", "persist_keys", "persist_counts"):
+            np.testing.assert_array_equal(getattr(got, name), getattr(want, name), err_msg=name)
+        order, want_order = np.argsort(got.heavy_keys), np.argsort(want.heavy_keys)
+        np.testing.assert_array_equal(got.heavy_keys[order], want.heavy_keys[want_order])
+        np.testing.assert_array_equal(got.heavy_counts[order], want.heavy_counts[want_order])
+    pool.close()
+
+
+@pytest.mark.parametrize("norm_mode", ["max", "zscore"])
+def test_sharded_scores_use_global_stats(norm_mode):
+    # Per-shard normalization would give every shard its own top score.
+    topk, fanout, _, queue, epoch = _configs()
+    configs = (topk, fanout, ScoreConfig(norm_mode=norm_mode, norm_ewma=0.5), QueueConfig(mapping="quantile"), epoch)
+    expected = _drive(MultiKeyEpochManager(*configs), "batch", seed=6)
+    sharded = MultiKeyEpochManager(*configs, shards=4, shard_mode="inline")
+    for got, want in zip(_drive(sharded, "batch", seed=6), expected):
+        _assert_same(got, want)
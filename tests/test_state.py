@@ -0,0 +1,147 @@
+import struct
+
+import numpy as np
+import pytest
+
+from ms_satshield.config import EpochConfig, FanoutConfig, QueueConfig, ScoreConfig, TopKConfig
+from ms_satshield.epoch import EpochManager, StateAggregator
+from ms_satshield.hashing import HashFamily
+from ms_satshield.state import DetectorState, merge_states
+
+
+def _configs(mode, backend):
+    return (
+        TopKConfig(),
+        FanoutConfig(mode=mode, backend=backend),
+        ScoreConfig(),
+        QueueConfig(),
+        EpochConfig(),
+    )
+
+
+def _keys(count=120):
+    """Keys with distinct first-stage Top-k buckets, so Top-k counts are exact."""
+    candidates = np.arange(count * 4, dtype=np.int64)
+    _, first = np.unique(HashFamily().hash_many(candidates, 0) % TopKConfig().buckets_per_stage, return_index=True)
+    return candidates[np.sort(first)[:count]]
+
+
+def _flows(seed, count=150):
+    rng = np.random.default_rng(seed)
+    keys = _keys()
+    return keys[rng.integers(0, len(keys), count)], keys[rng.integers(0, len(keys), count)]
+
+
+def _epoch(rng, flows, repeats=3):
+    """Every flow `repeats` times, shuffled, with random sizes."""
+    src, dst = (np.tile(column, repeats) for column in flows)
+    order = rng.permutation(len(src))
+    return src[order], dst[order], rng.integers(64, 1500, len(src)).astype(np.int64)
+
+
+def _assert_same(result, expected):
+    got, want = np.argsort(result.key_array), np.argsort(expected.key_array)
+    np.testing.assert_array_equal(result.key_array[got], expected.key_array[want])
+    for name in ("count_array", "rate_array", "fanout_array", "persist_array", "queue_array"):
+        np.testing.assert_array_equal(getattr(result, name)[got], getattr(expected, name)[want], err_msg=name)
+    np.testing.assert_allclose(result.score_array[got], expected.score_array[want], rtol=1e-12)
+
+
+@pytest.mark.parametrize("mode", ["bitmap", "hll-lite"])
+@pytest.mark.parametrize("backend", ["dict", "array"])
+def test_wire_round_trip_reproduces_end_epoch(mode, backend):
+    configs = _configs(mode, backend)
+    reference, detector = EpochManager(*configs), EpochManager(*configs)
+    aggregator = StateAggregator(configs[2], configs[3], configs[4])
+    rng = np.random.default_rng(1)
+    flows = _flows(seed=1)
+    for _ in range(4):
+        src, dst, size = _epoch(rng, flows)
+        reference.on_batch(src, dst, size)
+        detector.on_batch(src, dst, size)
+        state = detector.close_state()
+        data = state.to_bytes()
+        assert len(data) == state.wire_bytes
+        decoded = DetectorState.from_bytes(data)
+        np.testing.assert_array_equal(decoded.sketch_rows, state.sketch_rows)
+        np.testing.assert_array_equal(decoded.heavy_keys, state.heavy_keys)
+        _assert_same(aggregator.aggregate([decoded]), reference.end_epoch())
+
+
+@pytest.mark.parametrize("mode", ["bitmap", "hll-lite"])
+def test_merged_states_match_union_traffic(mode):
+    configs = _configs(mode, "array")
+    union = EpochManager(*configs)
+    parts = [EpochManager(*configs), EpochManager(*configs)]
+    aggregator = StateAggregator(configs[2], configs[3], configs[4], counts="sum")
+    rng = np.random.default_rng(2)
+    flows = _flows(seed=2)
+    for _ in range(3):
+        # Each detector sees every flow, so both track the same candidates.
+        for part in parts:
+            src, dst, size = _epoch(rng, flows, repeats=2)
+            part.on_batch(src, dst, size)
+            union.on_batch(src, dst, size)
+        merged = aggregator.aggregate([part.close_state() for part in parts])
+        _assert_same(merged, union.end_epoch())
+
+
+def test_merge_modes_combine_counts():
+    def state(keys, counts, persists, rows):
+        keys = np.asarray(keys, dtype=np.int64)
+        return DetectorState(
+            fanout_mode="bitmap",
+            width=16,
+            reg_bits=0,
+            heavy_keys=keys,
+            heavy_counts=np.asarray(counts, dtype=np.int64),
+            sketch_keys=np.sort(keys),
+            sketch_rows=np.asarray(rows, dtype=np.uint8),
+            sketch_bytes=np.asarray(counts, dtype=np.int64)[np.argsort(keys)],
+            persist_keys=np.sort(keys),
+            persist_counts=np.asarray(persists, dtype=np.int64),
+        )
+
+    a = state([7, 3], [100, 40], [1, 2], [[1, 0], [0, 4]])
+    b = state([3, 9], [60, 5], [3, 1], [[6, 1], [0, 2]])
+    summed = merge_states([a, b])
+    assert summed.heavy_keys.tolist() == [7, 3, 9]
+    assert summed.heavy_counts.tolist() == [100, 100, 5]
+    assert summed.persist_keys.tolist() == [3, 7, 9]
+    assert summed.persist_counts.tolist() == [3, 2, 1]
+    assert summed.sketch_rows.tolist() == [[7, 1], [0, 4], [0, 2]]
+    assert summed.sketch_bytes.tolist() == [100, 100, 5]
+    assert merge_states([a, b], counts="max").heavy_counts.tolist() == [100, 60, 5]
+    with pytest.raises(ValueError, match="different fan-out"):
+        merge_states([a, DetectorState(**{**a.__dict__, "width": 32})])
+    with pytest.raises(ValueError):
+        merge_states([])
+
+
+def _sample_state():
+    manager = EpochManager(*_configs("hll-lite", "dict"))
+    rng = np.random.default_rng(3)
+    flows = _flows(seed=3, count=20)
+    for _ in range(2):
+        manager.on_batch(*_epoch(rng, flows))
+        state = manager.close_state()
+    return state.to_bytes()
+
+
+@pytest.mark.parametrize(
+    "corrupt, message",
+    [
+        (lambda data: data[:20], "Truncated"),
+        (lambda data: b"XXXXXXXX" + data[8:], "Not a detector state"),
+        (lambda data: data[:8] + struct.pack("<H", 9) + data[10:], "version"),
+        (lambda data: data[:10] + bytes([7]) + data[11:], "fan-out mode"),
+        (lambda data: data[:-1], "size does not match"),
+        (lambda data: data + b"\0", "size does not match"),
+        (lambda data: data[:20] + struct.pack("<I", 1 << 20) + data[24:], "size does not match"),
+    ],
+)
+def test_from_bytes_rejects_corrupted_states(corrupt, message):
+    data = _sample_state()
+    assert DetectorState.from_bytes(data).to_bytes() == data
+    with pytest.raises(ValueError, match=message):
+        DetectorState.from_bytes(corrupt(data))
@@ -0,0 +1,63 @@
+import csv
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "experiments"))
+
+import sweep_rate_collapse as sweep  # noqa: E402
+
+
+def _args(tmp_path, *extra):
+    return sweep.parse_args(
+        [
+            "--bots", "4,8",
+            "--rates", "1",
+            "--decoys", "1,2",
+            "--duration-ms", "2000",
+            "--benign-flows", "20",
+            "--output", str(tmp_path / "sweep.csv"),
+            *extra,
+        ]
+    )
+
+
+def _rows(path):
+    with open(path, newline="") as handle:
+        return list(csv.reader(handle))
+
+
+def test_workers_match_serial(tmp_path):
+    serial = _args(tmp_path)
+    sweep.run_sweep_streaming(serial)
+    expected = _rows(serial.output)
+    assert tuple(expected[0]) == sweep.RESULT_FIELDS
+    assert [row[:3] for row in expected[1:]] == [["4", "1.0", "1"], ["4", "1.0", "2"], ["8", "1.0", "1"], ["8", "1.0", "2"]]
+    os.remove(serial.output)
+    sweep.run_sweep_streaming(_args(tmp_path, "--workers", "2"))
+    assert _rows(serial.output) == expected
+
+
+def test_resume_skips_finished_cells(tmp_path, monkeypatch):
+    args = _args(tmp_path)
+    sweep.run_sweep_streaming(args)
+    expected = _rows(args.output)
+    with open(args.output, "w", newline="") as handle:
+        csv.writer(handle).writerows([expected[0], expected[3]])
+    ran = []
+    run_cell = sweep.run_cell
+    monkeypatch.setattr(sweep, "run_cell", lambda a, cell: ran.append(cell) or run_cell(a, cell))
+    sweep.run_sweep_streaming(_args(tmp_path, "--resume"))
+    assert ran == [(4, 1.0, 1), (4, 1.0, 2), (8, 1.0, 2)]
+    assert _rows(args.output) == expected
+
+
+def test_resume_rejects_old_header(tmp_path):
+    args = _args(tmp_path, "--resume")
+    old = [field for field in sweep.RESULT_FIELDS if field != "multi_src_reaction_ms"]
+    with open(args.output, "w", newline="") as handle:
+        csv.writer(handle).writerows([old, ["4", "1.0", "1", "0", "0", "0", "0"]])
+    with pytest.raises(ValueError, match="cannot resume"):
+        sweep.run_sweep_streaming(args)
+    assert _rows(args.output)[0] == old
@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+import pytest
+
+from sim.topology import EARTH_RADIUS_KM, Link, WalkerConfig, WalkerTopology
+
+_STATIONS = ((0.0, 0.0), (45.0, 90.0), (-30.0, -120.0), (60.0, 10.0))
+
+
+def _config(**overrides):
+    defaults = dict(planes=6, sats_per_plane=8, ground_stations=_STATIONS, gsl_links=2, min_elevation_deg=10.0)
+    defaults.update(overrides)
+    return WalkerConfig(**defaults)
+
+
+def _pairs(snap):
+    return set(zip(snap.edge_src.tolist(), snap.indices.tolist()))
+
+
+def _elevation_deg(station, sat_km):
+    lat, lon = map(math.radians, station)
+    ground = EARTH_RADIUS_KM * np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+    look = sat_km - ground
+    return math.degrees(math.asin(look @ ground / (np.linalg.norm(look) * EARTH_RADIUS_KM)))
+
+
+def test_snapshot_is_symmetric_sorted_csr():
+    topology = WalkerTopology(_config())
+    snap = topology.snapshot(0.0)
+    assert snap.num_nodes == 6 * 8 + len(_STATIONS)
+    pairs = _pairs(snap)
+    assert pairs == {(dst, src) for src, dst in pairs}
+    assert all(src != dst for src, dst in pairs)
+    for node in range(snap.num_nodes):
+        row = snap.neighbors(node).tolist()
+        assert row == sorted(set(row))
+    assert len(snap) == snap.num_edges == len(pairs)
+    links = list(snap)
+    assert links[5] == snap.link(5)
+    assert {(link.src, link.dst) for link in links} == pairs
+
+
+def test_isl_grid_and_polar_cutoff():
+    config = _config(polar_cutoff_deg=90.0, ground_stations=())
+    snap = WalkerTopology(config).snapshot(0.0)
+    pairs = _pairs(snap)
+    per_plane = config.sats_per_plane
+    for sat in range(config.satellites):
+        plane, slot = divmod(sat, per_plane)
+        assert (sat, plane * per_plane + (slot + 1) % per_plane) in pairs
+        if plane < config.planes - 1:
+            assert (sat, sat + per_plane) in pairs
+        else:
+            # Delta seam: slot s of the last plane meets slot s + F of plane 0.
+            assert (sat, (slot + config.phasing) % per_plane) in pairs
+    assert all(len(snap.neighbors(sat)) == 4 for sat in range(config.satellites))
+
+    star = WalkerTopology(_config(polar_cutoff_deg=90.0, ground_stations=(), pattern="star")).snapshot(0.0)
+    last = (config.planes - 1) * per_plane
+    assert not [(a, b) for a, b in _pairs(star) if a >= last and b < per_plane]
+
+    cut = WalkerTopology(_config(polar_cutoff_deg=30.0, ground_stations=()))
+    pos = cut.positions_km(0.0)
+    lat = np.degrees(np.arcsin(pos[:, 2] / np.linalg.norm(pos, axis=1)))
+    for src, dst in _pairs(cut.snapshot(0.0)):
+        if src // per_plane != dst // per_plane:
+            assert abs(lat[src]) <= 30.0 and abs(lat[dst]) <= 30.0
+
+
+def test_ground_links_pick_highest_visible_satellites():
+    config = _config(gsl_links=3)
+    topology = WalkerTopology(config)
+    linked = 0
+    for ts_ms in (0.0, 250_000.0):
+        snap = topology.snapshot(ts_ms)
+        pos = topology.positions_km(snap.start_ms / 1000.0)
+        for idx, station in enumerate(_STATIONS):
+            elevations = np.array([_elevation_deg(station, sat) for sat in pos])
+            best = np.argsort(-elevations)[:3]
+            expected = sorted(best[elevations[best] >= config.min_elevation_deg].tolist())
+            assert snap.neighbors(config.satellites + idx).tolist() == expected
+            linked += len(expected)
+    assert linked > 0
+    np.testing.assert_allclose(np.linalg.norm(pos, axis=1), EARTH_RADIUS_KM + config.altitude_km)
+
+
+def test_capacities_and_edge_ids():
+    config = _config()
+    snap = WalkerTopology(config).snapshot(0.0)
+    isl = (snap.edge_src < config.satellites) & (snap.indices < config.satellites)
+    assert set(snap.capacity_gbps[isl].tolist()) == {config.isl_gbps}
+    assert set(snap.capacity_gbps[~isl].tolist()) == {config.gsl_gbps}
+    edges = np.arange(snap.num_edges)
+    np.testing.assert_array_equal(snap.edge_ids(snap.edge_src, snap.indices), edges)
+    assert snap.edge_ids(np.array([0, 1]), np.array([0, 1])).tolist() == [-1, -1]
+    assert snap.link(0) == Link(int(snap.edge_src[0]), int(snap.indices[0]), float(snap.capacity_gbps[0]))
+
+
+def test_steps_and_lru():
+    topology = WalkerTopology(_config(step_ms=1000), origin_ms=500.0, max_steps=2)
+    assert topology.step_of(500.0) == 0
+    assert topology.step_of(1499.9) == 0
+    assert topology.steps_of(np.array([500.0, 1500.0, 3600.0])).tolist() == [0, 1, 3]
+    with pytest.raises(ValueError):
+        topology.step_of(499.0)
+    with pytest.raises(ValueError):
+        topology.steps_of(np.array([600.0, 0.0]))
+    snap = topology.snapshot(2600.0)
+    assert (snap.step, snap.start_ms) == (2, 2500.0)
+    topology.precompute(500.0, 2500.0)
+    assert topology.generated == 3
+    assert list(topology._steps) == [0, 1]
+    topology.step_snapshot(0)
+    topology.step_snapshot(2)
+    assert topology.generated == 4
+    assert list(topology._steps) == [0, 2]
+
+
+def test_cache_dir_reloads_identical_steps(tmp_path):
+    config = _config()
+    first = WalkerTopology(config, cache_dir=str(tmp_path))
+    built = [first.step_snapshot(step) for step in range(3)]
+    reloaded = WalkerTopology(config, cache_dir=str(tmp_path))
+    for snap in built:
+        again = reloaded.step_snapshot(snap.step)
+        np.testing.assert_array_equal(again.indptr, snap.indptr)
+        np.testing.assert_array_equal(again.indices, snap.indices)
+        assert again.start_ms == snap.start_ms
+    assert reloaded.generated == 0
+    other = WalkerTopology(config, origin_ms=1.0, cache_dir=str(tmp_path))
+    other.step_snapshot(0)
+    assert other.generated == 1
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [dict(planes=0), dict(pattern="ring"), dict(step_ms=0), dict(gsl_links=-1)],
+)
+def test_rejects_invalid_configs(overrides):
+    with pytest.raises(ValueError):
+        WalkerTopology(_config(**overrides))
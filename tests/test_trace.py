@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from sim.trace import TraceFile, convert_text_trace
+
+ROWS = ["1.0,10,20,100", "2.5,11,21,200", "4.0,12,22,300"]
+
+
+def _convert(tmp_path, lines, **kwargs):
+    text = tmp_path / "trace.csv"
+    text.write_text("\n".join(lines) + "\n")
+    out = str(tmp_path / "trace.bin")
+    rows = convert_text_trace(str(text), out, **kwargs)
+    trace = TraceFile(out)
+    assert rows == len(trace)
+    return trace
+
+
+def test_convert_round_trip(tmp_path):
+    trace = _convert(tmp_path, ["ts_ms,src,dst,size"] + ROWS)
+    np.testing.assert_array_equal(trace.ts_ms, [1.0, 2.5, 4.0])
+    np.testing.assert_array_equal(trace.slice(0, 3).size, [100, 200, 300])
+
+
+def test_non_numeric_ignored_column_is_data(tmp_path):
+    lines = [f"tcp,{row}" for row in ROWS]
+    trace = _convert(tmp_path, lines, columns=("proto", "ts_ms", "src", "dst", "size"))
+    assert len(trace) == 3
+
+
+def test_header_with_numeric_first_field_is_skipped(tmp_path):
+    trace = _convert(tmp_path, ["0,src,dst,size"] + ROWS, columns=("ts_ms", "src", "dst", "size"))
+    np.testing.assert_array_equal(trace.ts_ms, [1.0, 2.5, 4.0])
+
+
+@pytest.mark.parametrize("header,rows", [(True, 2), (False, 3)])
+def test_explicit_header_flag(tmp_path, header, rows):
+    assert len(_convert(tmp_path, ROWS, header=header)) == rows
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from sim.flow import PacketBatch
+from sim.synthetic import SyntheticAttack, SyntheticAttackConfig, SyntheticBenign, SyntheticBenignConfig
+from sim.traffic import batches_from_packets, iter_batches
+
+
+class _PacketOnly:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def packets(self):
+        return self._batch.packets()
+
+
+def _columns(batches):
+    joined = PacketBatch.concat(list(batches))
+    return [getattr(joined, name).tolist() for name in ("ts_ms", "src", "dst", "size")]
+
+
+def test_batches_from_packets_chunks():
+    batch = PacketBatch.from_columns(np.arange(7.0), np.arange(7), np.arange(7) + 100, np.full(7, 64))
+    chunks = list(batches_from_packets(batch.packets(), max_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert _columns(chunks) == _columns([batch])
+    assert list(batches_from_packets(iter(()), max_rows=3)) == []
+
+
+def test_iter_batches_falls_back_to_packets():
+    batch = PacketBatch.from_columns([1.0, 2.0], [1, 2], [3, 4], [64, 128])
+    chunks = list(iter_batches(_PacketOnly(batch), max_rows=1))
+    assert len(chunks) == 2
+    assert _columns(chunks) == _columns([batch])
+
+
+def test_synthetic_benign_batches_match_packets():
+    source = SyntheticBenign(
+        SyntheticBenignConfig(flows=50, rate_kbps_mu=4.0, rate_kbps_sigma=1.0, duration_ms=3000, epoch_ms=1000)
+    )
+    packets = list(source.packets())
+    chunks = list(source.batches(max_rows=16))
+    assert max(len(chunk) for chunk in chunks) == 16
+    assert _columns(chunks) == _columns([PacketBatch.from_packets(packets)])
+
+
+def test_synthetic_attack_keeps_seeded_decoy_sets():
+    config = SyntheticAttackConfig(
+        bots=40, rate_mbps=1.0, decoys=300, attack_start_ms=0, attack_end_ms=2000, epoch_ms=1000, decoy_sample=12
+    )
+    rng = random.Random(config.seed)
+    dsts = [20_000_000 + i for i in range(config.decoys)]
+    expected = {10_000_000 + bot: rng.sample(dsts, 12) for bot in range(config.bots)}
+    packets = list(SyntheticAttack(config).packets())
+    assert len(packets) == 2 * 40 * 12
+    got = {}
+    for packet in packets[: 40 * 12]:
+        got.setdefault(packet.src, []).append(packet.dst)
+    assert got == expected
+    chunks = list(SyntheticAttack(config).batches(max_rows=50))
+    assert _columns(chunks) == _columns([PacketBatch.from_packets(packets)])